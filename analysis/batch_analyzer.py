@@ -10,13 +10,27 @@ from datetime import datetime
 import sys
 import os
 from time_horizon_analyzer import TimeHorizonAnalyzer
+from rate_limiter import get_rate_limiter
+from universe_snapshot import UniverseSnapshot, row_from_analysis
+
+try:
+    from catalyst_agent import CatalystAgent
+except ImportError as e:
+    print(f"⚠️  Agente de catalizadores no disponible ({e}); la instantánea no tendrá catalyst_score")
+    CatalystAgent = None
 
 class BatchTimeHorizonAnalyzer:
-    def __init__(self, csv_file_path, batch_size=50):
+    def __init__(self, csv_file_path, batch_size=50, snapshot=None, catalyst_agent=None):
         self.csv_file_path = csv_file_path
         self.batch_size = batch_size
         self.all_results = []
         
+        # Instantánea del universo que consulta el screener de la API
+        self.snapshot = snapshot if snapshot is not None else UniverseSnapshot()
+        if catalyst_agent is None and CatalystAgent is not None:
+            catalyst_agent = CatalystAgent()
+        self.catalyst_agent = catalyst_agent
+        
     def analyze_in_batches(self):
         """Analiza todas las acciones en lotes pequeños"""
         # Cargar datos
@@ -39,8 +53,8 @@ class BatchTimeHorizonAnalyzer:
             print(f"\n🔍 Procesando lote {batch_num + 1}/{total_batches}")
             print(f"📈 Acciones {batch_start + 1} a {batch_end}")
             
-            # Crear analizador para este lote
-            analyzer = TimeHorizonAnalyzer(self.csv_file_path)
+            # Crear analizador para este lote (descarga el lote completo en bloque)
+            analyzer = TimeHorizonAnalyzer(self.csv_file_path, download_chunk_size=self.batch_size)
             
             # Analizar solo este lote
             batch_results = analyzer.analyze_all_stocks(
@@ -56,20 +70,38 @@ class BatchTimeHorizonAnalyzer:
             valid_batch = [r for r in batch_results if 'error' not in r] if batch_results else []
             print(f"✅ Lote completado: {len(valid_batch)} éxitos de {len(batch_results) if batch_results else 0}")
             
+            # Refrescar la instantánea del universo con el lote
+            self.update_snapshot(valid_batch)
+            
             # Guardar progreso cada 3 lotes
             if (batch_num + 1) % 3 == 0:
                 self.save_intermediate_results(batch_num + 1, total_batches)
-            
-            # Pausa entre lotes para no sobrecargar APIs
-            if batch_num < total_batches - 1:  # No pausar en el último lote
-                print("⏳ Pausa de 30 segundos entre lotes...")
-                time.sleep(30)
         
         total_time = time.time() - start_time
         print(f"\n🎉 Análisis completo terminado en {total_time/60:.1f} minutos")
+        print(f"⏳ Tiempo de espera por límite de peticiones: {get_rate_limiter('market_data').stats()['total_wait_seconds']:.1f}s")
         
         return self.all_results
     
+    def update_snapshot(self, results):
+        """Añade a la instantánea del universo los resultados válidos de un lote"""
+        rows = []
+        for result in results:
+            # Un fallo en una acción no debe impedir actualizar el resto del lote
+            try:
+                catalysts = None
+                if self.catalyst_agent is not None:
+                    catalysts = self.catalyst_agent.find_catalysts(result['symbol'])
+                rows.append(row_from_analysis(result, catalysts))
+            except Exception as e:
+                print(f"❌ Error preparando {result.get('symbol')} para la instantánea: {e}")
+        
+        try:
+            total = self.snapshot.update(rows)
+            print(f"🗂️  Instantánea del universo: {total} acciones")
+        except Exception as e:
+            print(f"❌ Error actualizando la instantánea del universo: {e}")
+    
     def save_intermediate_results(self, current_batch, total_batches):
         """Guarda resultados intermedios"""
         filename = f"progress_batch_{current_batch}_of_{total_batches}.json"
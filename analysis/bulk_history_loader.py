@@ -0,0 +1,150 @@
+"""
+Cargador Masivo de Históricos
+Descarga el histórico de muchas acciones en peticiones agrupadas con concurrencia limitada
+"""
+
+import pandas as pd
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+import yfinance as yf
+import warnings
+warnings.filterwarnings('ignore')
+
+# Agregar el directorio de agentes al path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api', 'stock_api', 'src', 'agents'))
+
+from bar_store import BarStore, period_start, delta_range, from_yfinance, to_yfinance
+from rate_limiter import get_rate_limiter
+
+class BulkHistoryLoader:
+    """
+    Descarga históricos diarios de listas de símbolos con yf.download
+
+    Los símbolos que el almacén local ya cubre se sirven desde disco, los que
+    están desactualizados solo piden la cola que falta y el resto se descarga
+    completo. Las descargas se agrupan en lotes de `group_size` símbolos y se
+    ejecutan como máximo `max_workers` a la vez.
+    """
+
+    def __init__(self, bar_store=None, group_size=100, max_workers=4, rate_limiter=None):
+        self.bar_store = bar_store if bar_store is not None else BarStore()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter('market_data')
+        self.group_size = group_size
+        self.max_workers = max_workers
+
+    def _download_group(self, symbols, period):
+        """Descarga un grupo de símbolos en una sola petición"""
+        data = self.rate_limiter.call(
+            yf.download,
+            tickers=symbols,
+            period=period,
+            group_by='ticker',
+            auto_adjust=False,
+            threads=False,
+            progress=False
+        )
+
+        frames = {}
+        if data is None or data.empty:
+            return frames
+
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
+            else:
+                frame = data
+
+            frame = frame.dropna(how='all')
+            if not frame.empty:
+                frames[symbol] = frame
+
+        return frames
+
+    def _download(self, requests):
+        """
+        Ejecuta las descargas agrupadas con concurrencia limitada
+
+        Args:
+            requests: Lista de tuplas (período, símbolos)
+
+        Returns:
+            Diccionario símbolo -> DataFrame de yfinance
+        """
+        groups = []
+        for period, symbols in requests:
+            for i in range(0, len(symbols), self.group_size):
+                groups.append((symbols[i:i + self.group_size], period))
+
+        frames = {}
+        if not groups:
+            return frames
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._download_group, symbols, period): symbols
+                       for symbols, period in groups}
+            for future in as_completed(futures):
+                try:
+                    frames.update(future.result())
+                except Exception as e:
+                    print(f"❌ Error descargando lote de {len(futures[future])} acciones: {e}")
+
+        return frames
+
+    def load(self, symbols, period="6mo"):
+        """
+        Obtiene el histórico diario de una lista de símbolos
+
+        Args:
+            symbols: Lista de símbolos
+            period: Período de datos (6mo, 1y...)
+
+        Returns:
+            Diccionario símbolo -> DataFrame con columnas de yfinance (Open, High, Low, Close, Volume)
+        """
+        start = period_start(period)
+        full_symbols = []
+        tail_requests = {}
+
+        # Clasificar: al día en disco, desactualizados (solo cola) o sin datos
+        for symbol in symbols:
+            if self.bar_store.covers(symbol, '1d', start):
+                continue
+            if self.bar_store.covers(symbol, '1d', start, max_age=timedelta.max):
+                last_timestamp = self.bar_store.metadata(symbol, '1d')['last_timestamp']
+                tail_requests.setdefault(delta_range(last_timestamp, '1d'), []).append(symbol)
+            else:
+                full_symbols.append(symbol)
+
+        requests = [(period, full_symbols)] + list(tail_requests.items())
+        downloaded = self._download(requests)
+        full_set = set(full_symbols)
+
+        # Persistir lo descargado
+        for symbol, frame in downloaded.items():
+            covered_from = start if symbol in full_set else None
+            self.bar_store.append(symbol, '1d', from_yfinance(frame), covered_from=covered_from)
+
+        # Componer la respuesta desde el almacén
+        frames = {}
+        for symbol in symbols:
+            bars = self.bar_store.read(symbol, '1d', start=start)
+            if not bars.empty:
+                frames[symbol] = to_yfinance(bars)
+
+        return frames
+
+    def load_panel(self, symbols, period="6mo"):
+        """
+        Obtiene el histórico como un único panel
+
+        Returns:
+            DataFrame con columnas MultiIndex (símbolo, campo) alineado por fecha
+        """
+        frames = self.load(symbols, period)
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
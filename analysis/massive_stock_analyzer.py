@@ -16,6 +16,7 @@ sys.path.append('/home/ubuntu/stock_recommendation_system/stock_api/src/agents')
 from technical_analyzer import TechnicalAnalyzer
 from pattern_detector import PatternDetector
 from multi_temporal_predictor import MultiTemporalPredictor
+from rate_limiter import get_rate_limiter
 
 class MassiveStockAnalyzer:
     def __init__(self, csv_file_path):
@@ -176,9 +177,6 @@ class MassiveStockAnalyzer:
             result = self.analyze_single_stock(symbol, name)
             self.results.append(result)
             
-            # Pequeña pausa para no sobrecargar las APIs
-            time.sleep(0.1)
-            
             # Progreso cada 50 acciones
             if (index + 1) % 50 == 0:
                 elapsed = time.time() - start_time
@@ -186,6 +184,7 @@ class MassiveStockAnalyzer:
         
         total_time = time.time() - start_time
         print(f"🎉 Análisis completado en {total_time:.1f} segundos")
+        print(f"⏳ Tiempo de espera por límite de peticiones: {get_rate_limiter('market_data').stats()['total_wait_seconds']:.1f}s")
         
         return self.results
     
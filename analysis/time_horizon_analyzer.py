@@ -9,16 +9,32 @@ Analiza todas las acciones del CSV de Lightyear con recomendaciones específicas
 import pandas as pd
 import json
 import time
+import sys
+import os
 from datetime import datetime, timedelta
 import yfinance as yf
 import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
 
+# Agregar el directorio de agentes al path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api', 'stock_api', 'src', 'agents'))
+
+from bar_store import BarStore, period_start, from_yfinance, to_yfinance
+from bulk_history_loader import BulkHistoryLoader
+from rate_limiter import get_rate_limiter
+import indicators
+from indicator_cache import get_indicator_cache, frame_version
+
 class TimeHorizonAnalyzer:
-    def __init__(self, csv_file_path):
+    def __init__(self, csv_file_path, bar_store=None, download_chunk_size=500):
         self.csv_file_path = csv_file_path
         self.results = []
+        self.bar_store = bar_store if bar_store is not None else BarStore()
+        self.rate_limiter = get_rate_limiter('market_data')
+        self.loader = BulkHistoryLoader(bar_store=self.bar_store, rate_limiter=self.rate_limiter)
+        self.download_chunk_size = download_chunk_size
+        self.indicator_cache = get_indicator_cache()
         
     def load_stocks(self):
         """Carga la lista de acciones desde el archivo CSV"""
@@ -31,109 +47,179 @@ class TimeHorizonAnalyzer:
             return None
     
     def get_stock_data(self, symbol, period="6mo"):
-        """Obtiene datos históricos de la acción"""
+        """Obtiene datos históricos de la acción (primero desde el almacén local de barras)"""
         try:
+            start = period_start(period)
+            
+            # Servir desde disco si el almacén cubre el período
+            if self.bar_store.covers(symbol, '1d', start):
+                bars = self.bar_store.read(symbol, '1d', start=start)
+                if not bars.empty:
+                    return to_yfinance(bars)
+            
+            # Modo incremental: descargar solo desde la última barra almacenada
+            if self.bar_store.covers(symbol, '1d', start, max_age=timedelta.max):
+                last_timestamp = self.bar_store.metadata(symbol, '1d')['last_timestamp']
+                tail = self.rate_limiter.call(yf.Ticker(symbol).history, start=last_timestamp.strftime('%Y-%m-%d'),
+                                              auto_adjust=False)
+                # Respuesta vacía (siempre debería incluir la última barra): descarga fallida o limitada,
+                # se sirven las barras guardadas sin marcarlas como actualizadas
+                if not tail.empty:
+                    self.bar_store.append(symbol, '1d', from_yfinance(tail))
+                bars = self.bar_store.read(symbol, '1d', start=start)
+                if not bars.empty:
+                    return to_yfinance(bars)
+            
             stock = yf.Ticker(symbol)
-            data = stock.history(period=period)
+            # Sin ajustar: el almacén guarda precios brutos y el cierre ajustado
+            data = self.rate_limiter.call(stock.history, period=period, auto_adjust=False)
             if data.empty:
                 return None
-            return data
+            
+            bars = from_yfinance(data)
+            self.bar_store.append(symbol, '1d', bars, covered_from=start)
+            return to_yfinance(bars)
         except Exception as e:
             print(f"Error obteniendo datos para {symbol}: {e}")
             return None
     
-    def calculate_technical_indicators(self, data):
-        """Calcula indicadores técnicos específicos para ambos horizontes"""
+    def calculate_technical_indicators(self, data, symbol):
+        """
+        Calcula indicadores técnicos específicos para ambos horizontes
+        
+        Args:
+            data: DataFrame de históricos
+            symbol: Símbolo de la acción (forma parte de la clave del cache de indicadores)
+        """
         if data is None or len(data) < 20:
             return None
         
+        return self.calculate_technical_indicators_panel({symbol: data})[symbol]
+    
+    def calculate_technical_indicators_panel(self, histories):
+        """
+        Calcula los indicadores técnicos de muchas acciones en una sola pasada
+        vectorizada sobre paneles (barras x símbolos)
+        
+        Args:
+            histories: Diccionario símbolo -> DataFrame de históricos
+            
+        Returns:
+            Diccionario símbolo -> indicadores (mismo formato que
+            calculate_technical_indicators), None si no hay datos suficientes
+        """
+        results = {symbol: None for symbol in histories}
+        
+        # Reutilizar los resultados de las acciones cuyas barras no han cambiado
+        keys = {
+            symbol: self.indicator_cache.key(symbol, '1d', frame_version(data), 'time_horizon_indicators')
+            for symbol, data in histories.items() if data is not None and len(data)
+        }
+        pending = {}
+        for symbol, key in keys.items():
+            cached = self.indicator_cache.get(key)
+            if cached is not None:
+                results[symbol] = cached
+            else:
+                pending[symbol] = histories[symbol]
+        
+        symbols, panel, lengths = indicators.build_panel(pending, columns=('Close', 'Volume'))
+        if not symbols:
+            return results
+        
         # Precios
-        close = data['Close']
-        high = data['High']
-        low = data['Low']
-        volume = data['Volume']
+        close = panel['Close']
+        volume = panel['Volume']
         
         # RSI (14 períodos)
-        delta = close.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
+        rsi = indicators.rsi(close, 14)[-1]
         
         # MACD
-        ema12 = close.ewm(span=12).mean()
-        ema26 = close.ewm(span=26).mean()
-        macd_line = ema12 - ema26
-        signal_line = macd_line.ewm(span=9).mean()
-        macd_histogram = macd_line - signal_line
+        macd = indicators.macd(close)
+        macd_line = macd['macd'][-1]
+        signal_line = macd['signal'][-1]
+        macd_histogram = macd['histogram'][-1]
         
         # Bollinger Bands
-        bb_period = 20
-        bb_std = 2
-        bb_middle = close.rolling(window=bb_period).mean()
-        bb_upper = bb_middle + (close.rolling(window=bb_period).std() * bb_std)
-        bb_lower = bb_middle - (close.rolling(window=bb_period).std() * bb_std)
-        bb_width = ((bb_upper - bb_lower) / bb_middle) * 100
+        bands = indicators.bollinger_bands(close, period=20, std_dev=2)
+        bb_middle = bands['middle'][-1]
+        bb_upper = bands['upper'][-1]
+        bb_lower = bands['lower'][-1]
+        bb_width = bands['width'][-1]
         
         # Moving Averages para diferentes horizontes
-        sma5 = close.rolling(window=5).mean()    # Corto plazo
-        sma10 = close.rolling(window=10).mean()  # Corto plazo
-        sma20 = close.rolling(window=20).mean()  # Corto-medio plazo
-        sma50 = close.rolling(window=50).mean()  # Largo plazo
+        sma5 = indicators.sma(close, 5)[-1]    # Corto plazo
+        sma10 = indicators.sma(close, 10)[-1]  # Corto plazo
+        sma20 = indicators.sma(close, 20)[-1]  # Corto-medio plazo
+        sma50 = indicators.sma(close, 50)[-1]  # Largo plazo
         
         # Volumen promedio
-        avg_volume_20 = volume.rolling(window=20).mean()
-        volume_ratio = volume.iloc[-1] / avg_volume_20.iloc[-1] if not avg_volume_20.empty else 1
+        current_volume = volume[-1]
+        avg_volume_20 = indicators.sma(volume, 20)[-1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            volume_ratio = current_volume / avg_volume_20
         
         # Volatilidad
-        returns = close.pct_change()
-        volatility_21d = returns.rolling(window=21).std() * np.sqrt(252) * 100
-        volatility_90d = returns.rolling(window=90).std() * np.sqrt(252) * 100
-        
-        # Momentum
-        momentum_5d = (close.iloc[-1] / close.iloc[-6] - 1) * 100 if len(close) > 5 else 0
-        momentum_21d = (close.iloc[-1] / close.iloc[-22] - 1) * 100 if len(close) > 21 else 0
-        
-        current_data = {
-            'current_price': float(close.iloc[-1]),
-            'rsi': float(rsi.iloc[-1]) if not rsi.empty else None,
-            'macd': {
-                'line': float(macd_line.iloc[-1]) if not macd_line.empty else None,
-                'signal': float(signal_line.iloc[-1]) if not signal_line.empty else None,
-                'histogram': float(macd_histogram.iloc[-1]) if not macd_histogram.empty else None,
-                'trend': 'bullish' if macd_line.iloc[-1] > signal_line.iloc[-1] else 'bearish'
-            },
-            'bollinger': {
-                'upper': float(bb_upper.iloc[-1]) if not bb_upper.empty else None,
-                'middle': float(bb_middle.iloc[-1]) if not bb_middle.empty else None,
-                'lower': float(bb_lower.iloc[-1]) if not bb_lower.empty else None,
-                'width': float(bb_width.iloc[-1]) if not bb_width.empty else None,
-                'position': 'upper' if close.iloc[-1] > bb_upper.iloc[-1] else 'lower' if close.iloc[-1] < bb_lower.iloc[-1] else 'middle'
-            },
-            'moving_averages': {
-                'sma5': float(sma5.iloc[-1]) if not sma5.empty else None,
-                'sma10': float(sma10.iloc[-1]) if not sma10.empty else None,
-                'sma20': float(sma20.iloc[-1]) if not sma20.empty else None,
-                'sma50': float(sma50.iloc[-1]) if not sma50.empty else None,
-                'trend_short': 'up' if close.iloc[-1] > sma10.iloc[-1] else 'down',
-                'trend_long': 'up' if close.iloc[-1] > sma50.iloc[-1] else 'down'
-            },
-            'volume': {
-                'current': float(volume.iloc[-1]),
-                'avg_20d': float(avg_volume_20.iloc[-1]) if not avg_volume_20.empty else None,
-                'ratio': float(volume_ratio)
-            },
-            'volatility': {
-                'vol_21d': float(volatility_21d.iloc[-1]) if not volatility_21d.empty else None,
-                'vol_90d': float(volatility_90d.iloc[-1]) if not volatility_90d.empty else None
-            },
-            'momentum': {
-                'momentum_5d': float(momentum_5d),
-                'momentum_21d': float(momentum_21d)
+        volatility_21d = indicators.volatility(close, 21)[-1]
+        volatility_90d = indicators.volatility(close, 90)[-1]
+        
+        # Momentum (0 si la acción no tiene suficientes barras)
+        current_price = close[-1]
+        
+        def momentum(days):
+            if len(close) <= days:
+                return np.zeros(len(symbols))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(lengths > days, (current_price / close[-days - 1] - 1) * 100, 0)
+        
+        momentum_5d = momentum(5)
+        momentum_21d = momentum(21)
+        
+        for j, symbol in enumerate(symbols):
+            if lengths[j] < 20:
+                continue
+            
+            results[symbol] = {
+                'current_price': float(current_price[j]),
+                'rsi': float(rsi[j]),
+                'macd': {
+                    'line': float(macd_line[j]),
+                    'signal': float(signal_line[j]),
+                    'histogram': float(macd_histogram[j]),
+                    'trend': 'bullish' if macd_line[j] > signal_line[j] else 'bearish'
+                },
+                'bollinger': {
+                    'upper': float(bb_upper[j]),
+                    'middle': float(bb_middle[j]),
+                    'lower': float(bb_lower[j]),
+                    'width': float(bb_width[j]),
+                    'position': 'upper' if current_price[j] > bb_upper[j] else 'lower' if current_price[j] < bb_lower[j] else 'middle'
+                },
+                'moving_averages': {
+                    'sma5': float(sma5[j]),
+                    'sma10': float(sma10[j]),
+                    'sma20': float(sma20[j]),
+                    'sma50': float(sma50[j]),
+                    'trend_short': 'up' if current_price[j] > sma10[j] else 'down',
+                    'trend_long': 'up' if current_price[j] > sma50[j] else 'down'
+                },
+                'volume': {
+                    'current': float(current_volume[j]),
+                    'avg_20d': float(avg_volume_20[j]),
+                    'ratio': float(volume_ratio[j])
+                },
+                'volatility': {
+                    'vol_21d': float(volatility_21d[j]),
+                    'vol_90d': float(volatility_90d[j])
+                },
+                'momentum': {
+                    'momentum_5d': float(momentum_5d[j]),
+                    'momentum_21d': float(momentum_21d[j])
+                }
             }
-        }
+            self.indicator_cache.set(keys[symbol], results[symbol])
         
-        return current_data
+        return results
     
     def analyze_short_term(self, technical_data):
         """Análisis para horizonte corto plazo (máximo 21 días)"""
@@ -387,13 +473,14 @@ class TimeHorizonAnalyzer:
         else:
             return "low"
     
-    def analyze_single_stock(self, symbol, name):
+    def analyze_single_stock(self, symbol, name, data=None, technical_data=None):
         """Analiza una sola acción para ambos horizontes temporales"""
         try:
             print(f"🔍 Analizando {symbol} ({name})...")
             
-            # Obtener datos históricos
-            data = self.get_stock_data(symbol)
+            # Obtener datos históricos (si no se han precargado en bloque)
+            if data is None:
+                data = self.get_stock_data(symbol)
             if data is None:
                 return {
                     'symbol': symbol,
@@ -402,8 +489,9 @@ class TimeHorizonAnalyzer:
                     'timestamp': datetime.now().isoformat()
                 }
             
-            # Calcular indicadores técnicos
-            technical_data = self.calculate_technical_indicators(data)
+            # Calcular indicadores técnicos (si no se han calculado en panel)
+            if technical_data is None:
+                technical_data = self.calculate_technical_indicators(data, symbol)
             if technical_data is None:
                 return {
                     'symbol': symbol,
@@ -459,23 +547,30 @@ class TimeHorizonAnalyzer:
         
         start_time = time.time()
         
-        for index, row in stocks_df.iterrows():
-            symbol = row['Symbol']
-            name = row['Stock Name']
-            
-            result = self.analyze_single_stock(symbol, name)
-            self.results.append(result)
+        # Descargar históricos en bloque y analizar cada tramo
+        for chunk_start in range(0, len(stocks_df), self.download_chunk_size):
+            chunk = stocks_df.iloc[chunk_start:chunk_start + self.download_chunk_size]
+            histories = self.loader.load(chunk['Symbol'].tolist(), period="6mo")
             
-            # Pausa para no sobrecargar las APIs
-            time.sleep(0.2)
+            # Indicadores de todo el tramo en una sola pasada vectorizada
+            technical = self.calculate_technical_indicators_panel(histories)
             
-            # Progreso cada 25 acciones
-            if (len(self.results)) % 25 == 0:
-                elapsed = time.time() - start_time
-                print(f"📊 Progreso: {len(self.results)} acciones analizadas ({elapsed:.1f}s)")
+            for _, row in chunk.iterrows():
+                symbol = row['Symbol']
+                name = row['Stock Name']
+                
+                result = self.analyze_single_stock(symbol, name, data=histories.get(symbol),
+                                                   technical_data=technical.get(symbol))
+                self.results.append(result)
+                
+                # Progreso cada 25 acciones
+                if (len(self.results)) % 25 == 0:
+                    elapsed = time.time() - start_time
+                    print(f"📊 Progreso: {len(self.results)} acciones analizadas ({elapsed:.1f}s)")
         
         total_time = time.time() - start_time
         print(f"🎉 Análisis completado en {total_time:.1f} segundos")
+        print(f"⏳ Tiempo de espera por límite de peticiones: {self.rate_limiter.stats()['total_wait_seconds']:.1f}s")
         
         return self.results
     
@@ -5,25 +5,76 @@ Coordinador principal que gestiona agentes especializados
 
 import asyncio
 import json
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
 import pandas as pd
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from .analysis_cache import AnalysisCache, to_serializable
+    from .agent_scheduler import AgentTask, DagScheduler, STATUS_OK, STATUS_SKIPPED, STATUS_TIMEOUT
+    from .agent_executors import (DEFAULT_AGENT_EXECUTORS, FRAME_TASKS, SharedFrame,
+                                  create_process_pool, run_frame_task)
+except ImportError:
+    from analysis_cache import AnalysisCache, to_serializable
+    from agent_scheduler import AgentTask, DagScheduler, STATUS_OK, STATUS_SKIPPED, STATUS_TIMEOUT
+    from agent_executors import (DEFAULT_AGENT_EXECUTORS, FRAME_TASKS, SharedFrame,
+                                 create_process_pool, run_frame_task)
+
+# Presupuesto de tiempo por agente (segundos); el predictor incluye el entrenamiento inicial
+DEFAULT_AGENT_TIMEOUTS = {
+    'technical': 20.0,
+    'patterns': 20.0,
+    'predictor': 45.0,
+    'sentiment': 10.0,
+    'catalyst': 10.0
+}
+
 class AgentCoordinator:
     """
     Coordinador principal del sistema multi-agente
     Gestiona y coordina diferentes agentes especializados
     """
     
-    def __init__(self):
+    def __init__(self, cache_max_entries: int = 500, cache_max_bytes: int = 256 * 1024 * 1024,
+                 agent_executors: Dict[str, str] = None, process_workers: int = None,
+                 agent_timeouts: Dict[str, float] = None, analysis_deadline: float = 60.0):
+        """
+        Args:
+            cache_max_entries: Número máximo de entradas en el cache de análisis
+            cache_max_bytes: Memoria máxima estimada del cache de análisis
+            agent_executors: Ejecutor por agente ('thread' o 'process'); por defecto
+                patrones y predictor en procesos y el resto en hilos
+            process_workers: Procesos del pool (default: número de CPUs)
+            agent_timeouts: Presupuesto en segundos por agente
+            analysis_deadline: Plazo global en segundos de un análisis comprehensivo
+        """
         self.agents = {}
         self.executor = ThreadPoolExecutor(max_workers=4)
-        self.analysis_cache = {}
+        self.agent_executors = dict(DEFAULT_AGENT_EXECUTORS)
+        self.agent_executors.update(agent_executors or {})
+        self.process_workers = process_workers
+        self._process_pool = None
+        self._process_pool_lock = threading.Lock()
+        self.agent_timeouts = dict(DEFAULT_AGENT_TIMEOUTS)
+        self.agent_timeouts.update(agent_timeouts or {})
+        self.analysis_deadline = analysis_deadline
         self.cache_duration = timedelta(minutes=15)  # Cache por 15 minutos
+        self.analysis_cache = AnalysisCache(
+            max_entries=cache_max_entries,
+            max_bytes=cache_max_bytes,
+            ttl=self.cache_duration
+        )
+        
+        # Análisis en curso por clave (single-flight), compartidos entre event loops
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.coalesced_requests = 0
         
         # Inicializar agentes especializados
         self._initialize_agents()
@@ -44,11 +95,13 @@ class AgentCoordinator:
                 'sentiment': SentimentAgent(),
                 'catalyst': CatalystAgent()
             }
+            self.using_mock_agents = False
             print("Agentes inicializados correctamente")
             
         except ImportError as e:
             print(f"Error importando agentes: {e}")
-            # Crear agentes mock para desarrollo
+            # Crear agentes mock para desarrollo (siempre en hilos: los procesos usan los agentes reales)
+            self.using_mock_agents = True
             self.agents = {
                 'technical': MockTechnicalAgent(),
                 'patterns': MockPatternAgent(),
@@ -57,29 +110,130 @@ class AgentCoordinator:
                 'catalyst': MockCatalystAgent()
             }
     
-    def _is_cache_valid(self, symbol: str) -> bool:
-        """Verifica si el cache es válido para un símbolo"""
-        if symbol not in self.analysis_cache:
-            return False
+    def _data_version(self, df: pd.DataFrame) -> str:
+        """Versión de los datos de precio: timestamp de la última barra"""
+        if df is None or len(df) == 0:
+            return None
+        return str(df.index[-1])
+    
+    def _summarize_data(self, df: pd.DataFrame) -> Dict:
+        """Resumen compacto del DataFrame de precios (lo que se expone en las respuestas)"""
+        summary = {
+            'rows': len(df),
+            'latest_price': float(df['close'].iloc[-1]),
+            'latest_volume': int(df['volume'].iloc[-1]),
+            'volume_avg_30d': float(df['volume'].tail(30).mean()),
+            'data_version': self._data_version(df)
+        }
+        if len(df) > 1:
+            summary['price_change_1d'] = float(df['close'].iloc[-1] - df['close'].iloc[-2])
+        return summary
+    
+    def get_price_frame(self, symbol: str, interval: str = "1d", period: str = "6mo") -> pd.DataFrame:
+        """
+        Devuelve el DataFrame con indicadores del último análisis técnico cacheado
         
-        cache_time = self.analysis_cache[symbol].get('timestamp')
-        if not cache_time:
-            return False
+        El DataFrame se guarda aparte del resumen técnico para que los resultados
+        cacheados sean compactos y serializables. No debe modificarse.
         
-        return datetime.now() - cache_time < self.cache_duration
+        Returns:
+            DataFrame o None si no está en cache
+        """
+        return self.analysis_cache.get((symbol, 'frame', (interval, period), None))
     
-    def _get_cached_analysis(self, symbol: str) -> Dict:
-        """Obtiene análisis del cache si es válido"""
-        if self._is_cache_valid(symbol):
-            return self.analysis_cache[symbol]['data']
-        return None
+    def cache_stats(self) -> Dict:
+        """Estadísticas del cache de análisis y de las peticiones agrupadas"""
+        stats = self.analysis_cache.stats()
+        stats['coalesced_requests'] = self.coalesced_requests
+        return stats
     
-    def _cache_analysis(self, symbol: str, analysis: Dict):
-        """Guarda análisis en cache"""
-        self.analysis_cache[symbol] = {
-            'data': analysis,
-            'timestamp': datetime.now()
-        }
+    async def _single_flight(self, key, coro_factory, cache: bool = False):
+        """
+        Ejecuta `coro_factory()` una sola vez por clave aunque lleguen peticiones concurrentes
+        
+        Args:
+            key: Clave de la operación
+            coro_factory: Función sin argumentos que devuelve la corrutina a ejecutar
+            cache: Guardar el resultado en el cache de análisis (salvo si contiene un error)
+            
+        Returns:
+            Resultado de la operación (compartido con las peticiones agrupadas)
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced_requests += 1
+        
+        if not is_leader:
+            return await asyncio.shield(asyncio.wrap_future(future))
+        
+        try:
+            result = await coro_factory()
+            if cache and not (isinstance(result, dict) and 'error' in result):
+                self.analysis_cache.set(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # El líder agotó su plazo: las peticiones agrupadas reciben un error, no una cancelación
+            future.set_exception(asyncio.TimeoutError(f"Operación cancelada: {key}"))
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+    
+    async def _run_agent_cached(self, symbol: str, agent: str, params: tuple,
+                                data_version: str, coro_factory) -> Dict:
+        """
+        Ejecuta un agente reutilizando su resultado cacheado
+        
+        La clave es (símbolo, agente, parámetros, versión de datos), de modo que un
+        análisis rápido y uno completo comparten los agentes que tienen en común y
+        una barra nueva invalida los resultados derivados del precio.
+        """
+        key = (symbol, agent, params, data_version)
+        cached = self.analysis_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        async def run():
+            return to_serializable(await coro_factory())
+        
+        return await self._single_flight(key, run, cache=True)
+    
+    async def _get_technical(self, symbol: str, interval: str = "1d", period: str = "6mo"):
+        """
+        Obtiene el análisis técnico como (resumen compacto, DataFrame de precios)
+        
+        Ambos se cachean por separado; si falta cualquiera de los dos se recalcula.
+        """
+        params = (interval, period)
+        summary = self.analysis_cache.get((symbol, 'technical', params, None))
+        df = self.get_price_frame(symbol, interval, period)
+        if summary is not None and df is not None:
+            return summary, df
+        
+        async def run():
+            result = await self._run_technical_analysis(symbol, interval, period)
+            if "error" in result:
+                return result, None
+            
+            df = result['data']
+            summary = {key: value for key, value in result.items() if key != 'data'}
+            summary['data_summary'] = self._summarize_data(df)
+            summary = to_serializable(summary)
+            
+            self.analysis_cache.set((symbol, 'technical', params, None), summary)
+            self.analysis_cache.set((symbol, 'frame', params, None), df)
+            return summary, df
+        
+        return await self._single_flight((symbol, 'technical_run', params, None), run)
     
     async def analyze_stock_comprehensive(self, symbol: str, 
                                         include_patterns: bool = True,
@@ -99,123 +253,189 @@ class AgentCoordinator:
         Returns:
             Diccionario con análisis completo
         """
-        # Verificar cache
-        cached = self._get_cached_analysis(symbol)
-        if cached:
-            return cached
+        # Si ya hay un análisis idéntico en curso, esperar su resultado
+        key = ('comprehensive', symbol, include_patterns, include_predictions,
+               include_sentiment, include_catalysts)
+        return await self._single_flight(
+            key,
+            lambda: self._compose_analysis(
+                symbol, include_patterns, include_predictions, include_sentiment, include_catalysts
+            )
+        )
+    
+    async def analyze_batch(self, symbols: List[str], max_concurrency: int = 16, **options):
+        """
+        Analiza muchas acciones con concurrencia acotada
         
-        print(f"Iniciando análisis comprehensivo para {symbol}...")
+        Cada resultado se entrega en cuanto termina, sin esperar a los demás.
+        
+        Args:
+            symbols: Símbolos a analizar
+            max_concurrency: Análisis simultáneos como máximo
+            **options: Opciones de `analyze_stock_comprehensive` (include_*)
+            
+        Yields:
+            Tuplas (símbolo, análisis) o (símbolo, excepción) en orden de finalización
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
         
-        # Análisis técnico base (siempre requerido)
-        technical_analysis = await self._run_technical_analysis(symbol)
+        async def analyze(symbol):
+            async with semaphore:
+                try:
+                    return symbol, await self.analyze_stock_comprehensive(symbol, **options)
+                except Exception as e:
+                    return symbol, e
         
-        if "error" in technical_analysis:
-            return technical_analysis
+        tasks = [asyncio.ensure_future(analyze(symbol)) for symbol in symbols]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _compose_analysis(self, symbol: str, include_patterns: bool,
+                                include_predictions: bool, include_sentiment: bool,
+                                include_catalysts: bool) -> Dict:
+        """Compone el análisis a partir de los resultados por agente (cacheados o calculados)"""
+        print(f"Iniciando análisis comprehensivo para {symbol}...")
         
-        # Preparar tareas asíncronas
-        tasks = []
+        def data_version(deps):
+            return deps['technical'][0]['data_summary']['data_version']
+        
+        # Análisis técnico base (siempre requerido); sentimiento y catalizadores no
+        # dependen de él y arrancan a la vez
+        tasks = [AgentTask(
+            'technical',
+            lambda deps: self._get_technical(symbol),
+            timeout=self.agent_timeouts.get('technical'),
+            is_error=lambda result: "error" in result[0]
+        )]
         
         if include_patterns:
-            tasks.append(self._run_pattern_analysis(symbol, technical_analysis['data']))
+            tasks.append(AgentTask(
+                'patterns',
+                lambda deps: self._run_agent_cached(
+                    symbol, 'patterns', (), data_version(deps),
+                    lambda: self._run_pattern_analysis(symbol, deps['technical'][1])
+                ),
+                depends_on=('technical',),
+                timeout=self.agent_timeouts.get('patterns')
+            ))
         
         if include_predictions:
-            tasks.append(self._run_prediction_analysis(symbol, technical_analysis['data']))
+            tasks.append(AgentTask(
+                'predictions',
+                lambda deps: self._run_agent_cached(
+                    symbol, 'predictor', (), data_version(deps),
+                    lambda: self._run_prediction_analysis(symbol, deps['technical'][1])
+                ),
+                depends_on=('technical',),
+                timeout=self.agent_timeouts.get('predictor')
+            ))
         
         if include_sentiment:
-            tasks.append(self._run_sentiment_analysis(symbol))
+            tasks.append(AgentTask(
+                'sentiment',
+                lambda deps: self._run_agent_cached(
+                    symbol, 'sentiment', (), None,
+                    lambda: self._run_sentiment_analysis(symbol)
+                ),
+                timeout=self.agent_timeouts.get('sentiment')
+            ))
         
         if include_catalysts:
-            tasks.append(self._run_catalyst_analysis(symbol))
-        
-        # Ejecutar análisis en paralelo
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Compilar resultados
+            tasks.append(AgentTask(
+                'catalysts',
+                lambda deps: self._run_agent_cached(
+                    symbol, 'catalyst', (), None,
+                    lambda: self._run_catalyst_analysis(symbol)
+                ),
+                timeout=self.agent_timeouts.get('catalyst')
+            ))
+        
+        results, status = await DagScheduler(deadline=self.analysis_deadline).run(tasks)
+        
+        # Sin análisis técnico no hay recomendación posible
+        if status['technical'] != STATUS_OK:
+            technical_error = results['technical']
+            if isinstance(technical_error, tuple):
+                technical_error = technical_error[0]
+            return dict(technical_error, symbol=symbol, agent_status=status,
+                        degraded=status['technical'] == STATUS_TIMEOUT)
+        
+        # Compilar resultados (los resultados por agente son compartidos con el cache: no modificar)
         comprehensive_analysis = {
             'symbol': symbol,
             'timestamp': datetime.now().isoformat(),
-            'technical': technical_analysis,
-            'patterns': None,
-            'predictions': None,
-            'sentiment': None,
-            'catalysts': None
+            'technical': results['technical'][0],
+            'patterns': results.get('patterns'),
+            'predictions': results.get('predictions'),
+            'sentiment': results.get('sentiment'),
+            'catalysts': results.get('catalysts'),
+            'agent_status': status,
+            'degraded': any(state in (STATUS_TIMEOUT, STATUS_SKIPPED) for state in status.values())
         }
         
-        # Asignar resultados
-        result_index = 0
-        if include_patterns:
-            comprehensive_analysis['patterns'] = results[result_index] if not isinstance(results[result_index], Exception) else {'error': str(results[result_index])}
-            result_index += 1
-        
-        if include_predictions:
-            comprehensive_analysis['predictions'] = results[result_index] if not isinstance(results[result_index], Exception) else {'error': str(results[result_index])}
-            result_index += 1
-        
-        if include_sentiment:
-            comprehensive_analysis['sentiment'] = results[result_index] if not isinstance(results[result_index], Exception) else {'error': str(results[result_index])}
-            result_index += 1
-        
-        if include_catalysts:
-            comprehensive_analysis['catalysts'] = results[result_index] if not isinstance(results[result_index], Exception) else {'error': str(results[result_index])}
-            result_index += 1
-        
         # Generar recomendación final
         comprehensive_analysis['final_recommendation'] = self._generate_final_recommendation(comprehensive_analysis)
         
-        # Guardar en cache
-        self._cache_analysis(symbol, comprehensive_analysis)
-        
         return comprehensive_analysis
     
-    async def _run_technical_analysis(self, symbol: str) -> Dict:
+    async def _run_technical_analysis(self, symbol: str, interval: str = "1d", period: str = "6mo") -> Dict:
         """Ejecuta análisis técnico"""
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
             self.executor,
             self.agents['technical'].analyze_stock,
-            symbol, "1d", "6mo"
+            symbol, interval, period
         )
     
-    async def _run_pattern_analysis(self, symbol: str, df: pd.DataFrame) -> Dict:
-        """Ejecuta análisis de patrones"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            self.executor,
-            self.agents['patterns'].analyze_patterns,
-            df, symbol
-        )
+    def _get_process_pool(self):
+        """Pool de procesos compartido, creado la primera vez que se necesita"""
+        with self._process_pool_lock:
+            if self._process_pool is None:
+                self._process_pool = create_process_pool(self.process_workers)
+            return self._process_pool
     
-    async def _run_prediction_analysis(self, symbol: str, df: pd.DataFrame) -> Dict:
-        """Ejecuta análisis de predicción"""
+    async def _run_frame_agent(self, agent: str, df: pd.DataFrame, *args, key: str = None) -> Dict:
+        """
+        Ejecuta un agente que trabaja sobre el DataFrame de precios
+        
+        Si el agente está configurado en 'process', el DataFrame se copia una vez a
+        memoria compartida y el trabajador lo reconstruye sin deserializarlo; si el
+        pool no está disponible se recurre al pool de hilos. Las llamadas con la
+        misma `key` (símbolo) van siempre al mismo proceso, que conserva su estado.
+        """
         loop = asyncio.get_event_loop()
         
-        def run_prediction():
+        if self.agent_executors.get(agent) == 'process' and not self.using_mock_agents:
             try:
-                # Crear características y entrenar modelos
-                features_df = self.agents['predictor'].create_features(df)
-                targets_df = self.agents['predictor'].create_targets(df)
-                
-                # Entrenar modelos (solo si no están entrenados)
-                if not hasattr(self.agents['predictor'], 'model_performance') or not self.agents['predictor'].model_performance:
-                    self.agents['predictor'].train_models(features_df, targets_df)
-                
-                # Generar predicciones
-                predictions = self.agents['predictor'].predict(features_df)
-                
-                # Generar señales de trading
-                current_price = df['close'].iloc[-1]
-                signals = self.agents['predictor'].generate_trading_signals(predictions, current_price)
-                
-                return {
-                    'predictions': predictions,
-                    'trading_signals': signals,
-                    'current_price': current_price,
-                    'confidence': self.agents['predictor'].get_prediction_confidence(predictions)
-                }
+                shared = SharedFrame(df)
             except Exception as e:
-                return {'error': str(e)}
+                print(f"Memoria compartida no disponible para {agent}, usando hilos: {e}")
+            else:
+                try:
+                    return await loop.run_in_executor(
+                        self._get_process_pool().pool_for(key), run_frame_task, agent, shared.handle, *args
+                    )
+                except BrokenProcessPool as e:
+                    print(f"Pool de procesos caído, {agent} pasa a ejecutarse en hilos: {e}")
+                    self.agent_executors[agent] = 'thread'
+                finally:
+                    shared.release()
         
-        return await loop.run_in_executor(self.executor, run_prediction)
+        return await loop.run_in_executor(
+            self.executor, FRAME_TASKS[agent], self.agents[agent], df, *args
+        )
+    
+    async def _run_pattern_analysis(self, symbol: str, df: pd.DataFrame) -> Dict:
+        """Ejecuta análisis de patrones"""
+        return await self._run_frame_agent('patterns', df, symbol, key=symbol)
+    
+    async def _run_prediction_analysis(self, symbol: str, df: pd.DataFrame) -> Dict:
+        """Ejecuta análisis de predicción"""
+        return await self._run_frame_agent('predictor', df, key=symbol)
     
     async def _run_sentiment_analysis(self, symbol: str) -> Dict:
         """Ejecuta análisis de sentimiento"""
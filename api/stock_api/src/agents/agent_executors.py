@@ -0,0 +1,250 @@
+"""
+Ejecutores de Agentes
+Ejecución de los agentes intensivos en CPU en un pool de procesos, pasando los
+DataFrames de precios por memoria compartida en lugar de serializarlos
+"""
+
+import os
+import zlib
+import itertools
+import numpy as np
+import pandas as pd
+from multiprocessing import get_context, shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Hashable, Optional
+
+try:
+    from .analysis_cache import to_serializable
+except ImportError:
+    from analysis_cache import to_serializable
+
+# Ejecutor por defecto de cada agente: 'thread' (E/S, red) o 'process' (CPU)
+DEFAULT_AGENT_EXECUTORS = {
+    'technical': 'thread',
+    'patterns': 'process',
+    'predictor': 'process',
+    'sentiment': 'thread',
+    'catalyst': 'thread'
+}
+
+# Alineación de cada columna dentro del bloque compartido
+_ALIGNMENT = 64
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class SharedFrame:
+    """
+    DataFrame copiado una única vez a un bloque de memoria compartida
+
+    Cada columna numérica o booleana (y el índice) ocupa una región del bloque
+    con su dtype original; `handle` es un descriptor pequeño y serializable con
+    el que otro proceso reconstruye el DataFrame sobre el mismo buffer, sin
+    copiar los datos. Las columnas no numéricas se omiten.
+
+    El proceso que crea el bloque es su propietario y debe llamar a `release()`
+    cuando los procesos consumidores hayan terminado.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        columns = [col for col in df.columns
+                   if pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col])]
+
+        index_tz = None
+        index_unit = None
+        if isinstance(df.index, pd.DatetimeIndex):
+            index_kind = 'datetime'
+            index_tz = str(df.index.tz) if df.index.tz is not None else None
+            index_unit = df.index.unit
+            index_values = df.index.asi8
+        else:
+            index_kind = 'values'
+            index_values = np.asarray(df.index)
+            if not (np.issubdtype(index_values.dtype, np.number) or index_values.dtype == bool):
+                index_kind = 'range'
+                index_values = np.arange(len(df.index), dtype=np.int64)
+
+        arrays = [('__index__', np.ascontiguousarray(index_values))]
+        arrays += [(col, np.ascontiguousarray(df[col].to_numpy())) for col in columns]
+
+        layout = []
+        offset = 0
+        for name, values in arrays:
+            offset = _aligned(offset)
+            layout.append((name, offset, values.dtype.str))
+            offset += values.nbytes
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (name, start, dtype), (_, values) in zip(layout, arrays):
+            target = np.ndarray(values.shape, dtype=values.dtype, buffer=self.shm.buf, offset=start)
+            target[:] = values
+
+        self.handle = {
+            'name': self.shm.name,
+            'rows': len(df),
+            'layout': layout,
+            'index_kind': index_kind,
+            'index_tz': index_tz,
+            'index_unit': index_unit,
+            'index_name': df.index.name
+        }
+
+    def release(self):
+        """Libera el bloque de memoria compartida"""
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def attach_frame(handle: Dict):
+    """
+    Reconstruye un DataFrame sobre el bloque compartido descrito por `handle`
+
+    Returns:
+        Tupla (DataFrame, SharedMemory). El SharedMemory debe cerrarse (no
+        desvincularse) cuando ya no se use el DataFrame.
+    """
+    shm = shared_memory.SharedMemory(name=handle['name'])
+    rows = handle['rows']
+
+    arrays = {}
+    for name, start, dtype in handle['layout']:
+        arrays[name] = np.ndarray((rows,), dtype=np.dtype(dtype), buffer=shm.buf, offset=start)
+
+    index_values = arrays.pop('__index__')
+    if handle['index_kind'] == 'datetime':
+        index = pd.DatetimeIndex(index_values.view(f"M8[{handle['index_unit']}]"), name=handle['index_name'])
+        if handle['index_tz']:
+            index = index.tz_localize('UTC').tz_convert(handle['index_tz'])
+    else:
+        index = pd.Index(index_values, name=handle['index_name'], copy=False)
+
+    df = pd.DataFrame(arrays, index=index, copy=False)
+    return df, shm
+
+
+def run_prediction(predictor, df: pd.DataFrame) -> Dict:
+    """Entrena (una vez) el predictor y genera predicciones y señales para un DataFrame"""
+    try:
+        # Crear características y entrenar modelos
+        features_df = predictor.create_features(df)
+        targets_df = predictor.create_targets(df)
+
+        # Entrenar modelos (solo si no están entrenados)
+        if not hasattr(predictor, 'model_performance') or not predictor.model_performance:
+            predictor.train_models(features_df, targets_df)
+
+        # Generar predicciones
+        predictions = predictor.predict(features_df)
+
+        # Generar señales de trading
+        current_price = df['close'].iloc[-1]
+        signals = predictor.generate_trading_signals(predictions, current_price)
+
+        return {
+            'predictions': predictions,
+            'trading_signals': signals,
+            'current_price': current_price,
+            'confidence': predictor.get_prediction_confidence(predictions)
+        }
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def run_patterns(detector, df: pd.DataFrame, symbol: str) -> Dict:
+    """Detecta patrones y genera el gráfico de velas"""
+    return detector.analyze_patterns(df, symbol)
+
+
+# Agentes de cada proceso trabajador (se crean la primera vez que se usan)
+_worker_agents = {}
+
+
+def _worker_agent(agent: str):
+    if agent not in _worker_agents:
+        if agent == 'patterns':
+            try:
+                from .pattern_detector import PatternDetector
+            except ImportError:
+                from pattern_detector import PatternDetector
+            _worker_agents[agent] = PatternDetector()
+        elif agent == 'predictor':
+            try:
+                from .multi_temporal_predictor import MultiTemporalPredictor
+            except ImportError:
+                from multi_temporal_predictor import MultiTemporalPredictor
+            _worker_agents[agent] = MultiTemporalPredictor()
+        else:
+            raise ValueError(f"Agente sin ejecución en proceso: {agent}")
+    return _worker_agents[agent]
+
+
+FRAME_TASKS = {
+    'patterns': run_patterns,
+    'predictor': run_prediction
+}
+
+
+def run_frame_task(agent: str, handle: Dict, *args) -> Dict:
+    """
+    Punto de entrada en el proceso trabajador
+
+    Adjunta el DataFrame compartido, ejecuta la tarea del agente y devuelve un
+    resultado ya serializable (sin referencias al buffer compartido).
+    """
+    df, shm = attach_frame(handle)
+    try:
+        return to_serializable(FRAME_TASKS[agent](_worker_agent(agent), df, *args))
+    finally:
+        del df
+        try:
+            shm.close()
+        except BufferError:
+            # Aún quedan vistas vivas (p. ej. en una traza); el mapeo se libera con ellas
+            pass
+
+
+class ShardedProcessPool:
+    """
+    Pools de un proceso cada uno; las tareas de una misma clave (símbolo) van
+    siempre al mismo proceso
+
+    Los agentes guardan estado por símbolo en el trabajador (p. ej. el
+    seguimiento incremental de PatternDetector). Con un único pool cada
+    llamada caería en un proceso al azar y ese estado se repetiría en todos;
+    enrutando por clave, cada símbolo vive en un solo trabajador.
+    """
+
+    def __init__(self, max_workers: int):
+        context = get_context('spawn')
+        self.pools = [ProcessPoolExecutor(max_workers=1, mp_context=context) for _ in range(max_workers)]
+        self._next = itertools.count()
+
+    def pool_for(self, key: Optional[Hashable] = None) -> ProcessPoolExecutor:
+        """Pool del trabajador asignado a `key` (sin clave: reparto rotatorio)"""
+        if key is None:
+            slot = next(self._next)
+        else:
+            slot = zlib.crc32(str(key).encode('utf-8'))
+        return self.pools[slot % len(self.pools)]
+
+    def shutdown(self, wait: bool = True):
+        """Detiene los procesos de todos los pools"""
+        for pool in self.pools:
+            pool.shutdown(wait=wait)
+
+
+def create_process_pool(max_workers: Optional[int] = None) -> ShardedProcessPool:
+    """Pool de procesos con arranque 'spawn' (seguro junto a los hilos del servidor)"""
+    max_workers = max_workers or os.cpu_count() or 1
+    return ShardedProcessPool(max_workers)
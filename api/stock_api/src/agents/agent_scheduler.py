@@ -0,0 +1,143 @@
+"""
+Planificador de Agentes
+Ejecuta los agentes como un grafo de dependencias (DAG) con presupuesto de tiempo
+por agente y plazo global, devolviendo resultados parciales si alguno no llega
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Estados posibles de cada agente tras la ejecución
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_TIMEOUT = 'timeout'
+STATUS_SKIPPED = 'skipped'
+
+
+def _has_error(result) -> bool:
+    return isinstance(result, dict) and 'error' in result
+
+
+class AgentTask:
+    """
+    Nodo del grafo de agentes
+
+    Args:
+        name: Nombre del agente
+        run: Función que recibe los resultados de sus dependencias (dict nombre -> resultado)
+            y devuelve la corrutina a ejecutar
+        depends_on: Nombres de los agentes de los que depende
+        timeout: Presupuesto de tiempo en segundos (None: solo el plazo global)
+        is_error: Predicado que indica si un resultado es un error (default: dict con 'error')
+    """
+
+    def __init__(self, name: str, run: Callable, depends_on: Iterable[str] = (),
+                 timeout: Optional[float] = None, is_error: Callable = _has_error):
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.is_error = is_error
+
+
+class DagScheduler:
+    """
+    Planificador de agentes con dependencias y plazos
+
+    Todos los agentes arrancan a la vez; cada uno espera solo a sus
+    dependencias, de modo que los independientes (sentimiento, catalizadores)
+    no esperan a la descarga de precios. Un agente que agota su presupuesto se
+    marca como 'timeout' y los que dependen de él como 'skipped'; el resto de
+    resultados se devuelve igualmente.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        """
+        Args:
+            deadline: Plazo global en segundos para todo el grafo
+        """
+        self.deadline = deadline
+
+    def _validate(self, tasks: Dict[str, AgentTask]):
+        for task in tasks.values():
+            for dependency in task.depends_on:
+                if dependency not in tasks:
+                    raise ValueError(f"{task.name} depende de un agente no declarado: {dependency}")
+
+        # Detectar ciclos
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependencia circular en el agente {name}")
+            visiting.add(name)
+            for dependency in tasks[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in tasks:
+            visit(name)
+
+    async def run(self, tasks: Iterable[AgentTask]) -> Tuple[Dict, Dict]:
+        """
+        Ejecuta el grafo
+
+        Args:
+            tasks: Nodos del grafo
+
+        Returns:
+            Tupla (resultados, estados): resultados por agente (un dict con 'error'
+            para los que fallan, agotan el plazo o se omiten) y estado de cada uno
+        """
+        tasks = {task.name: task for task in tasks}
+        self._validate(tasks)
+
+        loop = asyncio.get_event_loop()
+        started = loop.time()
+        results = {}
+        status = {}
+        done = {name: loop.create_future() for name in tasks}
+
+        async def execute(task: AgentTask):
+            try:
+                # Esperar a las dependencias
+                for dependency in task.depends_on:
+                    await done[dependency]
+                failed = [dep for dep in task.depends_on if status[dep] != STATUS_OK]
+                if failed:
+                    status[task.name] = STATUS_SKIPPED
+                    results[task.name] = {'error': f"Omitido: dependencias no disponibles ({', '.join(failed)})"}
+                    return
+
+                # Presupuesto: el menor entre el del agente y lo que queda del plazo global
+                budgets = []
+                if task.timeout is not None:
+                    budgets.append(task.timeout)
+                if self.deadline is not None:
+                    budgets.append(max(self.deadline - (loop.time() - started), 0))
+                timeout = min(budgets) if budgets else None
+
+                dependency_results = {dep: results[dep] for dep in task.depends_on}
+                agent_started = time.monotonic()
+                try:
+                    result = await asyncio.wait_for(task.run(dependency_results), timeout=timeout)
+                except asyncio.TimeoutError:
+                    status[task.name] = STATUS_TIMEOUT
+                    results[task.name] = {'error': f"Tiempo agotado tras {time.monotonic() - agent_started:.1f}s"}
+                    return
+                except Exception as e:
+                    status[task.name] = STATUS_ERROR
+                    results[task.name] = {'error': str(e)}
+                    return
+
+                results[task.name] = result
+                status[task.name] = STATUS_ERROR if task.is_error(result) else STATUS_OK
+            finally:
+                done[task.name].set_result(None)
+
+        await asyncio.gather(*(execute(task) for task in tasks.values()))
+        return results, status
@@ -0,0 +1,233 @@
+"""
+Cache de Análisis Acotado
+Cache TTL + LRU segura entre hilos, con límite de entradas y de memoria y estadísticas de uso
+"""
+
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def estimate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """
+    Estima la memoria ocupada por un objeto (recorriendo dicts, listas y DataFrames)
+
+    Args:
+        obj: Objeto a medir
+
+    Returns:
+        Tamaño aproximado en bytes
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True, index=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(
+            estimate_size(key, _seen) + estimate_size(value, _seen) for key, value in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(estimate_size(item, _seen) for item in obj)
+    return sys.getsizeof(obj)
+
+
+def to_serializable(obj: Any) -> Any:
+    """
+    Convierte un resultado a tipos nativos de Python listos para JSON
+
+    Los escalares y arrays de NumPy pasan a int/float/list, las fechas a ISO 8601
+    y las Series/DataFrames a listas. Se aplica una sola vez al guardar en cache,
+    de modo que servir un acierto no requiere conversiones ni copias.
+
+    Args:
+        obj: Objeto a convertir
+
+    Returns:
+        Objeto equivalente formado por dicts, listas y escalares nativos
+    """
+    if isinstance(obj, dict):
+        return {
+            (key if isinstance(key, (str, int, float, bool)) or key is None else str(key)): to_serializable(value)
+            for key, value in obj.items()
+        }
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return [to_serializable(item) for item in obj]
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, (pd.Timestamp, datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return to_serializable(obj.tolist())
+    if isinstance(obj, pd.Series):
+        return to_serializable(obj.tolist())
+    if isinstance(obj, pd.DataFrame):
+        return to_serializable(obj.to_dict(orient='records'))
+    return obj
+
+
+class AnalysisCache:
+    """
+    Cache con expiración por TTL y desalojo LRU
+
+    Mantiene como máximo `max_entries` entradas y `max_bytes` bytes estimados;
+    al superar cualquiera de los dos límites se desalojan las entradas usadas
+    hace más tiempo (avisando a `on_evict`, si se indica). Todas las
+    operaciones están protegidas por un lock, por lo que puede usarse desde
+    los hilos del ThreadPoolExecutor.
+    """
+
+    def __init__(self, max_entries: int = 500, max_bytes: int = 256 * 1024 * 1024,
+                 ttl: timedelta = timedelta(minutes=15),
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl.total_seconds() if isinstance(ttl, timedelta) else float(ttl)
+        self.on_evict = on_evict  # Recibe (clave, valor) de cada entrada desalojada por LRU
+
+        self._entries = OrderedDict()  # clave -> (valor, tamaño, instante de expiración)
+        self._lock = threading.RLock()
+        self._bytes = 0
+
+        # Estadísticas
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+    def _remove(self, key: Hashable):
+        """Elimina una entrada (con el lock adquirido)"""
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Obtiene un valor si existe y no ha expirado
+
+        Args:
+            key: Clave de la entrada
+            default: Valor devuelto si no está en cache
+
+        Returns:
+            Valor cacheado o `default`
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, _, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None,
+            ttl: Optional[float] = None) -> bool:
+        """
+        Guarda un valor desalojando entradas antiguas si hace falta
+
+        Args:
+            key: Clave de la entrada
+            value: Valor a guardar
+            size: Tamaño en bytes (default: estimado)
+            ttl: Segundos de vida (default: el TTL de la cache)
+
+        Returns:
+            False si el valor no cabe en el presupuesto de memoria
+        """
+        size = estimate_size(value) if size is None else size
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            if size > self.max_bytes:
+                self.rejected += 1
+                return False
+
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                evicted.append((oldest_key, self._entries[oldest_key][0]))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+        # Fuera del lock: el callback puede hacer E/S
+        if self.on_evict is not None:
+            for evicted_key, evicted_value in evicted:
+                self.on_evict(evicted_key, evicted_value)
+        return True
+
+    def delete(self, key: Hashable):
+        """Elimina una entrada si existe"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def purge_expired(self) -> int:
+        """Elimina todas las entradas expiradas y devuelve cuántas había"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, _, expires_at) in self._entries.items() if now >= expires_at]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+            return len(expired)
+
+    def clear(self):
+        """Vacía la cache (manteniendo las estadísticas)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.monotonic() < entry[2]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Contadores de uso y tamaño de la cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'rejected': self.rejected
+            }
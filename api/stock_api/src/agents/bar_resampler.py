@@ -0,0 +1,252 @@
+"""
+Remuestreo de Barras OHLCV
+Agrega barras diarias en barras semanales o mensuales reales (primera apertura,
+máximo, mínimo, último cierre y volumen sumado) y las mantiene al día de forma
+incremental
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+try:
+    from .bar_store import BarStore, _to_epoch, TimeLike
+except ImportError:
+    from bar_store import BarStore, _to_epoch, TimeLike
+
+# Intervalos que se construyen a partir de las barras diarias
+RESAMPLE_INTERVALS = ('1wk', '1mo')
+
+# Columnas y función de agregación de cada una
+AGGREGATIONS = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+    'adj_close': 'last'
+}
+
+SECONDS_PER_DAY = 86400
+
+
+def period_keys(timestamps: np.ndarray, interval: str) -> np.ndarray:
+    """
+    Período (semana de lunes a domingo o mes natural) de cada timestamp
+
+    Args:
+        timestamps: Segundos UNIX (int64)
+        interval: '1wk' o '1mo'
+
+    Returns:
+        Array int64 con un identificador creciente por período
+    """
+    days = np.floor_divide(timestamps, SECONDS_PER_DAY)
+    if interval == '1wk':
+        return np.floor_divide(days + 3, 7)  # El 1 de enero de 1970 fue jueves
+    if interval == '1mo':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"Intervalo de remuestreo no soportado: {interval}")
+
+
+def resample_arrays(timestamps: np.ndarray, columns: Dict[str, np.ndarray], interval: str) -> Dict[str, np.ndarray]:
+    """
+    Agrega barras diarias ordenadas por período
+
+    Cada barra resultante lleva el timestamp de su primera barra diaria.
+
+    Args:
+        timestamps: Segundos UNIX ordenados (int64)
+        columns: Arrays por columna (open, high, low, close, volume, adj_close)
+        interval: '1wk' o '1mo'
+
+    Returns:
+        Diccionario con 'timestamp' y las columnas agregadas
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if len(timestamps) == 0:
+        return {'timestamp': timestamps, **{name: np.asarray(values)[:0] for name, values in columns.items()}}
+
+    keys = period_keys(timestamps, interval)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(timestamps)] - 1
+
+    result = {'timestamp': timestamps[starts]}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        how = AGGREGATIONS.get(name, 'last')
+        if how == 'first':
+            result[name] = values[starts]
+        elif how == 'last':
+            result[name] = values[ends]
+        elif how == 'max':
+            result[name] = np.maximum.reduceat(values, starts)
+        elif how == 'min':
+            result[name] = np.minimum.reduceat(values, starts)
+        else:
+            result[name] = np.add.reduceat(values, starts)
+    return result
+
+
+class ResampledBars:
+    """
+    Serie remuestreada de un símbolo con actualización incremental
+
+    Guarda las barras agregadas y las barras diarias del período abierto (el
+    último). Al llegar barras diarias nuevas solo se reagregan ese período y
+    los posteriores, de modo que el coste es proporcional a las barras nuevas.
+    """
+
+    def __init__(self, interval: str):
+        if interval not in RESAMPLE_INTERVALS:
+            raise ValueError(f"Intervalo de remuestreo no soportado: {interval}")
+        self.interval = interval
+        self.bars = None  # timestamp + columnas agregadas
+        self._tail = None  # Barras diarias del período abierto
+        self.last_timestamp = None  # Última barra diaria incorporada
+
+    def __len__(self) -> int:
+        return 0 if self.bars is None else len(self.bars['timestamp'])
+
+    def rebuild(self, timestamps: np.ndarray, columns: Dict[str, np.ndarray]):
+        """Reconstruye la serie completa a partir de todas las barras diarias"""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.bars = resample_arrays(timestamps, columns, self.interval)
+        self._set_tail(timestamps, columns)
+
+    def update(self, timestamps: np.ndarray, columns: Dict[str, np.ndarray]) -> bool:
+        """
+        Incorpora barras diarias nuevas (o revisadas) al final de la serie
+
+        Args:
+            timestamps: Segundos UNIX ordenados de las barras nuevas
+            columns: Arrays por columna
+
+        Returns:
+            False si las barras empiezan antes del período abierto (hace falta `rebuild`)
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if len(timestamps) == 0:
+            return True
+        if self.bars is None or len(self) == 0:
+            self.rebuild(timestamps, columns)
+            return True
+
+        tail_ts = self._tail['timestamp']
+        if timestamps[0] < tail_ts[0]:
+            return False
+
+        # Período abierto + barras nuevas (las nuevas sustituyen a las del mismo timestamp)
+        keep = ~np.isin(tail_ts, timestamps)
+        merged_ts = np.concatenate([tail_ts[keep], timestamps])
+        order = np.argsort(merged_ts, kind='stable')
+        merged_ts = merged_ts[order]
+        merged = {
+            name: np.concatenate([self._tail[name][keep], np.asarray(columns[name])])[order]
+            for name in self.bars if name != 'timestamp'
+        }
+
+        chunk = resample_arrays(merged_ts, merged, self.interval)
+        self.bars = {name: np.concatenate([values[:-1], chunk[name]]) for name, values in self.bars.items()}
+        self._set_tail(merged_ts, merged)
+        return True
+
+    @property
+    def open_period_bars(self) -> int:
+        """Barras diarias del período abierto"""
+        return 0 if self._tail is None else len(self._tail['timestamp'])
+
+    @property
+    def open_period_start(self) -> Optional[int]:
+        """Timestamp de la primera barra diaria del período abierto"""
+        return None if self._tail is None else int(self._tail['timestamp'][0])
+
+    def _set_tail(self, timestamps: np.ndarray, columns: Dict[str, np.ndarray]):
+        if len(timestamps) == 0:
+            self._tail = None
+            self.last_timestamp = None
+            return
+        keys = period_keys(timestamps, self.interval)
+        start = int(np.searchsorted(keys, keys[-1], side='left'))
+        self._tail = {'timestamp': timestamps[start:].copy()}
+        self._tail.update({name: np.asarray(values)[start:].copy() for name, values in columns.items()})
+        self.last_timestamp = int(timestamps[-1])
+
+    def frame(self, start: TimeLike = None, end: TimeLike = None) -> pd.DataFrame:
+        """Barras remuestreadas como DataFrame indexado por 'datetime'"""
+        if not len(self):
+            return pd.DataFrame()
+        timestamps = self.bars['timestamp']
+        lo = 0 if start is None else np.searchsorted(timestamps, _to_epoch(start), side='left')
+        hi = len(timestamps) if end is None else np.searchsorted(timestamps, _to_epoch(end), side='right')
+        df = pd.DataFrame({name: values[lo:hi] for name, values in self.bars.items() if name != 'timestamp'})
+        df.index = pd.DatetimeIndex(pd.to_datetime(timestamps[lo:hi], unit='s'), name='datetime')
+        return df
+
+
+class BarResampler:
+    """
+    Barras semanales y mensuales construidas desde las barras diarias del almacén
+
+    Cada (símbolo, intervalo) se agrega una vez y se cachea en memoria; en las
+    lecturas siguientes solo se leen y agregan las barras diarias posteriores
+    al inicio del período abierto. Si el almacén diario se amplía hacia atrás
+    o cambian sus barras anteriores al período abierto, la serie se reconstruye.
+    """
+
+    def __init__(self, bar_store: Optional[BarStore] = None):
+        self.bar_store = bar_store if bar_store is not None else BarStore()
+        self._series = {}
+        self._versions = {}  # Versión del almacén diario incorporada y barras anteriores al período abierto
+        self._lock = threading.Lock()
+
+    def _daily_arrays(self, symbol: str, start: TimeLike = None):
+        df = self.bar_store.read(symbol, '1d', start=start)
+        if df.empty:
+            return np.empty(0, dtype=np.int64), {}
+        timestamps = df.index.values.astype('datetime64[s]').astype(np.int64)
+        columns = {name: df[name].to_numpy() for name in AGGREGATIONS if name in df.columns}
+        return timestamps, columns
+
+    def series(self, symbol: str, interval: str) -> ResampledBars:
+        """Serie remuestreada al día con el almacén diario"""
+        key = (symbol.upper(), interval)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ResampledBars(interval)
+
+            meta = self.bar_store.metadata(symbol, '1d')
+            if meta is None or meta['rows'] == 0:
+                return series
+
+            version = (meta['first_timestamp'], meta['covered_from'], meta['rows'],
+                       meta['last_timestamp'], meta['revision'])
+            previous = self._versions.get(key)
+            if not len(series) or previous is None or previous[0][:2] != version[:2]:
+                # Sin serie o histórico ampliado hacia atrás: agregar todo
+                series.rebuild(*self._daily_arrays(symbol))
+            elif previous[0] != version:
+                # Releer solo desde el inicio del período abierto
+                timestamps, columns = self._daily_arrays(symbol, start=pd.Timestamp(series.open_period_start, unit='s'))
+                # Las barras anteriores deben ser las mismas que ya se agregaron
+                if previous[1] + len(timestamps) != meta['rows'] or not series.update(timestamps, columns):
+                    series.rebuild(*self._daily_arrays(symbol))
+            self._versions[key] = (version, meta['rows'] - series.open_period_bars)
+            return series
+
+    def read(self, symbol: str, interval: str, start: TimeLike = None, end: TimeLike = None) -> pd.DataFrame:
+        """
+        Lee barras semanales o mensuales
+
+        Args:
+            symbol: Símbolo de la acción
+            interval: '1wk' o '1mo'
+            start: Fecha inicial incluida (opcional)
+            end: Fecha final incluida (opcional)
+
+        Returns:
+            DataFrame OHLCV indexado por 'datetime' (vacío si no hay barras diarias)
+        """
+        return self.series(symbol, interval).frame(start, end)
@@ -0,0 +1,423 @@
+"""
+Almacén Local Columnar de Barras OHLCV
+Persiste en disco un fichero por símbolo e intervalo con arrays tipados e índice temporal
+
+Convención única para todas las fuentes: precios OHLC sin ajustar más la
+columna 'adj_close' (como la API de gráficos de Yahoo Finance), y barras
+diarias, semanales y mensuales indexadas por la fecha de la sesión (medianoche
+UTC), de modo que la misma sesión descargada por vías distintas es una sola fila.
+"""
+
+import os
+import re
+import threading
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Union
+
+# Directorio por defecto del almacén (configurable por variable de entorno)
+DEFAULT_STORE_DIR = os.environ.get(
+    'STOCKAI_BAR_STORE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'bars')
+)
+
+# Columnas persistidas y su tipo
+FLOAT_COLUMNS = ('open', 'high', 'low', 'close', 'adj_close')
+INT_COLUMNS = ('volume',)
+BAR_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'adj_close')
+
+# Duración aproximada de cada período de la API de Yahoo Finance
+RANGE_DELTAS = {
+    '1d': timedelta(days=1),
+    '5d': timedelta(days=5),
+    '1mo': timedelta(days=31),
+    '3mo': timedelta(days=92),
+    '6mo': timedelta(days=183),
+    '1y': timedelta(days=366),
+    '2y': timedelta(days=731),
+    '5y': timedelta(days=1827),
+    '10y': timedelta(days=3653)
+}
+
+# Correspondencia de columnas con los DataFrames de yfinance
+YFINANCE_COLUMNS = {
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Volume': 'volume'
+}
+
+SECONDS_PER_DAY = 86400
+
+TimeLike = Union[datetime, pd.Timestamp, int, float, str, None]
+
+
+def period_start(range_period: str, now: Optional[datetime] = None) -> Optional[pd.Timestamp]:
+    """
+    Convierte un período de la API (6mo, 1y, ytd, max...) en la fecha de inicio equivalente
+
+    Args:
+        range_period: Período de datos
+        now: Fecha de referencia (default: ahora, UTC)
+
+    Returns:
+        Timestamp de inicio (UTC, sin zona horaria) o None para 'max'
+    """
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp.now(tz='UTC')
+    if now.tzinfo is not None:
+        now = now.tz_convert('UTC').tz_localize(None)
+
+    if range_period == 'max':
+        return None
+    if range_period == 'ytd':
+        return pd.Timestamp(year=now.year, month=1, day=1)
+    if range_period in RANGE_DELTAS:
+        return now - RANGE_DELTAS[range_period]
+
+    # yfinance también acepta períodos como '90d'
+    match = re.fullmatch(r'(\d+)d', range_period)
+    if match:
+        return now - timedelta(days=int(match.group(1)))
+
+    raise ValueError(f"Período no soportado: {range_period}")
+
+
+def delta_range(last_timestamp: TimeLike, interval: str = "1d",
+                now: Optional[datetime] = None) -> str:
+    """
+    Elige el período más pequeño de la API que cubre las barras posteriores a una fecha
+
+    Incluye al menos un intervalo de solapamiento para volver a descargar la
+    última barra almacenada (que puede haber sido provisional).
+
+    Args:
+        last_timestamp: Timestamp de la última barra almacenada
+        interval: Intervalo de las barras
+        now: Fecha de referencia (default: ahora, UTC)
+
+    Returns:
+        Período de la API (1d, 5d, 1mo...) o 'max'
+    """
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp.now(tz='UTC')
+    if now.tzinfo is not None:
+        now = now.tz_convert('UTC').tz_localize(None)
+
+    gap = now - pd.Timestamp(_to_epoch(last_timestamp), unit='s') + interval_to_timedelta(interval)
+    for range_period, delta in RANGE_DELTAS.items():
+        if delta >= gap:
+            return range_period
+
+    return 'max'
+
+
+def interval_to_timedelta(interval: str) -> timedelta:
+    """
+    Convierte un intervalo de barras (1m, 1h, 1d, 1wk, 1mo) en su duración
+
+    Args:
+        interval: Intervalo de tiempo
+
+    Returns:
+        Duración de una barra
+    """
+    match = re.fullmatch(r'(\d+)(m|h|d|wk|mo)', interval)
+    if not match:
+        raise ValueError(f"Intervalo no soportado: {interval}")
+
+    amount, unit = int(match.group(1)), match.group(2)
+    if unit == 'm':
+        return timedelta(minutes=amount)
+    if unit == 'h':
+        return timedelta(hours=amount)
+    if unit == 'd':
+        return timedelta(days=amount)
+    if unit == 'wk':
+        return timedelta(weeks=amount)
+    return timedelta(days=30 * amount)
+
+
+def keyed_by_date(interval: str) -> bool:
+    """Indica si las barras del intervalo se indexan por fecha de sesión (1d, 1wk, 1mo...)"""
+    return re.fullmatch(r'\d+(d|wk|mo)', interval) is not None
+
+
+def session_dates(index: pd.Index, utc_offset: int = 0) -> pd.DatetimeIndex:
+    """
+    Fecha de la sesión de cada barra, como medianoche sin zona horaria
+
+    Args:
+        index: Índice temporal; si tiene zona horaria se usa la fecha local
+        utc_offset: Desfase en segundos de la bolsa respecto a UTC (índices sin zona)
+
+    Returns:
+        DatetimeIndex con las fechas de sesión
+    """
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    elif utc_offset:
+        index = index + pd.Timedelta(seconds=utc_offset)
+    return index.normalize().rename('datetime')
+
+
+def from_yfinance(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte un histórico diario de yfinance (Open, High...) al formato del almacén
+
+    Requiere precios sin ajustar (`auto_adjust=False`): el cierre ajustado se
+    toma de 'Adj Close'.
+    """
+    bars = data[list(YFINANCE_COLUMNS)].rename(columns=YFINANCE_COLUMNS)
+    if 'Adj Close' not in data:
+        raise ValueError("Se requiere un histórico de yfinance sin ajustar (auto_adjust=False)")
+    bars['adj_close'] = data['Adj Close']
+    bars.index = session_dates(bars.index)
+    return bars.dropna()
+
+
+def to_yfinance(bars: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte barras del almacén al formato de columnas de yfinance
+
+    Los precios se ajustan con el factor adj_close / close, igual que
+    `auto_adjust=True` de yfinance.
+    """
+    data = bars[list(YFINANCE_COLUMNS.values())].rename(
+        columns={value: key for key, value in YFINANCE_COLUMNS.items()}
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = np.where(bars['close'] > 0, bars['adj_close'] / bars['close'], 1.0)
+    for column in ('Open', 'High', 'Low', 'Close'):
+        data[column] = data[column] * factor
+    return data
+
+
+def _to_epoch(value: TimeLike) -> Optional[int]:
+    """Convierte una fecha a segundos UNIX (UTC)"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return int(ts.value // 10**9)
+
+
+def _index_to_epoch(index: pd.Index) -> np.ndarray:
+    """Convierte un DatetimeIndex (con o sin zona horaria) a segundos UNIX"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.values.astype('datetime64[s]').astype(np.int64)
+
+
+class BarStore:
+    """
+    Almacén persistente de barras OHLCV en formato columnar
+
+    Cada par (símbolo, intervalo) se guarda en un fichero .npz con un array
+    int64 de timestamps ordenados y un array tipado por columna, más metadatos
+    de cobertura (desde qué fecha se descargó) y de última actualización.
+    """
+
+    def __init__(self, base_dir: Optional[str] = None):
+        self.base_dir = os.path.abspath(base_dir or DEFAULT_STORE_DIR)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _path(self, symbol: str, interval: str) -> str:
+        """Ruta del fichero para un símbolo e intervalo"""
+        safe_symbol = re.sub(r'[^A-Za-z0-9._^=-]', '_', symbol.upper())
+        return os.path.join(self.base_dir, interval, f"{safe_symbol}.npz")
+
+    def _lock(self, symbol: str, interval: str) -> threading.Lock:
+        """Obtiene el lock asociado a un fichero"""
+        key = (symbol.upper(), interval)
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def _load(self, symbol: str, interval: str) -> Optional[Dict[str, np.ndarray]]:
+        """Carga los arrays de un fichero o None si no existe"""
+        path = self._path(symbol, interval)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path) as data:
+                return {key: data[key] for key in data.files}
+        except Exception as e:
+            print(f"Error leyendo almacén de barras {path}: {str(e)}")
+            return None
+
+    def _save(self, symbol: str, interval: str, arrays: Dict[str, np.ndarray]):
+        """Escribe los arrays de forma atómica (fichero temporal + rename)"""
+        path = self._path(symbol, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def read(self, symbol: str, interval: str = "1d",
+             start: TimeLike = None, end: TimeLike = None) -> pd.DataFrame:
+        """
+        Lee barras del almacén
+
+        Args:
+            symbol: Símbolo de la acción
+            interval: Intervalo de las barras
+            start: Fecha inicial incluida (opcional)
+            end: Fecha final incluida (opcional)
+
+        Returns:
+            DataFrame OHLCV indexado por 'datetime' (vacío si no hay datos)
+        """
+        data = self._load(symbol, interval)
+        if data is None or len(data['timestamp']) == 0:
+            return pd.DataFrame()
+
+        timestamps = data['timestamp']
+        lo = 0 if start is None else np.searchsorted(timestamps, _to_epoch(start), side='left')
+        hi = len(timestamps) if end is None else np.searchsorted(timestamps, _to_epoch(end), side='right')
+
+        df = pd.DataFrame({column: data[column][lo:hi] for column in BAR_COLUMNS})
+        df.index = pd.DatetimeIndex(pd.to_datetime(timestamps[lo:hi], unit='s'), name='datetime')
+
+        return df
+
+    def append(self, symbol: str, interval: str, bars: pd.DataFrame,
+               covered_from: TimeLike = None) -> int:
+        """
+        Añade barras al almacén fusionándolas con las existentes
+
+        Las barras nuevas sustituyen a las almacenadas con el mismo timestamp,
+        de modo que una barra final corregida reemplaza a la provisional. En
+        los intervalos diarios o mayores el timestamp es la fecha de la sesión.
+
+        Args:
+            symbol: Símbolo de la acción
+            interval: Intervalo de las barras
+            bars: DataFrame con índice temporal y columnas OHLCV
+            covered_from: Fecha desde la que la descarga es completa (opcional)
+
+        Returns:
+            Número total de barras almacenadas
+        """
+        with self._lock(symbol, interval):
+            existing = self._load(symbol, interval)
+
+            if bars is None or bars.empty:
+                new_ts = np.empty(0, dtype=np.int64)
+                new_columns = {column: np.empty(0) for column in BAR_COLUMNS}
+            else:
+                new_ts = _index_to_epoch(bars.index)
+                new_columns = {}
+                for column in BAR_COLUMNS:
+                    if column in bars:
+                        new_columns[column] = bars[column].to_numpy()
+                    elif column == 'adj_close':
+                        new_columns[column] = bars['close'].to_numpy()
+                    else:
+                        raise ValueError(f"Falta la columna '{column}' para {symbol}")
+
+            if keyed_by_date(interval):
+                new_ts = new_ts - new_ts % SECONDS_PER_DAY
+
+            if existing is not None:
+                existing_ts = existing['timestamp']
+                if keyed_by_date(interval):
+                    existing_ts = existing_ts - existing_ts % SECONDS_PER_DAY
+                timestamps = np.concatenate([existing_ts, new_ts])
+                columns = {column: np.concatenate([existing[column], new_columns[column]])
+                           for column in BAR_COLUMNS}
+            else:
+                timestamps = new_ts
+                columns = new_columns
+
+            # Ordenar (estable) y quedarse con la última versión de cada timestamp
+            order = np.argsort(timestamps, kind='stable')
+            timestamps = timestamps[order]
+            keep = np.ones(len(timestamps), dtype=bool)
+            if len(timestamps) > 1:
+                keep[:-1] = timestamps[1:] != timestamps[:-1]
+
+            arrays = {'timestamp': timestamps[keep].astype(np.int64)}
+            for column in FLOAT_COLUMNS:
+                arrays[column] = columns[column][order][keep].astype(np.float64)
+            for column in INT_COLUMNS:
+                arrays[column] = np.nan_to_num(columns[column][order][keep].astype(np.float64)).astype(np.int64)
+
+            # Metadatos de cobertura y actualización
+            covered = _to_epoch(covered_from)
+            if covered is None and len(new_ts):
+                covered = int(new_ts.min())
+            previous_covered = int(existing['covered_from'][0]) if existing is not None else None
+            if covered is None:
+                covered = previous_covered
+            elif previous_covered is not None:
+                covered = min(covered, previous_covered)
+
+            arrays['covered_from'] = np.array([covered if covered is not None else -1], dtype=np.int64)
+            arrays['updated_at'] = np.array([int(time.time())], dtype=np.int64)
+            # Contador de escrituras: distingue actualizaciones dentro del mismo segundo
+            previous_revision = int(existing['revision'][0]) if existing is not None and 'revision' in existing else 0
+            arrays['revision'] = np.array([previous_revision + 1], dtype=np.int64)
+
+            self._save(symbol, interval, arrays)
+            return len(arrays['timestamp'])
+
+    def metadata(self, symbol: str, interval: str = "1d") -> Optional[Dict]:
+        """
+        Obtiene los metadatos de un fichero del almacén
+
+        Returns:
+            Diccionario con filas, primer/último timestamp, cobertura, actualización
+            y número de escrituras
+        """
+        data = self._load(symbol, interval)
+        if data is None:
+            return None
+
+        timestamps = data['timestamp']
+        covered_from = int(data['covered_from'][0])
+        return {
+            'rows': len(timestamps),
+            'first_timestamp': pd.Timestamp(int(timestamps[0]), unit='s') if len(timestamps) else None,
+            'last_timestamp': pd.Timestamp(int(timestamps[-1]), unit='s') if len(timestamps) else None,
+            'covered_from': pd.Timestamp(covered_from, unit='s') if covered_from >= 0 else None,
+            'updated_at': pd.Timestamp(int(data['updated_at'][0]), unit='s'),
+            'revision': int(data['revision'][0]) if 'revision' in data else 0
+        }
+
+    def covers(self, symbol: str, interval: str, start: TimeLike,
+               max_age: Optional[timedelta] = None) -> bool:
+        """
+        Indica si el almacén cubre el período pedido y está suficientemente actualizado
+
+        Args:
+            symbol: Símbolo de la acción
+            interval: Intervalo de las barras
+            start: Fecha inicial requerida (None = histórico completo)
+            max_age: Antigüedad máxima de la última actualización (default: un intervalo)
+
+        Returns:
+            True si se puede servir la petición desde disco
+        """
+        meta = self.metadata(symbol, interval)
+        if not meta or meta['rows'] == 0 or meta['covered_from'] is None:
+            return False
+
+        start_epoch = _to_epoch(start)
+        if start_epoch is None or _to_epoch(meta['covered_from']) > start_epoch:
+            return False
+
+        max_age = max_age if max_age is not None else interval_to_timedelta(interval)
+        return pd.Timestamp.now(tz='UTC').tz_localize(None) - meta['updated_at'] <= max_age
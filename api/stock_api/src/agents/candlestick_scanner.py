@@ -0,0 +1,268 @@
+"""
+Escáner de Patrones de Velas
+Detección vectorizada de patrones de velas japonesas sobre arrays de NumPy
+
+Las primitivas de cada vela (cuerpo, rango, sombras, dirección) se calculan
+una sola vez y todos los patrones se evalúan a partir de ellas. El resultado es
+una máscara de bits por barra (bit i = patrón `PATTERNS[i]`). Funciona sobre
+una serie (arrays 1-D) o sobre un panel del universo (barras x símbolos, con el
+tiempo en el eje 0).
+"""
+
+import numpy as np
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    from . import indicators
+except ImportError:
+    import indicators
+
+# Orden de los bits de la máscara (no reordenar: las máscaras guardadas dependen de él)
+PATTERNS = (
+    'doji', 'hammer', 'shooting_star', 'bullish_engulfing', 'bearish_engulfing',
+    'long_legged_doji', 'dragonfly_doji', 'gravestone_doji',
+    'hanging_man', 'inverted_hammer', 'spinning_top',
+    'bullish_marubozu', 'bearish_marubozu',
+    'bullish_harami', 'bearish_harami',
+    'piercing_line', 'dark_cloud_cover',
+    'tweezer_bottom', 'tweezer_top',
+    'morning_star', 'evening_star',
+    'three_white_soldiers', 'three_black_crows',
+    'three_inside_up', 'three_inside_down',
+    'three_outside_up', 'three_outside_down'
+)
+PATTERN_BITS = {name: np.uint32(1 << bit) for bit, name in enumerate(PATTERNS)}
+
+# Sesgo de cada patrón (los que no aparecen, como doji o spinning_top, son de indecisión)
+BULLISH_PATTERNS = frozenset((
+    'hammer', 'inverted_hammer', 'dragonfly_doji', 'bullish_engulfing', 'bullish_marubozu',
+    'bullish_harami', 'piercing_line', 'tweezer_bottom', 'morning_star',
+    'three_white_soldiers', 'three_inside_up', 'three_outside_up'
+))
+BEARISH_PATTERNS = frozenset((
+    'shooting_star', 'hanging_man', 'gravestone_doji', 'bearish_engulfing', 'bearish_marubozu',
+    'bearish_harami', 'dark_cloud_cover', 'tweezer_top', 'evening_star',
+    'three_black_crows', 'three_inside_down', 'three_outside_down'
+))
+
+# Umbrales relativos al rango de la vela
+DOJI_BODY = 0.1         # Cuerpo de doji: <= 10% del rango
+SMALL_BODY = 0.3        # Cuerpo pequeño: <= 30% del rango
+LONG_BODY = 0.6         # Cuerpo largo: >= 60% del rango
+MARUBOZU_BODY = 0.95    # Marubozu: cuerpo >= 95% del rango
+TWEEZER_TOLERANCE = 0.05  # Extremos iguales: diferencia <= 5% del rango
+TREND_BARS = 5          # Barras para determinar la tendencia previa
+
+
+def _shift(x: np.ndarray, periods: int = 1, fill=np.nan) -> np.ndarray:
+    """Desplaza `periods` barras hacia delante en el eje del tiempo"""
+    out = np.full(x.shape, fill, dtype=x.dtype)
+    if periods < x.shape[0]:
+        out[periods:] = x[:-periods]
+    return out
+
+
+def candle_primitives(open_, high, low, close) -> Dict[str, np.ndarray]:
+    """
+    Primitivas compartidas por todos los patrones
+
+    Returns:
+        Diccionario con cuerpo, rango, sombras, dirección y tendencia previa
+    """
+    open_ = indicators.as_float_array(open_)
+    high = indicators.as_float_array(high)
+    low = indicators.as_float_array(low)
+    close = indicators.as_float_array(close)
+
+    body = close - open_
+    body_size = np.abs(body)
+    candle_range = high - low
+    top = np.maximum(open_, close)
+    bottom = np.minimum(open_, close)
+
+    with np.errstate(invalid='ignore'):
+        previous_close = _shift(close)
+        trend_base = _shift(close, TREND_BARS + 1)
+        return {
+            'open': open_, 'high': high, 'low': low, 'close': close,
+            'body': body,
+            'body_size': body_size,
+            'range': candle_range,
+            'top': top,
+            'bottom': bottom,
+            'midpoint': (open_ + close) / 2,
+            'upper_shadow': high - top,
+            'lower_shadow': bottom - low,
+            'bullish': body > 0,
+            'bearish': body < 0,
+            'small_body': body_size <= candle_range * SMALL_BODY,
+            'long_body': (body_size >= candle_range * LONG_BODY) & (candle_range > 0),
+            # Tendencia de las barras anteriores a la vela actual
+            'uptrend': previous_close > trend_base,
+            'downtrend': previous_close < trend_base
+        }
+
+
+def pattern_flags(open_, high, low, close, patterns: Iterable[str] = PATTERNS) -> Dict[str, np.ndarray]:
+    """
+    Evalúa los patrones indicados
+
+    Returns:
+        Diccionario patrón -> array booleano
+    """
+    c = candle_primitives(open_, high, low, close)
+    prev = {name: _shift(c[name], 1, fill=False if c[name].dtype == bool else np.nan) for name in c}
+    prev2 = {name: _shift(c[name], 2, fill=False if c[name].dtype == bool else np.nan) for name in c}
+
+    flags = {}
+    with np.errstate(invalid='ignore'):
+        doji = c['body_size'] <= c['range'] * DOJI_BODY
+        hammer_shape = (c['lower_shadow'] >= 2 * c['body_size']) & (c['upper_shadow'] <= c['body_size'] * 0.1)
+        star_shape = (c['upper_shadow'] >= 2 * c['body_size']) & (c['lower_shadow'] <= c['body_size'] * 0.1)
+        bullish_engulfing = (
+            prev['bearish'] & c['bullish'] &
+            (c['open'] < prev['close']) & (c['close'] > prev['open'])
+        )
+        bearish_engulfing = (
+            prev['bullish'] & c['bearish'] &
+            (c['open'] > prev['close']) & (c['close'] < prev['open'])
+        )
+        bullish_harami = (
+            prev['bearish'] & prev['long_body'] & c['bullish'] &
+            (c['top'] <= prev['open']) & (c['bottom'] >= prev['close']) & (c['body_size'] < prev['body_size'])
+        )
+        bearish_harami = (
+            prev['bullish'] & prev['long_body'] & c['bearish'] &
+            (c['top'] <= prev['close']) & (c['bottom'] >= prev['open']) & (c['body_size'] < prev['body_size'])
+        )
+        tweezer_tolerance = np.fmax(c['range'], prev['range']) * TWEEZER_TOLERANCE
+
+        # Una vela
+        flags['doji'] = doji
+        flags['long_legged_doji'] = doji & (c['upper_shadow'] >= c['range'] * 0.3) & (c['lower_shadow'] >= c['range'] * 0.3)
+        flags['dragonfly_doji'] = doji & (c['upper_shadow'] <= c['range'] * 0.1) & (c['lower_shadow'] >= c['range'] * 0.6)
+        flags['gravestone_doji'] = doji & (c['lower_shadow'] <= c['range'] * 0.1) & (c['upper_shadow'] >= c['range'] * 0.6)
+        # La misma forma es alcista o bajista según la tendencia previa
+        flags['hammer'] = hammer_shape & c['downtrend']
+        flags['hanging_man'] = hammer_shape & c['uptrend']
+        flags['shooting_star'] = star_shape & c['uptrend']
+        flags['inverted_hammer'] = star_shape & c['downtrend']
+        flags['spinning_top'] = (
+            c['small_body'] & ~doji &
+            (c['upper_shadow'] > c['body_size']) & (c['lower_shadow'] > c['body_size'])
+        )
+        marubozu = (c['body_size'] >= c['range'] * MARUBOZU_BODY) & (c['range'] > 0)
+        flags['bullish_marubozu'] = marubozu & c['bullish']
+        flags['bearish_marubozu'] = marubozu & c['bearish']
+
+        # Dos velas
+        flags['bullish_engulfing'] = bullish_engulfing
+        flags['bearish_engulfing'] = bearish_engulfing
+        flags['bullish_harami'] = bullish_harami
+        flags['bearish_harami'] = bearish_harami
+        flags['piercing_line'] = (
+            prev['bearish'] & prev['long_body'] & c['bullish'] &
+            (c['open'] < prev['close']) & (c['close'] > prev['midpoint']) & (c['close'] < prev['open'])
+        )
+        flags['dark_cloud_cover'] = (
+            prev['bullish'] & prev['long_body'] & c['bearish'] &
+            (c['open'] > prev['close']) & (c['close'] < prev['midpoint']) & (c['close'] > prev['open'])
+        )
+        flags['tweezer_bottom'] = (
+            prev['bearish'] & c['bullish'] & c['downtrend'] &
+            (np.abs(c['low'] - prev['low']) <= tweezer_tolerance)
+        )
+        flags['tweezer_top'] = (
+            prev['bullish'] & c['bearish'] & c['uptrend'] &
+            (np.abs(c['high'] - prev['high']) <= tweezer_tolerance)
+        )
+
+        # Tres velas
+        flags['morning_star'] = (
+            prev2['bearish'] & prev2['long_body'] & prev['small_body'] &
+            (prev['top'] < prev2['close']) &
+            c['bullish'] & (c['close'] > prev2['midpoint'])
+        )
+        flags['evening_star'] = (
+            prev2['bullish'] & prev2['long_body'] & prev['small_body'] &
+            (prev['bottom'] > prev2['close']) &
+            c['bearish'] & (c['close'] < prev2['midpoint'])
+        )
+        soldiers = [(prev2, prev), (prev, c)]
+        flags['three_white_soldiers'] = prev2['bullish'] & prev2['long_body'] & np.logical_and.reduce([
+            later['bullish'] & later['long_body'] & (later['close'] > earlier['close']) &
+            (later['open'] > earlier['open']) & (later['open'] < earlier['close'])
+            for earlier, later in soldiers
+        ])
+        flags['three_black_crows'] = prev2['bearish'] & prev2['long_body'] & np.logical_and.reduce([
+            later['bearish'] & later['long_body'] & (later['close'] < earlier['close']) &
+            (later['open'] < earlier['open']) & (later['open'] > earlier['close'])
+            for earlier, later in soldiers
+        ])
+        flags['three_inside_up'] = _shift(bullish_harami, 1, fill=False) & c['bullish'] & (c['close'] > prev2['open'])
+        flags['three_inside_down'] = _shift(bearish_harami, 1, fill=False) & c['bearish'] & (c['close'] < prev2['open'])
+        flags['three_outside_up'] = _shift(bullish_engulfing, 1, fill=False) & c['bullish'] & (c['close'] > prev['close'])
+        flags['three_outside_down'] = _shift(bearish_engulfing, 1, fill=False) & c['bearish'] & (c['close'] < prev['close'])
+
+    return {name: flags[name] for name in patterns}
+
+
+def scan(open_, high, low, close) -> np.ndarray:
+    """
+    Máscara de patrones por barra
+
+    Args:
+        open_, high, low, close: Arrays 1-D (una serie) o 2-D (barras x símbolos)
+
+    Returns:
+        Array uint32 con un bit por patrón (ver `PATTERNS`)
+    """
+    flags = pattern_flags(open_, high, low, close)
+    mask = np.zeros(np.shape(flags['doji']), dtype=np.uint32)
+    for name, flag in flags.items():
+        mask |= flag.astype(np.uint32) * PATTERN_BITS[name]
+    return mask
+
+
+def _column(df, name: str):
+    return df[name] if name in df.columns else df[name.capitalize()]
+
+
+def scan_frame(df) -> np.ndarray:
+    """Máscara de patrones de un DataFrame OHLC (columnas en minúsculas o estilo yfinance)"""
+    return scan(_column(df, 'open'), _column(df, 'high'), _column(df, 'low'), _column(df, 'close'))
+
+
+def scan_panel(frames: Dict, length: int = None) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Escanea muchas acciones a la vez sobre un panel alineado por la última barra
+
+    Args:
+        frames: Diccionario símbolo -> DataFrame OHLC (estilo yfinance)
+        length: Número máximo de barras por símbolo
+
+    Returns:
+        Tupla (símbolos, máscaras barras x símbolos, barras por símbolo)
+    """
+    symbols, panel, lengths = indicators.build_panel(frames, columns=('Open', 'High', 'Low', 'Close'), length=length)
+    return symbols, scan(panel['Open'], panel['High'], panel['Low'], panel['Close']), lengths
+
+
+def has_pattern(mask, name: str) -> np.ndarray:
+    """Barras en las que aparece el patrón"""
+    return (np.asarray(mask) & PATTERN_BITS[name]) != 0
+
+
+def decode(mask) -> List[str]:
+    """Nombres de los patrones presentes en una máscara (un valor)"""
+    mask = int(mask)
+    return [name for bit, name in enumerate(PATTERNS) if mask >> bit & 1]
+
+
+def split_by_bias(names: Iterable[str]) -> Dict[str, List[str]]:
+    """Separa nombres de patrones en alcistas y bajistas"""
+    names = list(names)
+    return {
+        'bullish': [name for name in names if name in BULLISH_PATTERNS],
+        'bearish': [name for name in names if name in BEARISH_PATTERNS]
+    }
@@ -0,0 +1,125 @@
+"""
+Escáner de Banderas
+Detección vectorizada de banderas alcistas y bajistas (mástil seguido de una
+consolidación estrecha) sobre arrays de NumPy
+
+Las estadísticas de la consolidación (máximo, mínimo y precio medio de las
+barras que siguen al mástil) se calculan una sola vez para toda la serie con
+ventanas deslizantes hacia delante, sin recortar el DataFrame por cada
+movimiento ni modificarlo. Funciona sobre una serie (arrays 1-D) o sobre un
+panel del universo (barras x símbolos, con el tiempo en el eje 0).
+"""
+
+import numpy as np
+from typing import Dict, List, Tuple
+
+try:
+    from . import indicators
+    from .pivots import SparseTable
+except ImportError:
+    import indicators
+    from pivots import SparseTable
+
+FLAG_MOVE_BARS = 5      # Barras del mástil
+FLAG_MIN_MOVE = 0.05    # Movimiento mínimo del mástil
+FLAG_BARS = 20          # Barras de consolidación
+FLAG_MAX_RANGE = 0.05   # Rango máximo de la consolidación respecto al precio medio
+
+
+def _pad(values: np.ndarray, length: int) -> np.ndarray:
+    """Completa con NaN las ventanas que no caben al final de la serie"""
+    out = np.full((length,) + values.shape[1:], np.nan)
+    out[:len(values)] = values
+    return out
+
+
+def forward_extreme(values, window: int, kind: str = 'max') -> np.ndarray:
+    """
+    Máximo o mínimo de cada ventana [i, i + window) ignorando NaN
+
+    NaN donde la ventana no cabe en la serie o no tiene valores.
+    """
+    values = indicators.as_float_array(values)
+    if window < 1 or len(values) < window:
+        return np.full(values.shape, np.nan)
+    table = SparseTable(values, kind, skipna=True, max_width=window)
+    return _pad(table.rolling(window), len(values))
+
+
+def forward_mean(values, window: int) -> np.ndarray:
+    """
+    Media de cada ventana [i, i + window) ignorando NaN
+
+    NaN donde la ventana no cabe en la serie o no tiene valores.
+    """
+    values = indicators.as_float_array(values)
+    if window < 1 or len(values) < window:
+        return np.full(values.shape, np.nan)
+    valid = ~np.isnan(values)
+    sums = indicators.window_sums(np.where(valid, values, 0.0), window)
+    counts = indicators.window_sums(valid.astype(float), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _pad(sums / counts, len(values))
+
+
+def scan_flags(high, low, close) -> Dict[str, np.ndarray]:
+    """
+    Banderas que arrancan en cada barra
+
+    Una barra inicia una bandera si el cierre se ha movido más de
+    FLAG_MIN_MOVE en las FLAG_MOVE_BARS barras anteriores (mástil) y las
+    FLAG_BARS barras siguientes, con al menos una más detrás, oscilan en un
+    rango menor que FLAG_MAX_RANGE del precio medio.
+
+    Args:
+        high, low, close: Arrays 1-D (una serie) o 2-D (barras x símbolos)
+
+    Returns:
+        Diccionario con 'change' (movimiento del mástil), 'avg_price' (precio
+        medio de la consolidación) y las máscaras 'bull_flag' y 'bear_flag'
+    """
+    high = indicators.as_float_array(high)
+    low = indicators.as_float_array(low)
+    close = indicators.as_float_array(close)
+    n = len(close)
+
+    change = np.full(close.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if n > FLAG_MOVE_BARS:
+            change[FLAG_MOVE_BARS:] = close[FLAG_MOVE_BARS:] / close[:-FLAG_MOVE_BARS] - 1
+
+        avg_price = forward_mean(close, FLAG_BARS)
+        volatility = forward_extreme(high, FLAG_BARS, 'max') - forward_extreme(low, FLAG_BARS, 'min')
+        flag = (np.abs(change) > FLAG_MIN_MOVE) & (volatility / avg_price < FLAG_MAX_RANGE)
+
+    # La consolidación tiene que estar cerrada: al menos una barra después
+    flag[max(n - FLAG_BARS, 0):] = False
+    return {
+        'change': change,
+        'avg_price': avg_price,
+        'bull_flag': flag & (change > 0),
+        'bear_flag': flag & ~(change > 0)
+    }
+
+
+def breakout_target(avg_price, change):
+    """Objetivo de ruptura: el precio medio de la consolidación desplazado un mástil"""
+    return np.where(change > 0, avg_price * (1 + np.abs(change)), avg_price * (1 - np.abs(change)))
+
+
+def scan_flag_panel(frames: Dict, columns: Tuple[str, str, str] = ('high', 'low', 'close'),
+                    length: int = None) -> Tuple[List[str], Dict[str, np.ndarray], np.ndarray]:
+    """
+    Escanea banderas en muchas acciones a la vez sobre un panel alineado por la última barra
+
+    Args:
+        frames: Diccionario símbolo -> DataFrame OHLC
+        columns: Nombres de las columnas de máximo, mínimo y cierre
+        length: Número máximo de barras por símbolo
+
+    Returns:
+        Tupla (símbolos, resultado de `scan_flags` con arrays barras x símbolos, barras por símbolo)
+    """
+    symbols, panel, lengths = indicators.build_panel(frames, columns=columns, length=length)
+    high, low, close = (panel[column] for column in columns)
+    return symbols, scan_flags(high, low, close), lengths
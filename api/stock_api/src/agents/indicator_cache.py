@@ -0,0 +1,190 @@
+"""
+Cache de Indicadores
+Resultados de indicadores direccionados por contenido: la clave incluye el
+símbolo, el intervalo, la huella de las barras (primera y última marca de
+tiempo, número de barras y último cierre), el indicador y sus parámetros
+
+Mientras no llega una barra nueva, repetir un cálculo (coordinador, ruta
+/technical, gráficos, analizadores por lotes) es una consulta de diccionario.
+Las entradas no caducan por contenido: cuando cambian las barras cambia la
+clave y las antiguas acaban desalojadas por LRU (y, opcionalmente, volcadas a
+disco para recuperarlas sin recalcular).
+"""
+
+import hashlib
+import os
+import threading
+import numpy as np
+from datetime import timedelta
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+try:
+    from .analysis_cache import AnalysisCache
+except ImportError:
+    from analysis_cache import AnalysisCache
+
+# Configuración de la cache compartida (variables de entorno)
+DEFAULT_MAX_BYTES = int(os.environ.get('STOCKAI_INDICATOR_CACHE_MB', '128')) * 1024 * 1024
+DEFAULT_SPILL_DIR = os.environ.get('STOCKAI_INDICATOR_SPILL_DIR') or None
+
+# Marca de ausencia (los valores cacheados pueden ser None)
+_MISSING = object()
+
+
+def frame_version(df) -> Tuple:
+    """
+    Huella de un DataFrame de barras
+
+    Cambia al añadir una barra, al recortar el período o al revisarse la última
+    barra (cierre o volumen intradía); no requiere recorrer los datos.
+    """
+    if df is None or len(df) == 0:
+        return ()
+    version = (str(df.index[0]), str(df.index[-1]), len(df))
+    for column in ('close', 'Close', 'volume', 'Volume'):
+        if column in df.columns:
+            version += (float(df[column].iloc[-1]),)
+    return version
+
+
+class IndicatorCache:
+    """
+    Cache LRU con presupuesto de memoria y volcado opcional a disco
+
+    Los arrays guardados se marcan como de solo lectura, ya que se comparten
+    entre todos los llamadores. Con `spill_dir`, los arrays desalojados de
+    memoria se escriben como .npy y una consulta fallida en memoria los
+    recupera de disco.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = 100000,
+                 spill_dir: Optional[str] = DEFAULT_SPILL_DIR, max_spill_bytes: int = 1024 * 1024 * 1024,
+                 ttl: timedelta = timedelta(days=1)):
+        """
+        Args:
+            max_bytes: Presupuesto de memoria
+            max_entries: Número máximo de entradas en memoria
+            spill_dir: Directorio para volcar a disco (None: sin volcado)
+            max_spill_bytes: Tamaño máximo del directorio de volcado
+            ttl: Vida máxima de una entrada en memoria
+        """
+        self.memory = AnalysisCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl,
+                                    on_evict=self._spill if spill_dir else None)
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self._spill_lock = threading.Lock()
+        self._spill_bytes = None  # Se calcula la primera vez que se vuelca
+        self.spilled = 0
+        self.disk_hits = 0
+
+    @staticmethod
+    def key(symbol: str, interval: str, version: Tuple, indicator: str, params: Tuple = ()) -> Tuple:
+        """Clave de un resultado"""
+        return (symbol, interval, version, indicator, tuple(params))
+
+    # ============= VOLCADO A DISCO =============
+
+    def _spill_path(self, key: Hashable) -> str:
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.spill_dir, f"{digest}.npy")
+
+    def _spill(self, key: Hashable, value: Any):
+        """Escribe en disco un array desalojado de memoria"""
+        if not isinstance(value, np.ndarray) or value.dtype == object:
+            return
+
+        path = self._spill_path(key)
+        try:
+            with self._spill_lock:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                if self._spill_bytes is None:
+                    self._spill_bytes = sum(entry.stat().st_size for entry in os.scandir(self.spill_dir))
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, value, allow_pickle=False)
+                os.replace(tmp_path, path)
+                self._spill_bytes += os.path.getsize(path)
+                self.spilled += 1
+                if self._spill_bytes > self.max_spill_bytes:
+                    self._prune_spill()
+        except OSError as e:
+            print(f"Error volcando indicador a disco {path}: {str(e)}")
+
+    def _prune_spill(self):
+        """Borra los ficheros más antiguos hasta volver a la mitad del límite (con el lock adquirido)"""
+        entries = sorted(os.scandir(self.spill_dir), key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self._spill_bytes <= self.max_spill_bytes // 2:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._spill_bytes -= size
+            except OSError:
+                pass
+
+    def _load_spilled(self, key: Hashable) -> Optional[np.ndarray]:
+        path = self._spill_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+    # ============= CONSULTA =============
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Valor cacheado (en memoria o volcado a disco) o `default`"""
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        if self.spill_dir:
+            value = self._load_spilled(key)
+            if value is not None:
+                self.disk_hits += 1
+                return self.set(key, value)
+        return default
+
+    def set(self, key: Hashable, value: Any) -> Any:
+        """Guarda un valor (los arrays pasan a solo lectura) y lo devuelve"""
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        self.memory.set(key, value)
+        return value
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Devuelve el valor cacheado o lo calcula y lo guarda"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.set(key, compute())
+        return value
+
+    def clear(self):
+        """Vacía la cache en memoria (los ficheros volcados se conservan)"""
+        self.memory.clear()
+
+    def stats(self) -> Dict:
+        """Estadísticas de uso"""
+        stats = self.memory.stats()
+        stats.update({
+            'spill_dir': self.spill_dir,
+            'spilled': self.spilled,
+            'disk_hits': self.disk_hits
+        })
+        return stats
+
+
+# Cache compartida por todos los analizadores del proceso
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_indicator_cache() -> IndicatorCache:
+    """Obtiene (o crea) la cache de indicadores compartida del proceso"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = IndicatorCache()
+        return _shared_cache
@@ -0,0 +1,288 @@
+"""
+Grafo de Indicadores
+Evaluación perezosa de indicadores, señales y patrones de velas: cada salida
+declara sus dependencias y solo se calcula lo que el llamador pide
+
+Los intermedios compartidos (EMAs, medias móviles, máscara de velas) se
+calculan una sola vez por grafo. Por ejemplo, pedir `golden_cross` calcula
+únicamente `sma_50` y `sma_200`. Con una `IndicatorCache`, los resultados se
+reutilizan entre grafos mientras no cambien las barras.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+try:
+    from . import indicators
+    from . import candlestick_scanner
+    from .indicator_cache import IndicatorCache, frame_version
+except ImportError:
+    import indicators
+    import candlestick_scanner
+    from indicator_cache import IndicatorCache, frame_version
+
+# Columnas OHLCV de entrada
+INPUTS = ('open', 'high', 'low', 'close', 'volume')
+
+# Nodos registrados: nombre -> (dependencias, función)
+NODES: Dict[str, Tuple[Tuple[str, ...], Callable]] = {}
+
+# Nodos paramétricos por período (sma_50, ema_12, ...)
+_PARAMETRIC = re.compile(r'^(sma|ema)_(\d+)$')
+
+# Salidas que `TechnicalAnalyzer.analyze_stock` añade al DataFrame
+INDICATOR_COLUMNS = (
+    'rsi', 'macd', 'macd_signal', 'macd_histogram',
+    'bb_upper', 'bb_middle', 'bb_lower',
+    'sma_5', 'sma_10', 'sma_20', 'sma_50', 'sma_200',
+    'stoch_k', 'stoch_d', 'atr'
+)
+PATTERNS = candlestick_scanner.PATTERNS
+SIGNALS = (
+    'rsi_oversold', 'rsi_overbought', 'macd_bullish', 'macd_bearish',
+    'bb_oversold', 'bb_overbought', 'golden_cross', 'death_cross'
+)
+
+
+def node(name: str, *dependencies: str):
+    """Registra la función que calcula `name` a partir de sus dependencias"""
+    def register(function):
+        NODES[name] = (dependencies, function)
+        return function
+    return register
+
+
+def resolve(name: str) -> Tuple[Tuple[str, ...], Callable]:
+    """Dependencias y función de un nodo (registrado o paramétrico)"""
+    if name in NODES:
+        return NODES[name]
+
+    match = _PARAMETRIC.match(name)
+    if match:
+        kind, period = match.group(1), int(match.group(2))
+        if kind == 'sma':
+            return ('close',), lambda close: indicators.sma(close, period)
+        return ('close',), lambda close: indicators.ema(close, span=period)
+
+    raise KeyError(f"Indicador desconocido: {name}")
+
+
+def split_name(name: str) -> Tuple[str, Tuple[int, ...]]:
+    """Indicador y parámetros de un nodo ('sma_50' -> ('sma', (50,)))"""
+    match = _PARAMETRIC.match(name)
+    if match:
+        return match.group(1), (int(match.group(2)),)
+    return name, ()
+
+
+def _previous(values: np.ndarray) -> np.ndarray:
+    """Valor de la barra anterior (NaN en la primera)"""
+    previous = np.full(values.shape, np.nan)
+    previous[1:] = values[:-1]
+    return previous
+
+
+def _crossed(a: np.ndarray, b: np.ndarray, above: bool = True) -> np.ndarray:
+    """`a` cruza `b` en esta barra (hacia arriba o hacia abajo)"""
+    previous_a, previous_b = _previous(a), _previous(b)
+    with np.errstate(invalid='ignore'):
+        if above:
+            return (a > b) & (previous_a <= previous_b)
+        return (a < b) & (previous_a >= previous_b)
+
+
+# ============= INDICADORES =============
+
+@node('rsi', 'close')
+def _rsi(close):
+    return indicators.rsi(close, 14)
+
+
+@node('macd', 'ema_12', 'ema_26')
+def _macd(ema_fast, ema_slow):
+    return ema_fast - ema_slow
+
+
+@node('macd_signal', 'macd')
+def _macd_signal(macd):
+    return indicators.ema(macd, span=9)
+
+
+@node('macd_histogram', 'macd', 'macd_signal')
+def _macd_histogram(macd, signal):
+    return macd - signal
+
+
+@node('bb_middle', 'sma_20')
+def _bb_middle(sma_20):
+    return sma_20
+
+
+@node('bb_std', 'close')
+def _bb_std(close):
+    return indicators.rolling_std(close, 20)
+
+
+@node('bb_upper', 'bb_middle', 'bb_std')
+def _bb_upper(middle, std):
+    return middle + std * 2
+
+
+@node('bb_lower', 'bb_middle', 'bb_std')
+def _bb_lower(middle, std):
+    return middle - std * 2
+
+
+@node('stoch_k', 'high', 'low', 'close')
+def _stoch_k(high, low, close):
+    return indicators.stochastic(high, low, close, 14, 3)['k_percent']
+
+
+@node('stoch_d', 'stoch_k')
+def _stoch_d(stoch_k):
+    return indicators.sma(stoch_k, 3)
+
+
+@node('true_range', 'high', 'low', 'close')
+def _true_range(high, low, close):
+    return indicators.true_range(high, low, close)
+
+
+@node('atr', 'true_range')
+def _atr(true_range):
+    return indicators.sma(true_range, 14)
+
+
+# ============= PATRONES DE VELAS =============
+
+@node('candle_patterns', 'open', 'high', 'low', 'close')
+def _candle_patterns(open_, high, low, close):
+    return candlestick_scanner.scan(open_, high, low, close)
+
+
+def _register_pattern(name: str):
+    node(name, 'candle_patterns')(lambda mask: candlestick_scanner.has_pattern(mask, name))
+
+
+for _pattern in PATTERNS:
+    _register_pattern(_pattern)
+
+
+# ============= SEÑALES =============
+
+@node('rsi_oversold', 'rsi')
+def _rsi_oversold(rsi):
+    with np.errstate(invalid='ignore'):
+        return rsi < 30
+
+
+@node('rsi_overbought', 'rsi')
+def _rsi_overbought(rsi):
+    with np.errstate(invalid='ignore'):
+        return rsi > 70
+
+
+@node('macd_bullish', 'macd', 'macd_signal')
+def _macd_bullish(macd, signal):
+    return _crossed(macd, signal, above=True)
+
+
+@node('macd_bearish', 'macd', 'macd_signal')
+def _macd_bearish(macd, signal):
+    return _crossed(macd, signal, above=False)
+
+
+@node('bb_oversold', 'close', 'bb_lower')
+def _bb_oversold(close, lower):
+    with np.errstate(invalid='ignore'):
+        return close < lower
+
+
+@node('bb_overbought', 'close', 'bb_upper')
+def _bb_overbought(close, upper):
+    with np.errstate(invalid='ignore'):
+        return close > upper
+
+
+@node('golden_cross', 'sma_50', 'sma_200')
+def _golden_cross(sma_50, sma_200):
+    return _crossed(sma_50, sma_200, above=True)
+
+
+@node('death_cross', 'sma_50', 'sma_200')
+def _death_cross(sma_50, sma_200):
+    return _crossed(sma_50, sma_200, above=False)
+
+
+class IndicatorGraph:
+    """
+    Evaluador perezoso sobre un DataFrame OHLCV
+
+    Cada salida se calcula la primera vez que se pide (junto con sus
+    dependencias) y se memoriza, de modo que los intermedios compartidos no se
+    recalculan. Si se indica una cache y la clave de la serie, las salidas se
+    buscan primero en ella por (símbolo, intervalo, huella de las barras,
+    indicador, parámetros).
+    """
+
+    def __init__(self, df: pd.DataFrame, cache: Optional[IndicatorCache] = None,
+                 symbol: Optional[str] = None, interval: str = '1d'):
+        """
+        Args:
+            df: DataFrame con columnas open, high, low, close y volume
+            cache: Cache de indicadores compartida (opcional)
+            symbol: Símbolo de la serie (necesario para usar la cache)
+            interval: Intervalo de las barras
+        """
+        self.df = df
+        self._values = {}
+        self.cache = cache if symbol is not None else None
+        self.symbol = symbol
+        self.interval = interval
+        self.version = frame_version(df) if self.cache is not None else None
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._values
+
+    @property
+    def computed(self) -> Tuple[str, ...]:
+        """Salidas calculadas hasta ahora (en orden de cálculo)"""
+        return tuple(self._values)
+
+    def get(self, name: str) -> np.ndarray:
+        """Valores de una salida (array alineado con el DataFrame)"""
+        if name in self._values:
+            return self._values[name]
+
+        if name in INPUTS:
+            values = indicators.as_float_array(self.df[name])
+        elif self.cache is not None:
+            indicator, params = split_name(name)
+            key = self.cache.key(self.symbol, self.interval, self.version, indicator, params)
+            values = self.cache.get_or_compute(key, lambda: self._compute(name))
+        else:
+            values = self._compute(name)
+
+        self._values[name] = values
+        return values
+
+    def _compute(self, name: str) -> np.ndarray:
+        dependencies, function = resolve(name)
+        return function(*(self.get(dependency) for dependency in dependencies))
+
+    def compute(self, names: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Calcula varias salidas y devuelve sus arrays"""
+        return {name: self.get(name) for name in names}
+
+    def series(self, name: str) -> pd.Series:
+        """Salida como Serie con el índice del DataFrame"""
+        return pd.Series(self.get(name), index=self.df.index, name=name)
+
+    def latest(self, names: Iterable[str]) -> Dict:
+        """Valor en la última barra de cada salida (tipos nativos de Python)"""
+        return {name: self.get(name)[-1].item() for name in names}
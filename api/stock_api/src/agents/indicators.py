@@ -0,0 +1,420 @@
+"""
+Motor de Indicadores Técnicos
+Implementación única, vectorizada con NumPy, de los indicadores usados por el
+análisis técnico, los gráficos de la API y los analizadores por lotes
+
+Todas las funciones aceptan arrays 1-D (una serie) o 2-D (barras x símbolos, con
+el tiempo en el eje 0) y devuelven arrays float64 de la misma forma, con NaN
+mientras la ventana no está completa. Las ventanas móviles son O(n)
+independientemente del período.
+"""
+
+import numpy as np
+from typing import Dict, Iterable, List, Tuple
+
+# Barras por año para anualizar la volatilidad diaria
+TRADING_DAYS = 252
+
+
+def as_float_array(values) -> np.ndarray:
+    """Convierte listas, Series o arrays a un array float64 (sin copiar si ya lo es)"""
+    if hasattr(values, 'to_numpy'):
+        values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(values, dtype=np.float64)
+
+
+def _nan_like(x: np.ndarray) -> np.ndarray:
+    return np.full(x.shape, np.nan)
+
+
+def _forward_fill(x: np.ndarray) -> np.ndarray:
+    """Rellena cada NaN con el último valor válido anterior (por columna)"""
+    valid = ~np.isnan(x)
+    shape = (-1,) + (1,) * (x.ndim - 1)
+    positions = np.where(valid, np.arange(x.shape[0]).reshape(shape), 0)
+    np.maximum.accumulate(positions, axis=0, out=positions)
+    filled = np.take_along_axis(x, positions, axis=0) if x.ndim > 1 else x[positions]
+    return filled
+
+
+def _first_valid(x: np.ndarray) -> np.ndarray:
+    """Primer valor no NaN de cada columna (NaN si no hay ninguno)"""
+    valid = ~np.isnan(x)
+    first = np.argmax(valid, axis=0)
+    values = np.take_along_axis(x, np.expand_dims(first, 0), axis=0)[0] if x.ndim > 1 else x[first]
+    return np.where(valid.any(axis=0), values, np.nan)
+
+
+def decay_recurrence(values: np.ndarray, decay: float, initial=None) -> np.ndarray:
+    """
+    Resuelve y[t] = decay * y[t-1] + values[t] de forma vectorizada
+
+    Se procesa por bloques con sumas acumuladas reescaladas, acotando el factor
+    de escala para no perder precisión; el coste es O(n) sin bucles por barra.
+
+    Args:
+        values: Términos independientes (sin NaN)
+        decay: Factor de decaimiento en [0, 1]
+        initial: Valor de y antes de la primera barra (default: 0)
+
+    Returns:
+        Array con y[t]
+    """
+    values = as_float_array(values)
+    out = np.empty(values.shape)
+    n = values.shape[0]
+    if n == 0:
+        return out
+
+    previous = np.zeros(values.shape[1:]) if initial is None else np.asarray(initial, dtype=np.float64)
+    if decay <= 0:
+        return values.copy()
+
+    # Tamaño de bloque tal que decay ** -bloque <= e**30
+    block = n if decay >= 1 else max(1, int(30.0 / -np.log(decay)))
+    shape = (-1,) + (1,) * (values.ndim - 1)
+
+    for start in range(0, n, block):
+        chunk = values[start:start + block]
+        k = np.arange(chunk.shape[0], dtype=np.float64).reshape(shape)
+        grow = decay ** -k
+        shrink = decay ** k
+        out[start:start + chunk.shape[0]] = shrink * (decay * previous + np.cumsum(chunk * grow, axis=0))
+        previous = out[start + chunk.shape[0] - 1]
+
+    return out
+
+
+# ============= VENTANAS MÓVILES =============
+
+def rolling_sum(values, window: int) -> np.ndarray:
+    """Suma móvil O(n) (NaN si la ventana contiene algún NaN)"""
+    x = as_float_array(values)
+    out = _nan_like(x)
+    n = x.shape[0]
+    if window <= 0 or n < window:
+        return out
+
+    valid = ~np.isnan(x)
+    sums = np.cumsum(np.where(valid, x, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+
+    window_sums = sums[window - 1:].copy()
+    window_sums[1:] -= sums[:-window]
+    window_counts = counts[window - 1:].copy()
+    window_counts[1:] -= counts[:-window]
+
+    window_sums[window_counts < window] = np.nan
+    out[window - 1:] = window_sums
+    return out
+
+
+def window_sums(values, window: int) -> np.ndarray:
+    """
+    Suma de cada ventana completa [i, i + window) (n - window + 1 filas)
+
+    Cada suma se compone de bloques de potencias de dos de su propia ventana,
+    así que no arrastra la deriva de una suma acumulada sobre series largas
+    (O(n log window)). Los NaN se propagan.
+    """
+    x = as_float_array(values)
+    count = x.shape[0] - window + 1
+    out = np.zeros((max(count, 0),) + x.shape[1:])
+    if window <= 0 or count <= 0:
+        return out
+
+    level, width, offset = x, 1, 0
+    while width <= window:
+        if window & width:
+            out += level[offset:offset + count]
+            offset += width
+        if width * 2 <= window:
+            level = level[:-width] + level[width:]
+        width *= 2
+    return out
+
+
+def sma(values, period: int) -> np.ndarray:
+    """Media móvil simple (acumulando desviaciones respecto al primer valor, por precisión)"""
+    x = as_float_array(values)
+    offset = np.nan_to_num(_first_valid(x)) if x.size else 0.0
+    return rolling_sum(x - offset, period) / period + offset
+
+
+def rolling_std(values, window: int, ddof: int = 1) -> np.ndarray:
+    """
+    Desviación estándar móvil O(n)
+
+    Los datos se centran antes de acumular cuadrados para evitar la cancelación
+    numérica con precios altos y poca varianza.
+    """
+    x = as_float_array(values)
+    if window - ddof <= 0:
+        return _nan_like(x)
+
+    centered = x - np.nan_to_num(_first_valid(x))
+    sums = rolling_sum(centered, window)
+    squares = rolling_sum(centered * centered, window)
+    variance = (squares - sums * sums / window) / (window - ddof)
+    return np.sqrt(np.maximum(variance, 0.0))
+
+
+def _rolling_extreme(values, window: int, op, fill: float) -> np.ndarray:
+    """Máximo/mínimo móvil O(n) (algoritmo de van Herk / Gil-Werman)"""
+    x = as_float_array(values)
+    out = _nan_like(x)
+    n = x.shape[0]
+    if window <= 0 or n < window:
+        return out
+    if window == 1:
+        return x.copy()
+
+    pad = (-n) % window
+    padded = np.concatenate([x, np.full((pad,) + x.shape[1:], fill)]) if pad else x
+    blocks = padded.reshape((-1, window) + x.shape[1:])
+
+    prefix = op.accumulate(blocks, axis=1).reshape(padded.shape)
+    suffix = op.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+
+    out[window - 1:] = op(suffix[:n - window + 1], prefix[window - 1:n])
+    return out
+
+
+def rolling_max(values, window: int) -> np.ndarray:
+    """Máximo móvil"""
+    return _rolling_extreme(values, window, np.maximum, -np.inf)
+
+
+def rolling_min(values, window: int) -> np.ndarray:
+    """Mínimo móvil"""
+    return _rolling_extreme(values, window, np.minimum, np.inf)
+
+
+# ============= MEDIAS EXPONENCIALES =============
+
+def ema(values, span: float = None, alpha: float = None, adjust: bool = True) -> np.ndarray:
+    """
+    Media móvil exponencial (equivalente a pandas `ewm(...).mean()`)
+
+    Args:
+        values: Serie o panel de valores
+        span: Período (alpha = 2 / (span + 1))
+        alpha: Factor de suavizado (alternativo a span)
+        adjust: Pesos normalizados como pandas (True) o recursiva clásica sembrada
+            con el primer valor (False)
+
+    Returns:
+        Array con la EMA
+    """
+    x = as_float_array(values)
+    if alpha is None:
+        alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    valid = ~np.isnan(x)
+
+    if adjust:
+        numerator = decay_recurrence(np.where(valid, x, 0.0), decay)
+        denominator = decay_recurrence(valid.astype(np.float64), decay)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = numerator / denominator
+        out[denominator == 0] = np.nan
+        return out
+
+    # Recursiva: y[t] = decay * y[t-1] + alpha * x[t], con y = x en la primera barra válida
+    filled = _forward_fill(x)
+    seed = _first_valid(x)
+    filled = np.where(np.isnan(filled), seed, filled)
+    out = decay_recurrence(alpha * np.nan_to_num(filled), decay, initial=np.nan_to_num(seed))
+    started = np.maximum.accumulate(valid, axis=0)
+    out[~started] = np.nan
+    return out
+
+
+# ============= INDICADORES =============
+
+def rsi(close, period: int = 14, method: str = 'sma') -> np.ndarray:
+    """
+    Relative Strength Index
+
+    Args:
+        close: Precios de cierre
+        period: Período (default: 14)
+        method: 'sma' (medias simples de ganancias y pérdidas, como el análisis
+            técnico original) o 'wilder' (suavizado de Wilder)
+
+    Returns:
+        Array con el RSI (0-100)
+    """
+    x = as_float_array(close)
+    delta = np.full(x.shape, np.nan)
+    delta[1:] = x[1:] - x[:-1]
+
+    with np.errstate(invalid='ignore'):
+        gains = np.where(delta > 0, delta, 0.0)
+        losses = np.where(delta < 0, -delta, 0.0)
+
+    # El relleno inicial de un panel (series más cortas) no cuenta como barras
+    started = np.maximum.accumulate(~np.isnan(x), axis=0)
+    gains[~started] = np.nan
+    losses[~started] = np.nan
+
+    if method == 'wilder':
+        avg_gain = _nan_like(x)
+        avg_loss = _nan_like(x)
+        shape2 = (x.shape[0], int(np.prod(x.shape[1:])))
+        gains2, losses2 = gains.reshape(shape2), losses.reshape(shape2)
+        avg_gain2, avg_loss2 = avg_gain.reshape(shape2), avg_loss.reshape(shape2)
+        started2 = started.reshape(shape2)
+        first = np.argmax(started2, axis=0) if x.shape[0] else np.zeros(shape2[1], dtype=int)
+        has_data = started2.any(axis=0)
+        decay = (period - 1.0) / period
+
+        # La semilla depende de la primera barra de cada columna: agrupar por inicio
+        for start in np.unique(first[has_data]):
+            seed_at = start + period
+            if seed_at >= len(x):
+                continue
+            columns = np.flatnonzero(has_data & (first == start))
+            seed_gain = gains2[start + 1:seed_at + 1, columns].mean(axis=0)
+            seed_loss = losses2[start + 1:seed_at + 1, columns].mean(axis=0)
+            avg_gain2[seed_at, columns] = seed_gain
+            avg_loss2[seed_at, columns] = seed_loss
+            avg_gain2[seed_at + 1:, columns] = decay_recurrence(gains2[seed_at + 1:, columns] / period, decay, initial=seed_gain)
+            avg_loss2[seed_at + 1:, columns] = decay_recurrence(losses2[seed_at + 1:, columns] / period, decay, initial=seed_loss)
+    else:
+        avg_gain = sma(gains, period)
+        avg_loss = sma(losses, period)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rs = avg_gain / avg_loss
+        return 100.0 - 100.0 / (1.0 + rs)
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9, adjust: bool = True) -> Dict[str, np.ndarray]:
+    """
+    MACD (Moving Average Convergence Divergence)
+
+    Returns:
+        Diccionario con 'macd', 'signal' e 'histogram'
+    """
+    x = as_float_array(close)
+    macd_line = ema(x, span=fast, adjust=adjust) - ema(x, span=slow, adjust=adjust)
+    signal_line = ema(macd_line, span=signal, adjust=adjust)
+    return {
+        'macd': macd_line,
+        'signal': signal_line,
+        'histogram': macd_line - signal_line
+    }
+
+
+def bollinger_bands(close, period: int = 20, std_dev: float = 2, ddof: int = 1) -> Dict[str, np.ndarray]:
+    """
+    Bandas de Bollinger
+
+    Returns:
+        Diccionario con 'upper', 'middle', 'lower' y 'width' (ancho en % de la media)
+    """
+    x = as_float_array(close)
+    middle = sma(x, period)
+    std = rolling_std(x, period, ddof=ddof)
+    upper = middle + std * std_dev
+    lower = middle - std * std_dev
+    with np.errstate(invalid='ignore', divide='ignore'):
+        width = (upper - lower) / middle * 100
+    return {
+        'upper': upper,
+        'middle': middle,
+        'lower': lower,
+        'width': width
+    }
+
+
+def moving_averages(close, periods: Iterable[int] = (5, 10, 20, 50, 200)) -> Dict[str, np.ndarray]:
+    """Medias móviles simples para varios períodos ('sma_<período>')"""
+    x = as_float_array(close)
+    return {f'sma_{period}': sma(x, period) for period in periods}
+
+
+def stochastic(high, low, close, k_period: int = 14, d_period: int = 3) -> Dict[str, np.ndarray]:
+    """
+    Oscilador estocástico
+
+    Returns:
+        Diccionario con 'k_percent' y 'd_percent'
+    """
+    lowest_low = rolling_min(low, k_period)
+    highest_high = rolling_max(high, k_period)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        k_percent = 100 * (as_float_array(close) - lowest_low) / (highest_high - lowest_low)
+    return {
+        'k_percent': k_percent,
+        'd_percent': sma(k_percent, d_period)
+    }
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """Rango verdadero (la primera barra usa solo máximo - mínimo)"""
+    high = as_float_array(high)
+    low = as_float_array(low)
+    close = as_float_array(close)
+    previous_close = np.full(close.shape, np.nan)
+    previous_close[1:] = close[:-1]
+    return np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """Average True Range (media simple del rango verdadero)"""
+    return sma(true_range(high, low, close), period)
+
+
+def pct_change(values, periods: int = 1) -> np.ndarray:
+    """Variación relativa respecto a `periods` barras antes"""
+    x = as_float_array(values)
+    out = _nan_like(x)
+    if x.shape[0] > periods:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[periods:] = x[periods:] / x[:-periods] - 1
+    return out
+
+
+def volatility(close, window: int, periods_per_year: int = TRADING_DAYS) -> np.ndarray:
+    """Volatilidad anualizada (%) de los rendimientos en una ventana móvil"""
+    return rolling_std(pct_change(close), window) * np.sqrt(periods_per_year) * 100
+
+
+# ============= PANELES (BARRAS x SÍMBOLOS) =============
+
+def build_panel(frames: Dict, columns: Iterable[str] = ('Close', 'High', 'Low', 'Volume'),
+                length: int = None) -> Tuple[List[str], Dict[str, np.ndarray], np.ndarray]:
+    """
+    Alinea los históricos de muchos símbolos en paneles 2-D (barras x símbolos)
+
+    Cada serie se alinea por su última barra, de modo que la última fila del
+    panel es la barra más reciente de cada símbolo; las series más cortas se
+    rellenan con NaN al principio (las funciones de este módulo tratan ese
+    relleno igual que una serie más corta).
+
+    Args:
+        frames: Diccionario símbolo -> DataFrame (se omiten los vacíos o None)
+        columns: Columnas a extraer
+        length: Número máximo de barras (default: la serie más larga)
+
+    Returns:
+        Tupla (símbolos, {columna: array barras x símbolos}, barras por símbolo)
+    """
+    columns = list(columns)
+    symbols = [symbol for symbol, frame in frames.items() if frame is not None and len(frame)]
+    lengths = np.array([len(frames[symbol]) for symbol in symbols], dtype=np.int64)
+    if length is None:
+        length = int(lengths.max()) if len(lengths) else 0
+    lengths = np.minimum(lengths, length)
+
+    # Un único bloque (columnas x barras x símbolos); cada panel es una vista
+    block = np.full((len(columns), length, len(symbols)), np.nan)
+    for j, symbol in enumerate(symbols):
+        rows = lengths[j]
+        if rows:
+            frame = frames[symbol]
+            for i, column in enumerate(columns):
+                block[i, length - rows:, j] = as_float_array(frame[column])[-rows:]
+    return symbols, {column: block[i] for i, column in enumerate(columns)}, lengths
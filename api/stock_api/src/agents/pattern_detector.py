@@ -11,20 +11,43 @@ from matplotlib.patches import Rectangle
 import io
 import base64
 from PIL import Image
-from typing import Dict, List
+from datetime import timedelta
+from typing import Dict, List, Optional
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from .pivots import PivotSet, extract_pivots
+    from .pattern_tracker import PatternTracker
+    from .analysis_cache import AnalysisCache
+    from . import flag_scanner
+    from . import trendlines
+except ImportError:
+    from pivots import PivotSet, extract_pivots
+    from pattern_tracker import PatternTracker
+    from analysis_cache import AnalysisCache
+    import flag_scanner
+    import trendlines
+
+# Escalas de pivotes: líneas de tendencia, cabeza y hombros, dobles techos/suelos
+PIVOT_WINDOWS = (5, 15, 20)
+
+# Estado incremental: símbolos retenidos (LRU) y tiempo sin actualizarse antes de descartarlo
+TRACKER_MAX_SYMBOLS = 500
+TRACKER_TTL = timedelta(days=7)
+
 class PatternDetector:
     """
     Detector avanzado de patrones técnicos usando análisis visual y algoritmos
     """
     
-    def __init__(self):
+    def __init__(self, incremental: bool = True):
         self.pattern_models = {
             'yolo_future_prediction': 'foduucom/stockmarket-future-prediction',
             'yolo_pattern_detection': 'foduucom/stockmarket-pattern-detection-yolov8'
         }
+        self.incremental = incremental  # Reexaminar solo las barras nuevas de cada símbolo
+        self.trackers = AnalysisCache(max_entries=TRACKER_MAX_SYMBOLS, ttl=TRACKER_TTL)
     
     def create_candlestick_chart(self, df: pd.DataFrame, title: str = "Stock Chart", 
                                 width: int = 800, height: int = 600) -> str:
@@ -87,8 +110,14 @@ class PatternDetector:
         
         return image_base64
     
+    def _pivots(self, df: pd.DataFrame, pivots: Optional[PivotSet], windows) -> PivotSet:
+        """Pivotes compartidos o, si no se pasan, extraídos para este detector"""
+        if pivots is None:
+            return extract_pivots(df['high'], df['low'], windows)
+        return pivots
+    
     def detect_double_top_bottom(self, df: pd.DataFrame, window: int = 20, 
-                                tolerance: float = 0.02) -> Dict[str, List]:
+                                tolerance: float = 0.02, pivots: Optional[PivotSet] = None) -> Dict[str, List]:
         """
         Detecta patrones de doble techo y doble suelo
         
@@ -96,72 +125,65 @@ class PatternDetector:
             df: DataFrame con datos OHLCV
             window: Ventana para buscar picos/valles
             tolerance: Tolerancia para considerar niveles similares
+            pivots: Pivotes ya extraídos de `df` (opcional)
             
         Returns:
             Diccionario con patrones detectados
         """
         patterns = {'double_top': [], 'double_bottom': []}
         
-        # Encontrar picos y valles
-        highs = df['high'].rolling(window=window, center=True).max()
-        lows = df['low'].rolling(window=window, center=True).min()
-        
-        peaks = df[df['high'] == highs].index
-        valleys = df[df['low'] == lows].index
-        
-        # Buscar dobles techos
-        for i in range(len(peaks) - 1):
-            for j in range(i + 1, len(peaks)):
-                peak1_price = df.loc[peaks[i], 'high']
-                peak2_price = df.loc[peaks[j], 'high']
-                
-                # Verificar si los picos están en niveles similares
-                if abs(peak1_price - peak2_price) / peak1_price <= tolerance:
-                    # Verificar que hay un valle entre los picos
-                    valleys_between = [v for v in valleys if peaks[i] < v < peaks[j]]
-                    if valleys_between:
-                        valley_price = min(df.loc[valleys_between, 'low'])
-                        if valley_price < peak1_price * (1 - tolerance):
-                            patterns['double_top'].append({
-                                'peak1_date': peaks[i],
-                                'peak1_price': peak1_price,
-                                'peak2_date': peaks[j],
-                                'peak2_price': peak2_price,
-                                'valley_price': valley_price,
-                                'strength': 1 - abs(peak1_price - peak2_price) / peak1_price
-                            })
-        
-        # Buscar dobles suelos
-        for i in range(len(valleys) - 1):
-            for j in range(i + 1, len(valleys)):
-                valley1_price = df.loc[valleys[i], 'low']
-                valley2_price = df.loc[valleys[j], 'low']
-                
-                # Verificar si los valles están en niveles similares
-                if abs(valley1_price - valley2_price) / valley1_price <= tolerance:
-                    # Verificar que hay un pico entre los valles
-                    peaks_between = [p for p in peaks if valleys[i] < p < valleys[j]]
-                    if peaks_between:
-                        peak_price = max(df.loc[peaks_between, 'high'])
-                        if peak_price > valley1_price * (1 + tolerance):
-                            patterns['double_bottom'].append({
-                                'valley1_date': valleys[i],
-                                'valley1_price': valley1_price,
-                                'valley2_date': valleys[j],
-                                'valley2_price': valley2_price,
-                                'peak_price': peak_price,
-                                'strength': 1 - abs(valley1_price - valley2_price) / valley1_price
-                            })
+        # Índices de picos y valles
+        pivots = self._pivots(df, pivots, (window,))
+        peaks = pivots.index(window, 'peak')
+        valleys = pivots.index(window, 'valley')
+        
+        # Buscar dobles techos: picos a niveles similares con un valle entre ellos
+        first, second = peaks.similar_pairs(tolerance)
+        found, valley_prices = valleys.between(peaks.positions[first], peaks.positions[second])
+        with np.errstate(invalid='ignore'):
+            valid = found & (valley_prices < peaks.prices[first] * (1 - tolerance))
+        
+        for i, j, valley_price in zip(first[valid], second[valid], valley_prices[valid]):
+            peak1_price = peaks.prices[i]
+            peak2_price = peaks.prices[j]
+            patterns['double_top'].append({
+                'peak1_date': df.index[peaks.positions[i]],
+                'peak1_price': peak1_price,
+                'peak2_date': df.index[peaks.positions[j]],
+                'peak2_price': peak2_price,
+                'valley_price': valley_price,
+                'strength': 1 - abs(peak1_price - peak2_price) / peak1_price
+            })
+        
+        # Buscar dobles suelos: valles a niveles similares con un pico entre ellos
+        first, second = valleys.similar_pairs(tolerance)
+        found, peak_prices = peaks.between(valleys.positions[first], valleys.positions[second])
+        with np.errstate(invalid='ignore'):
+            valid = found & (peak_prices > valleys.prices[first] * (1 + tolerance))
+        
+        for i, j, peak_price in zip(first[valid], second[valid], peak_prices[valid]):
+            valley1_price = valleys.prices[i]
+            valley2_price = valleys.prices[j]
+            patterns['double_bottom'].append({
+                'valley1_date': df.index[valleys.positions[i]],
+                'valley1_price': valley1_price,
+                'valley2_date': df.index[valleys.positions[j]],
+                'valley2_price': valley2_price,
+                'peak_price': peak_price,
+                'strength': 1 - abs(valley1_price - valley2_price) / valley1_price
+            })
         
         return patterns
     
-    def detect_head_shoulders(self, df: pd.DataFrame, window: int = 15) -> Dict[str, List]:
+    def detect_head_shoulders(self, df: pd.DataFrame, window: int = 15,
+                              pivots: Optional[PivotSet] = None) -> Dict[str, List]:
         """
         Detecta patrones de cabeza y hombros
         
         Args:
             df: DataFrame con datos OHLCV
             window: Ventana para buscar picos/valles
+            pivots: Pivotes ya extraídos de `df` (opcional)
             
         Returns:
             Diccionario con patrones detectados
@@ -169,166 +191,168 @@ class PatternDetector:
         patterns = {'head_shoulders': [], 'inverse_head_shoulders': []}
         
         # Encontrar picos y valles
-        highs = df['high'].rolling(window=window, center=True).max()
-        lows = df['low'].rolling(window=window, center=True).min()
-        
-        peaks = df[df['high'] == highs].index
-        valleys = df[df['low'] == lows].index
+        pivots = self._pivots(df, pivots, (window,))
+        peaks = pivots.peaks(window)
+        valleys = pivots.valleys(window)
+        high, low = pivots.high, pivots.low
         
         # Buscar cabeza y hombros (tres picos consecutivos)
-        for i in range(len(peaks) - 2):
-            left_shoulder = df.loc[peaks[i], 'high']
-            head = df.loc[peaks[i + 1], 'high']
-            right_shoulder = df.loc[peaks[i + 2], 'high']
-            
-            # Verificar que la cabeza es más alta que los hombros
-            if (head > left_shoulder and head > right_shoulder and
-                abs(left_shoulder - right_shoulder) / left_shoulder < 0.05):
-                
-                # Encontrar línea de cuello
-                valleys_around = [v for v in valleys 
-                                if peaks[i] < v < peaks[i + 2]]
-                if len(valleys_around) >= 2:
-                    neckline = np.mean([df.loc[v, 'low'] for v in valleys_around[:2]])
-                    
-                    patterns['head_shoulders'].append({
-                        'left_shoulder_date': peaks[i],
-                        'left_shoulder_price': left_shoulder,
-                        'head_date': peaks[i + 1],
-                        'head_price': head,
-                        'right_shoulder_date': peaks[i + 2],
-                        'right_shoulder_price': right_shoulder,
-                        'neckline': neckline,
-                        'target': neckline - (head - neckline)
-                    })
+        for i, neckline in self._three_pivot_candidates(peaks, valleys, high, low, head_above=True):
+            left_shoulder = high[peaks[i]]
+            head = high[peaks[i + 1]]
+            right_shoulder = high[peaks[i + 2]]
+            patterns['head_shoulders'].append({
+                'left_shoulder_date': df.index[peaks[i]],
+                'left_shoulder_price': left_shoulder,
+                'head_date': df.index[peaks[i + 1]],
+                'head_price': head,
+                'right_shoulder_date': df.index[peaks[i + 2]],
+                'right_shoulder_price': right_shoulder,
+                'neckline': neckline,
+                'target': neckline - (head - neckline)
+            })
         
         # Buscar cabeza y hombros invertido (tres valles consecutivos)
-        for i in range(len(valleys) - 2):
-            left_shoulder = df.loc[valleys[i], 'low']
-            head = df.loc[valleys[i + 1], 'low']
-            right_shoulder = df.loc[valleys[i + 2], 'low']
-            
-            # Verificar que la cabeza es más baja que los hombros
-            if (head < left_shoulder and head < right_shoulder and
-                abs(left_shoulder - right_shoulder) / left_shoulder < 0.05):
-                
-                # Encontrar línea de cuello
-                peaks_around = [p for p in peaks 
-                              if valleys[i] < p < valleys[i + 2]]
-                if len(peaks_around) >= 2:
-                    neckline = np.mean([df.loc[p, 'high'] for p in peaks_around[:2]])
-                    
-                    patterns['inverse_head_shoulders'].append({
-                        'left_shoulder_date': valleys[i],
-                        'left_shoulder_price': left_shoulder,
-                        'head_date': valleys[i + 1],
-                        'head_price': head,
-                        'right_shoulder_date': valleys[i + 2],
-                        'right_shoulder_price': right_shoulder,
-                        'neckline': neckline,
-                        'target': neckline + (neckline - head)
-                    })
+        for i, neckline in self._three_pivot_candidates(valleys, peaks, low, high, head_above=False):
+            left_shoulder = low[valleys[i]]
+            head = low[valleys[i + 1]]
+            right_shoulder = low[valleys[i + 2]]
+            patterns['inverse_head_shoulders'].append({
+                'left_shoulder_date': df.index[valleys[i]],
+                'left_shoulder_price': left_shoulder,
+                'head_date': df.index[valleys[i + 1]],
+                'head_price': head,
+                'right_shoulder_date': df.index[valleys[i + 2]],
+                'right_shoulder_price': right_shoulder,
+                'neckline': neckline,
+                'target': neckline + (neckline - head)
+            })
         
         return patterns
     
-    def detect_triangles(self, df: pd.DataFrame, min_touches: int = 4) -> Dict[str, List]:
+    def _three_pivot_candidates(self, pivots: np.ndarray, opposite: np.ndarray,
+                                prices: np.ndarray, opposite_prices: np.ndarray, head_above: bool):
+        """
+        Ternas de pivotes consecutivos con forma de cabeza y hombros
+        
+        La cabeza supera a los dos hombros (o queda por debajo en el invertido),
+        los hombros difieren menos de un 5% y hay al menos dos pivotes opuestos
+        entre los hombros; la línea de cuello es la media de los dos primeros.
+        
+        Returns:
+            Lista de (índice del hombro izquierdo, línea de cuello)
+        """
+        if len(pivots) < 3:
+            return []
+        
+        left, head, right = prices[pivots[:-2]], prices[pivots[1:-1]], prices[pivots[2:]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if head_above:
+                shape = (head > left) & (head > right)
+            else:
+                shape = (head < left) & (head < right)
+            shape &= np.abs(left - right) / left < 0.05
+        
+        # Pivotes opuestos estrictamente entre los hombros
+        lo = np.searchsorted(opposite, pivots[:-2], side='right')
+        hi = np.searchsorted(opposite, pivots[2:], side='left')
+        candidates = np.flatnonzero(shape & (hi - lo >= 2))
+        
+        return [
+            (i, np.mean([opposite_prices[opposite[lo[i]]], opposite_prices[opposite[lo[i] + 1]]]))
+            for i in candidates
+        ]
+    
+    def detect_triangles(self, df: pd.DataFrame, min_touches: int = 4,
+                         pivots: Optional[PivotSet] = None) -> Dict[str, List]:
         """
         Detecta patrones de triángulos
         
         Args:
             df: DataFrame con datos OHLCV
-            min_touches: Mínimo número de toques para validar línea de tendencia
+            min_touches: Mínimo número de toques (pivotes) entre las dos líneas de tendencia
+            pivots: Pivotes ya extraídos de `df` (opcional)
             
         Returns:
             Diccionario con patrones detectados
         """
-        patterns = {'ascending_triangle': [], 'descending_triangle': [], 'symmetrical_triangle': []}
-        
-        # Usar últimos 100 períodos para análisis
-        df_recent = df.tail(100)
-        
-        # Encontrar líneas de tendencia
-        resistance_levels = self._find_resistance_line(df_recent)
-        support_levels = self._find_support_line(df_recent)
-        
-        for resistance in resistance_levels:
-            for support in support_levels:
-                # Verificar convergencia de líneas
-                start_gap = abs(resistance['start_price'] - support['start_price'])
-                end_gap = abs(resistance['end_price'] - support['end_price'])
-                
-                if end_gap < start_gap * 0.5:  # Las líneas convergen
-                    # Clasificar tipo de triángulo
-                    if abs(resistance['slope']) < 0.001:  # Resistencia horizontal
-                        patterns['ascending_triangle'].append({
-                            'resistance_line': resistance,
-                            'support_line': support,
-                            'convergence_point': self._find_convergence(resistance, support)
-                        })
-                    elif abs(support['slope']) < 0.001:  # Soporte horizontal
-                        patterns['descending_triangle'].append({
-                            'resistance_line': resistance,
-                            'support_line': support,
-                            'convergence_point': self._find_convergence(resistance, support)
-                        })
-                    else:  # Ambas líneas inclinadas
-                        patterns['symmetrical_triangle'].append({
-                            'resistance_line': resistance,
-                            'support_line': support,
-                            'convergence_point': self._find_convergence(resistance, support)
-                        })
-        
-        return patterns
+        return self.detect_trendline_patterns(df, min_touches, pivots)['triangles']
     
-    def _find_resistance_line(self, df: pd.DataFrame) -> List[Dict]:
-        """Encuentra líneas de resistencia"""
-        # Simplificado: buscar máximos locales y ajustar línea
-        highs = df['high'].rolling(window=5, center=True).max()
-        peaks = df[df['high'] == highs]
-        
-        if len(peaks) < 2:
-            return []
+    def detect_trendline_patterns(self, df: pd.DataFrame, min_touches: int = 4,
+                                  pivots: Optional[PivotSet] = None) -> Dict[str, Dict[str, List]]:
+        """
+        Detecta triángulos, cuñas y canales con las líneas de tendencia de las últimas barras
         
-        # Ajustar línea de tendencia a los picos
-        x = np.arange(len(peaks))
-        y = peaks['high'].values
-        
-        if len(x) >= 2:
-            slope, intercept = np.polyfit(x, y, 1)
-            return [{
-                'slope': slope,
-                'intercept': intercept,
-                'start_price': y[0],
-                'end_price': y[-1],
-                'touches': len(peaks)
-            }]
-        
-        return []
+        Args:
+            df: DataFrame con datos OHLCV
+            min_touches: Mínimo número de toques (pivotes) entre las dos líneas de tendencia
+            pivots: Pivotes ya extraídos de `df` (opcional)
+            
+        Returns:
+            Diccionario {'triangles': ..., 'wedges_channels': ...} con los patrones de cada forma
+        """
+        # Ventanas que acaban en la última barra (la más larga, 100 períodos)
+        df_recent = df.tail(trendlines.lookback())
+        start = len(df) - len(df_recent)
+        window = trendlines.PIVOT_WINDOW
+        pivots = self._pivots(df, pivots, (window,))
+        
+        return self._classify_trendlines(df_recent, pivots.peaks(window, start),
+                                         pivots.valleys(window, start), min_touches)
     
-    def _find_support_line(self, df: pd.DataFrame) -> List[Dict]:
-        """Encuentra líneas de soporte"""
-        # Simplificado: buscar mínimos locales y ajustar línea
-        lows = df['low'].rolling(window=5, center=True).min()
-        valleys = df[df['low'] == lows]
-        
-        if len(valleys) < 2:
-            return []
-        
-        # Ajustar línea de tendencia a los valles
-        x = np.arange(len(valleys))
-        y = valleys['low'].values
-        
-        if len(x) >= 2:
-            slope, intercept = np.polyfit(x, y, 1)
-            return [{
-                'slope': slope,
-                'intercept': intercept,
-                'start_price': y[0],
-                'end_price': y[-1],
-                'touches': len(valleys)
-            }]
-        
-        return []
+    def _classify_trendlines(self, df: pd.DataFrame, peaks: np.ndarray, valleys: np.ndarray,
+                             min_touches: int = 4) -> Dict[str, Dict[str, List]]:
+        """
+        Ajusta las líneas de resistencia y soporte de cada ventana de trendlines.TRENDLINE_WINDOWS
+        que acaba en la última barra de `df` y clasifica la forma que dibujan
+
+        Args:
+            df: Barras recientes
+            peaks: Posiciones (en `df`) de los máximos locales
+            valleys: Posiciones (en `df`) de los mínimos locales
+            min_touches: Mínimo número de toques entre las dos líneas
+
+        Returns:
+            Diccionario {'triangles': ..., 'wedges_channels': ...}; cada grupo
+            asocia el nombre de la forma a la lista de ventanas que la forman
+        """
+        shapes = {name: [] for name in trendlines.SHAPES if name}
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        peak_mask = np.zeros(len(df), dtype=bool)
+        peak_mask[peaks] = True
+        valley_mask = np.zeros(len(df), dtype=bool)
+        valley_mask[valleys] = True
+        
+        for window in trendlines.TRENDLINE_WINDOWS:
+            if len(df) < window:
+                continue
+            recent = slice(len(df) - window, None)
+            resistance = self._trendline(trendlines.fit_lines(high[recent], peak_mask[recent], window))
+            support = self._trendline(trendlines.fit_lines(low[recent], valley_mask[recent], window))
+            shape = trendlines.SHAPES[trendlines.classify(resistance, support, min_touches).item()]
+            if shape is None:
+                continue
+            shapes[shape].append({
+                'resistance_line': resistance,
+                'support_line': support,
+                # Los canales son casi paralelos: no convergen
+                'convergence_point': None if shape.endswith('channel') else self._find_convergence(resistance, support),
+                'window': window
+            })
+        
+        return {
+            'triangles': {name: shapes[name] for name in trendlines.TRIANGLES},
+            'wedges_channels': {name: patterns for name, patterns in shapes.items() if name not in trendlines.TRIANGLES}
+        }
+    
+    @staticmethod
+    def _trendline(fits: Dict[str, np.ndarray]) -> Dict:
+        """Línea de la última ventana (x en barras desde el inicio de la ventana)"""
+        line = {name: values[-1].item() for name, values in fits.items()}
+        if not np.isnan(line['touches']):
+            line['touches'] = int(line['touches'])
+        return line
     
     def _find_convergence(self, line1: Dict, line2: Dict) -> Dict:
         """Encuentra el punto de convergencia de dos líneas"""
@@ -360,38 +384,19 @@ class PatternDetector:
         """
         patterns = {'bull_flag': [], 'bear_flag': [], 'pennant': []}
         
-        # Buscar movimientos fuertes (mástil de la bandera)
-        df['price_change'] = df['close'].pct_change(5)  # Cambio en 5 períodos
-        
-        strong_moves = df[abs(df['price_change']) > 0.05]  # Movimientos > 5%
-        
-        for idx in strong_moves.index:
-            # Analizar consolidación después del movimiento fuerte
-            start_idx = df.index.get_loc(idx)
-            if start_idx + 20 < len(df):
-                consolidation = df.iloc[start_idx:start_idx + 20]
-                
-                # Verificar si hay consolidación (volatilidad reducida)
-                volatility = consolidation['high'].max() - consolidation['low'].min()
-                avg_price = consolidation['close'].mean()
-                
-                if volatility / avg_price < 0.05:  # Consolidación estrecha
-                    move_direction = 'up' if strong_moves.loc[idx, 'price_change'] > 0 else 'down'
-                    
-                    if move_direction == 'up':
-                        patterns['bull_flag'].append({
-                            'flagpole_start': idx,
-                            'flagpole_end': consolidation.index[0],
-                            'flag_end': consolidation.index[-1],
-                            'breakout_target': avg_price * (1 + abs(strong_moves.loc[idx, 'price_change']))
-                        })
-                    else:
-                        patterns['bear_flag'].append({
-                            'flagpole_start': idx,
-                            'flagpole_end': consolidation.index[0],
-                            'flag_end': consolidation.index[-1],
-                            'breakout_target': avg_price * (1 - abs(strong_moves.loc[idx, 'price_change']))
-                        })
+        # Mástil (cambio en 5 períodos > 5%) y consolidación de las 20 barras siguientes, para toda la serie
+        flags = flag_scanner.scan_flags(df['high'], df['low'], df['close'])
+        
+        for name in ('bull_flag', 'bear_flag'):
+            moves = np.flatnonzero(flags[name])
+            targets = flag_scanner.breakout_target(flags['avg_price'][moves], flags['change'][moves])
+            for move, target in zip(moves, targets):
+                patterns[name].append({
+                    'flagpole_start': df.index[move],
+                    'flagpole_end': df.index[move],
+                    'flag_end': df.index[move + flag_scanner.FLAG_BARS - 1],
+                    'breakout_target': target
+                })
         
         return patterns
     
@@ -414,11 +419,23 @@ class PatternDetector:
             'patterns': {}
         }
         
-        # Detectar diferentes tipos de patrones
-        analysis['patterns']['double_patterns'] = self.detect_double_top_bottom(df)
-        analysis['patterns']['head_shoulders'] = self.detect_head_shoulders(df)
-        analysis['patterns']['triangles'] = self.detect_triangles(df)
-        analysis['patterns']['flags_pennants'] = self.detect_flag_pennant(df)
+        if self.incremental:
+            # Estado por símbolo: solo se examinan las barras llegadas desde la última llamada
+            tracker = self.trackers.get(symbol)
+            if tracker is None:
+                tracker = PatternTracker(self)
+            analysis['patterns'] = tracker.update(df)
+            # Guardar de nuevo renueva el TTL: solo caducan los símbolos que dejan de consultarse
+            self.trackers.set(symbol, tracker)
+        else:
+            # Pivotes de todas las escalas en una sola pasada, compartidos por los detectores
+            pivots = extract_pivots(df['high'], df['low'], PIVOT_WINDOWS)
+            
+            # Detectar diferentes tipos de patrones
+            analysis['patterns']['double_patterns'] = self.detect_double_top_bottom(df, pivots=pivots)
+            analysis['patterns']['head_shoulders'] = self.detect_head_shoulders(df, pivots=pivots)
+            analysis['patterns'].update(self.detect_trendline_patterns(df, pivots=pivots))
+            analysis['patterns']['flags_pennants'] = self.detect_flag_pennant(df)
         
         # Resumen de patrones encontrados
         total_patterns = 0
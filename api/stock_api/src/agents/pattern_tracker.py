@@ -0,0 +1,421 @@
+"""
+Seguimiento Incremental de Patrones
+Estado por símbolo de los pivotes confirmados y de los patrones ya cerrados,
+para que cada actualización solo examine las barras nuevas
+
+Un pivote de ventana w queda confirmado cuando llegan las barras de la mitad
+derecha de su ventana; un doble techo o un cabeza y hombros se cierra con la
+confirmación de su último pivote, y una bandera cuando se completan sus barras
+de consolidación. La última barra se trata como provisional (puede revisarse
+durante la sesión): sus efectos se calculan en cada consulta sin guardarse.
+El resultado es el mismo que el de los detectores por lotes de PatternDetector.
+"""
+
+import bisect
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+try:
+    from .pivots import find_pivots
+    from .flag_scanner import scan_flags, breakout_target, FLAG_MOVE_BARS, FLAG_BARS
+    from . import trendlines
+except ImportError:
+    from pivots import find_pivots
+    from flag_scanner import scan_flags, breakout_target, FLAG_MOVE_BARS, FLAG_BARS
+    import trendlines
+
+# Parámetros de PatternDetector.analyze_patterns
+DOUBLE_WINDOW = 20
+DOUBLE_TOLERANCE = 0.02
+HEAD_SHOULDERS_WINDOW = 15
+HEAD_SHOULDERS_TOLERANCE = 0.05
+TRENDLINE_WINDOW = trendlines.PIVOT_WINDOW
+TRENDLINE_BARS = trendlines.lookback()
+
+
+def confirmation_lag(window: int) -> int:
+    """Barras posteriores a un pivote necesarias para confirmarlo"""
+    return window - 1 - window // 2
+
+
+class PivotTrack:
+    """
+    Pivotes confirmados de un tipo (picos o valles) y una escala
+
+    Con `indexed`, mantiene además el orden por precio (niveles similares por
+    bisección) y una pila monótona con el extremo de los pivotes posteriores a
+    cualquier posición.
+    """
+
+    def __init__(self, kind: str, indexed: bool = False):
+        self.kind = kind
+        self.indexed = indexed
+        self.positions: List[int] = []
+        self.prices: List[float] = []
+        self._sorted_prices: List[float] = []
+        self._sorted_positions: List[int] = []
+        self._stack_positions: List[int] = []
+        self._stack_prices: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def add(self, position: int, price: float):
+        """Añade un pivote posterior a todos los guardados"""
+        self.positions.append(position)
+        self.prices.append(price)
+        if not self.indexed:
+            return
+
+        slot = bisect.bisect_right(self._sorted_prices, price)
+        self._sorted_prices.insert(slot, price)
+        self._sorted_positions.insert(slot, position)
+
+        # Pila monótona: máximos decrecientes (picos) o mínimos crecientes (valles)
+        while self._stack_prices and (
+            self._stack_prices[-1] <= price if self.kind == 'peak' else self._stack_prices[-1] >= price
+        ):
+            self._stack_prices.pop()
+            self._stack_positions.pop()
+        self._stack_positions.append(position)
+        self._stack_prices.append(price)
+
+    def similar(self, price: float, tolerance: float) -> List:
+        """Pivotes (posición, precio) con |precio - p| / p <= tolerance, en orden temporal"""
+        if price > 0:
+            lo = bisect.bisect_left(self._sorted_prices, price / (1 + tolerance) * (1 - 1e-9))
+            hi = bisect.bisect_right(self._sorted_prices, price / (1 - tolerance) * (1 + 1e-9))
+        else:
+            lo, hi = 0, len(self._sorted_prices)
+
+        matches = []
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for slot in range(lo, hi):
+                level = self._sorted_prices[slot]
+                if abs(level - price) / level <= tolerance:
+                    matches.append((self._sorted_positions[slot], level))
+        matches.sort()
+        return matches
+
+    def extreme_after(self, position: int) -> Optional[float]:
+        """Máximo (picos) o mínimo (valles) de los pivotes posteriores a `position`"""
+        slot = bisect.bisect_right(self._stack_positions, position)
+        if slot == len(self._stack_positions):
+            return None
+        return self._stack_prices[slot]
+
+
+class PatternTracker:
+    """
+    Detector incremental de patrones de un símbolo
+
+    `update(df)` recibe la serie completa cada vez; si continúa la serie ya
+    vista solo se procesan las barras nuevas. El estado se ancla a las fechas
+    de las barras: si la ventana se desplaza (la serie empieza más tarde) se
+    renumeran las posiciones y se descartan los pivotes y patrones que ya no
+    caben en ella. Si la historia cambia (barras revisadas que no son la
+    última, serie que empieza antes o no contiene las barras confirmadas) se
+    reconstruye el estado.
+    """
+
+    def __init__(self, detector):
+        """
+        Args:
+            detector: PatternDetector (líneas de tendencia y triángulos)
+        """
+        self.detector = detector
+        self.reset()
+
+    def reset(self):
+        """Descarta el estado"""
+        self.length = 0  # Barras confirmadas (todas salvo la última vista)
+        self._last = None  # Etiqueta y valores de la última barra confirmada
+        self._index = None  # Fechas de las barras confirmadas
+        self.tracks = {
+            (window, kind): PivotTrack(kind, indexed=window == DOUBLE_WINDOW)
+            for window in (DOUBLE_WINDOW, HEAD_SHOULDERS_WINDOW, TRENDLINE_WINDOW)
+            for kind in ('peak', 'valley')
+        }
+        self.found = self._empty()
+
+    @staticmethod
+    def _empty() -> Dict[str, List]:
+        return {
+            'double_top': [], 'double_bottom': [],
+            'head_shoulders': [], 'inverse_head_shoulders': [],
+            'flags': []
+        }
+
+    # ============= ACTUALIZACIÓN =============
+
+    def _offset(self, df: pd.DataFrame, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> Optional[int]:
+        """
+        Barras confirmadas que la serie ya no incluye al principio (0 si
+        empieza en la misma barra), o None si no contiene sin cambios el resto
+        """
+        if self.length == 0:
+            return 0
+        offset = int(self._index.searchsorted(df.index[0]))
+        if offset >= self.length or self._index[offset] != df.index[0]:
+            return None
+        last = self.length - 1 - offset
+        if len(df) <= last + 1:
+            return None
+        if self._last != (df.index[last], high[last], low[last], close[last]):
+            return None
+        return offset
+
+    def _rebase(self, offset: int):
+        """
+        Desplaza el estado `offset` barras hacia la izquierda
+
+        Quedan los pivotes cuya ventana sigue completa dentro de la serie y los
+        patrones cuyo primer pivote (o mástil) se conserva, igual que si se
+        detectaran por lotes sobre la serie recortada.
+        """
+        for (window, kind), track in list(self.tracks.items()):
+            rebased = PivotTrack(kind, track.indexed)
+            for position, price in zip(track.positions, track.prices):
+                if position - offset >= window // 2:
+                    rebased.add(position - offset, price)
+            self.tracks[(window, kind)] = rebased
+
+        found = self._empty()
+        for name in ('double_top', 'double_bottom'):
+            found[name] = [
+                (first - offset, second - offset, first_price, second_price, between)
+                for first, second, first_price, second_price, between in self.found[name]
+                if first - offset >= DOUBLE_WINDOW // 2
+            ]
+        for name in ('head_shoulders', 'inverse_head_shoulders'):
+            found[name] = [
+                (left - offset, head - offset, right - offset, neckline)
+                for left, head, right, neckline in self.found[name]
+                if left - offset >= HEAD_SHOULDERS_WINDOW // 2
+            ]
+        found['flags'] = [
+            (move - offset, change, avg_price)
+            for move, change, avg_price in self.found['flags']
+            if move - offset >= FLAG_MOVE_BARS
+        ]
+        self.found = found
+
+        self.length -= offset
+        self._index = self._index[offset:]
+
+    def update(self, df: pd.DataFrame) -> Dict:
+        """
+        Incorpora las barras nuevas y devuelve los patrones de toda la serie
+
+        Args:
+            df: DataFrame OHLCV completo
+
+        Returns:
+            Diccionario de patrones con el formato de PatternDetector.analyze_patterns
+        """
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        close = df['close'].to_numpy(dtype=float)
+        n = len(df)
+
+        offset = self._offset(df, high, low, close)
+        if offset is None:
+            self.reset()
+        elif offset:
+            self._rebase(offset)
+
+        # Confirmar todas las barras salvo la última
+        if n - 1 > self.length:
+            self._advance(high, low, close, self.length, n - 1, commit=True)
+            self.length = n - 1
+            last = n - 2
+            self._last = (df.index[last], high[last], low[last], close[last])
+            self._index = df.index[:last + 1]
+
+        provisional, trendline = self._advance(high, low, close, max(n - 1, 0), n, commit=False)
+        return self._patterns(df, provisional, trendline)
+
+    def _new_pivots(self, values: np.ndarray, window: int, kind: str, t0: int, t1: int) -> np.ndarray:
+        """Pivotes que se confirman al llegar las barras [t0, t1)"""
+        lag = confirmation_lag(window)
+        first = max(t0 - lag, window // 2)
+        if t1 - lag <= first:
+            return np.empty(0, dtype=np.int64)
+        lo = first - window // 2
+        if t1 - lag - first == 1:
+            # Una sola barra nueva: comparar el candidato con su ventana
+            values_window = values[lo:t1]
+            extreme = values_window.max() if kind == 'peak' else values_window.min()
+            return np.array([first] if values[first] == extreme else [], dtype=np.int64)
+        positions = find_pivots(values[lo:t1], window, 'max' if kind == 'peak' else 'min') + lo
+        return positions[positions >= first]
+
+    def _advance(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                 t0: int, t1: int, commit: bool):
+        """
+        Procesa la llegada de las barras [t0, t1)
+
+        Con `commit` se guardan los pivotes y patrones; sin él (barra
+        provisional) solo se devuelven.
+
+        Returns:
+            Tupla (patrones encontrados, pivotes de línea de tendencia nuevos)
+        """
+        found = self.found if commit else self._empty()
+        values = {'peak': high, 'valley': low}
+
+        # Dobles techos y suelos
+        self._advance_scale(DOUBLE_WINDOW, values, t0, t1, commit, lambda kind, position, price: self._match_double(
+            kind, position, price, found['double_top' if kind == 'peak' else 'double_bottom']))
+
+        # Cabeza y hombros
+        self._advance_scale(HEAD_SHOULDERS_WINDOW, values, t0, t1, commit, lambda kind, position, price: self._match_head_shoulders(
+            kind, position, price, found['head_shoulders' if kind == 'peak' else 'inverse_head_shoulders']))
+
+        # Pivotes de las líneas de tendencia
+        trendline = {}
+        for kind in ('peak', 'valley'):
+            positions = self._new_pivots(values[kind], TRENDLINE_WINDOW, kind, t0, t1)
+            if commit:
+                track = self.tracks[(TRENDLINE_WINDOW, kind)]
+                for position in positions.tolist():
+                    track.add(position, values[kind][position])
+            trendline[kind] = positions
+
+        # Banderas cuyas barras de consolidación se completan
+        first = max(t0 - FLAG_BARS, FLAG_MOVE_BARS)
+        last = t1 - FLAG_BARS
+        if last > first:
+            # Tramo justo para evaluar los mástiles [first, last) con sus consolidaciones
+            lo = first - FLAG_MOVE_BARS
+            window = slice(lo, last + FLAG_BARS)
+            flags = scan_flags(high[window], low[window], close[window])
+            for move in np.flatnonzero(flags['bull_flag'] | flags['bear_flag']).tolist():
+                found['flags'].append((move + lo, flags['change'][move], flags['avg_price'][move]))
+
+        return found, trendline
+
+    def _advance_scale(self, window: int, values: Dict[str, np.ndarray], t0: int, t1: int,
+                       commit: bool, match):
+        """Confirma en orden temporal los picos y valles de una escala y busca patrones al cerrar cada uno"""
+        new = {kind: self._new_pivots(values[kind], window, kind, t0, t1).tolist() for kind in ('peak', 'valley')}
+        peaks, valleys = set(new['peak']), set(new['valley'])
+        for position in sorted(peaks | valleys):
+            # Un pico y un valle en la misma barra no se consideran "entre" sí: buscar antes de guardar
+            kinds = [kind for kind, positions in (('peak', peaks), ('valley', valleys)) if position in positions]
+            for kind in kinds:
+                match(kind, position, values[kind][position])
+            if commit:
+                for kind in kinds:
+                    self.tracks[(window, kind)].add(position, values[kind][position])
+
+    def _match_double(self, kind: str, position: int, price: float, found: List):
+        """Dobles techos (picos) o suelos (valles) que cierra un nuevo pivote"""
+        opposite = self.tracks[(DOUBLE_WINDOW, 'valley' if kind == 'peak' else 'peak')]
+        for first_position, first_price in self.tracks[(DOUBLE_WINDOW, kind)].similar(price, DOUBLE_TOLERANCE):
+            between = opposite.extreme_after(first_position)
+            if between is None:
+                continue
+            if kind == 'peak':
+                valid = between < first_price * (1 - DOUBLE_TOLERANCE)
+            else:
+                valid = between > first_price * (1 + DOUBLE_TOLERANCE)
+            if valid:
+                found.append((first_position, position, first_price, price, between))
+
+    def _match_head_shoulders(self, kind: str, position: int, price: float, found: List):
+        """Cabeza y hombros (picos) o invertido (valles) cuyo hombro derecho es el nuevo pivote"""
+        track = self.tracks[(HEAD_SHOULDERS_WINDOW, kind)]
+        if len(track) < 2:
+            return
+        left, head, right = track.prices[-2], track.prices[-1], price
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if kind == 'peak':
+                shape = head > left and head > right
+            else:
+                shape = head < left and head < right
+            if not (shape and abs(left - right) / left < HEAD_SHOULDERS_TOLERANCE):
+                return
+
+        # Línea de cuello: los dos primeros pivotes opuestos entre los hombros
+        opposite = self.tracks[(HEAD_SHOULDERS_WINDOW, 'valley' if kind == 'peak' else 'peak')]
+        lo = bisect.bisect_right(opposite.positions, track.positions[-2])
+        if len(opposite) - lo < 2:
+            return
+        neckline = np.mean(opposite.prices[lo:lo + 2])
+        found.append((track.positions[-2], track.positions[-1], position, neckline))
+
+    # ============= RESULTADO =============
+
+    def _patterns(self, df: pd.DataFrame, provisional: Dict[str, List], trendline: Dict[str, np.ndarray]) -> Dict:
+        """Patrones de la serie completa (confirmados + barra provisional)"""
+        index = df.index
+        high = df['high'].to_numpy(dtype=float)
+        low = df['low'].to_numpy(dtype=float)
+        found = {name: self.found[name] + provisional[name] for name in self.found}
+
+        double_top = [{
+            'peak1_date': index[first],
+            'peak1_price': first_price,
+            'peak2_date': index[second],
+            'peak2_price': second_price,
+            'valley_price': between,
+            'strength': 1 - abs(first_price - second_price) / first_price
+        } for first, second, first_price, second_price, between in sorted(found['double_top'])]
+        double_bottom = [{
+            'valley1_date': index[first],
+            'valley1_price': first_price,
+            'valley2_date': index[second],
+            'valley2_price': second_price,
+            'peak_price': between,
+            'strength': 1 - abs(first_price - second_price) / first_price
+        } for first, second, first_price, second_price, between in sorted(found['double_bottom'])]
+
+        head_shoulders = [{
+            'left_shoulder_date': index[left],
+            'left_shoulder_price': high[left],
+            'head_date': index[head],
+            'head_price': high[head],
+            'right_shoulder_date': index[right],
+            'right_shoulder_price': high[right],
+            'neckline': neckline,
+            'target': neckline - (high[head] - neckline)
+        } for left, head, right, neckline in found['head_shoulders']]
+        inverse_head_shoulders = [{
+            'left_shoulder_date': index[left],
+            'left_shoulder_price': low[left],
+            'head_date': index[head],
+            'head_price': low[head],
+            'right_shoulder_date': index[right],
+            'right_shoulder_price': low[right],
+            'neckline': neckline,
+            'target': neckline + (neckline - low[head])
+        } for left, head, right, neckline in found['inverse_head_shoulders']]
+
+        flags = {'bull_flag': [], 'bear_flag': [], 'pennant': []}
+        for move, change, avg_price in found['flags']:
+            flags['bull_flag' if change > 0 else 'bear_flag'].append({
+                'flagpole_start': index[move],
+                'flagpole_end': index[move],
+                'flag_end': index[move + FLAG_BARS - 1],
+                'breakout_target': breakout_target(avg_price, change).item()
+            })
+
+        return {
+            'double_patterns': {'double_top': double_top, 'double_bottom': double_bottom},
+            'head_shoulders': {'head_shoulders': head_shoulders, 'inverse_head_shoulders': inverse_head_shoulders},
+            **self._trendline_patterns(df, trendline),
+            'flags_pennants': flags
+        }
+
+    def _trendline_patterns(self, df: pd.DataFrame, trendline: Dict[str, np.ndarray]) -> Dict[str, Dict]:
+        """Triángulos, cuñas y canales de las últimas barras a partir de los pivotes de línea de tendencia"""
+        df_recent = df.tail(TRENDLINE_BARS)
+        start = len(df) - len(df_recent) + TRENDLINE_WINDOW // 2
+        pivots = {}
+        for kind in ('peak', 'valley'):
+            positions = self.tracks[(TRENDLINE_WINDOW, kind)].positions
+            recent = positions[bisect.bisect_left(positions, start):]
+            pivots[kind] = np.concatenate([np.asarray(recent, dtype=np.int64), trendline[kind]]) - (len(df) - len(df_recent))
+        return self.detector._classify_trendlines(df_recent, pivots['peak'], pivots['valley'])
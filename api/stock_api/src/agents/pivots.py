@@ -0,0 +1,282 @@
+"""
+Pivotes de Precio
+Extracción de máximos y mínimos locales e índice de pivotes para emparejar
+niveles de precio similares sin comparar todos los pares
+
+El índice ordena los pivotes por precio (niveles similares por bisección dentro
+de una banda de tolerancia) y guarda una tabla dispersa de mínimos/máximos por
+posición, que responde en O(1) al extremo de los pivotes entre dos fechas.
+
+`extract_pivots` obtiene los picos y valles de varias escalas (ventanas) a la
+vez: las tablas dispersas de máximos y mínimos se construyen una sola vez por
+serie y cada escala es una consulta O(1) por barra sobre ellas.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    from . import indicators
+except ImportError:
+    import indicators
+
+
+def rolling_extreme(values, window: int, kind: str = 'max') -> np.ndarray:
+    """
+    Máximo o mínimo en una ventana centrada
+
+    Misma alineación que `Series.rolling(window, center=True)`: la barra i usa
+    las barras [i - window // 2, i - window // 2 + window). NaN en los bordes o
+    si la ventana contiene NaN.
+    """
+    values = indicators.as_float_array(values)
+    out = np.full(values.shape, np.nan)
+    if window < 1 or len(values) < window:
+        return out
+    windows = sliding_window_view(values, window, axis=0)
+    offset = window // 2
+    reduce = np.max if kind == 'max' else np.min
+    out[offset:offset + windows.shape[0]] = reduce(windows, axis=-1)
+    return out
+
+
+def find_pivots(values, window: int, kind: str = 'max') -> np.ndarray:
+    """Posiciones donde el valor es el extremo de su ventana centrada"""
+    values = indicators.as_float_array(values)
+    with np.errstate(invalid='ignore'):
+        return np.flatnonzero(values == rolling_extreme(values, window, kind))
+
+
+class SparseTable:
+    """
+    Tabla dispersa para consultas de mínimo o máximo en rangos
+
+    Construcción O(n log n); cada consulta [lo, hi) es O(1) y se resuelve de
+    forma vectorizada para muchos rangos a la vez.
+    """
+
+    def __init__(self, values: np.ndarray, kind: str = 'min', skipna: bool = False,
+                 max_width: Optional[int] = None):
+        """
+        Args:
+            values: Serie (o panel con el tiempo en el eje 0)
+            kind: 'min' o 'max'
+            skipna: Ignorar NaN (como pandas) en lugar de propagarlos
+            max_width: Rango más largo que se consultará (limita la memoria en paneles)
+        """
+        if skipna:
+            self.reduce = np.fmin if kind == 'min' else np.fmax
+        else:
+            self.reduce = np.minimum if kind == 'min' else np.maximum
+        self.levels = [np.asarray(values, dtype=float)]
+        limit = len(values) if max_width is None else min(len(values), max_width)
+        width = 1
+        while width * 2 <= limit:
+            previous = self.levels[-1]
+            self.levels.append(self.reduce(previous[:-width], previous[width:]))
+            width *= 2
+
+    def rolling(self, window: int) -> np.ndarray:
+        """Extremo de cada ventana [s, s + window) para todos los inicios s"""
+        k = window.bit_length() - 1
+        table = self.levels[k]
+        count = len(self.levels[0]) - window + 1
+        return self.reduce(table[:count], table[window - (1 << k):window - (1 << k) + count])
+
+    def query(self, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+        """Extremo de cada rango [lo, hi) no vacío"""
+        lo = np.asarray(lo, dtype=np.int64)
+        hi = np.asarray(hi, dtype=np.int64)
+        out = np.empty(lo.shape)
+        if lo.size == 0:
+            return out
+        level = np.floor(np.log2(hi - lo)).astype(np.int64)
+        for k in np.unique(level):
+            rows = level == k
+            table = self.levels[k]
+            out[rows] = self.reduce(table[lo[rows]], table[hi[rows] - (1 << int(k))])
+        return out
+
+
+class PivotIndex:
+    """
+    Índice de pivotes de un mismo tipo (picos o valles)
+
+    Los pivotes se guardan en orden temporal (posición en la serie). El orden
+    por precio permite buscar niveles similares por bisección y la tabla
+    dispersa da el extremo de los pivotes situados entre dos posiciones: el
+    mínimo para valles y el máximo para picos.
+    """
+
+    def __init__(self, positions, prices, kind: str = 'peak'):
+        """
+        Args:
+            positions: Posiciones de los pivotes en la serie (crecientes)
+            prices: Precio de cada pivote
+            kind: 'peak' o 'valley'
+        """
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.prices = np.asarray(prices, dtype=float)
+        self.kind = kind
+        self._by_price = np.argsort(self.prices, kind='stable')
+        self._sorted_prices = self.prices[self._by_price]
+        self._table = SparseTable(self.prices, 'max' if kind == 'peak' else 'min')
+
+    @classmethod
+    def from_series(cls, values, window: int, kind: str = 'peak') -> 'PivotIndex':
+        """Índice de los pivotes de una serie (máximos locales para picos, mínimos para valles)"""
+        values = indicators.as_float_array(values)
+        positions = find_pivots(values, window, 'max' if kind == 'peak' else 'min')
+        return cls(positions, values[positions], kind)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def similar_pairs(self, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pares de pivotes con precios similares
+
+        Devuelve los pares (i, j), i < j en orden temporal, con
+        |precio_j - precio_i| / precio_i <= tolerance, ordenados por i y luego j.
+        Solo se examinan los pivotes dentro de la banda de precio de cada uno.
+        """
+        n = len(self)
+        if n < 2:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        # Banda [p(1 - tol), p(1 + tol)] algo ensanchada; el filtro exacto va después
+        margin = np.abs(self.prices) * tolerance * (1 + 1e-9)
+        lo = np.searchsorted(self._sorted_prices, self.prices - margin, side='left')
+        hi = np.searchsorted(self._sorted_prices, self.prices + margin, side='right')
+        counts = hi - lo
+
+        first = np.repeat(np.arange(n), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = self._by_price[np.repeat(lo, counts) + offsets]
+
+        keep = second > first
+        first, second = first[keep], second[keep]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            keep = np.abs(self.prices[first] - self.prices[second]) / self.prices[first] <= tolerance
+        first, second = first[keep], second[keep]
+
+        order = np.lexsort((second, first))
+        return first[order], second[order]
+
+    def between(self, start, end) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pivotes estrictamente entre dos posiciones de la serie
+
+        Args:
+            start: Posiciones iniciales (excluidas)
+            end: Posiciones finales (excluidas)
+
+        Returns:
+            Tupla (hay algún pivote, extremo de sus precios o NaN)
+        """
+        lo = np.searchsorted(self.positions, np.asarray(start), side='right')
+        hi = np.searchsorted(self.positions, np.asarray(end), side='left')
+        found = hi > lo
+        extreme = np.full(found.shape, np.nan)
+        extreme[found] = self._table.query(lo[found], hi[found])
+        return found, extreme
+
+
+class PivotSet:
+    """
+    Picos y valles de una serie a varias escalas
+
+    Guarda, por ventana, las posiciones (enteros crecientes) de los picos del
+    máximo y de los valles del mínimo. Es la entrada común de todos los
+    detectores de patrones.
+    """
+
+    def __init__(self, high, low, windows: Iterable[int]):
+        """
+        Args:
+            high: Serie de máximos
+            low: Serie de mínimos
+            windows: Ventanas centradas a extraer
+        """
+        self.high = indicators.as_float_array(high)
+        self.low = indicators.as_float_array(low)
+        self._peaks: Dict[int, np.ndarray] = {}
+        self._valleys: Dict[int, np.ndarray] = {}
+        self._indexes = {}
+        self._tables = None
+        self.add_windows(windows)
+
+    @property
+    def windows(self) -> Tuple[int, ...]:
+        return tuple(sorted(self._peaks))
+
+    def add_windows(self, windows: Iterable[int]):
+        """Extrae las escalas que falten (las tablas dispersas se reutilizan)"""
+        windows = [window for window in windows if window not in self._peaks]
+        if not windows:
+            return
+        if self._tables is None:
+            self._tables = (SparseTable(self.high, 'max'), SparseTable(self.low, 'min'))
+        high_table, low_table = self._tables
+
+        n = len(self.high)
+        for window in windows:
+            if window < 1 or n < window:
+                self._peaks[window] = self._valleys[window] = np.empty(0, dtype=np.int64)
+                continue
+            # La barra i es pivote si es el extremo de [i - window // 2, i - window // 2 + window)
+            centered = slice(window // 2, window // 2 + n - window + 1)
+            with np.errstate(invalid='ignore'):
+                self._peaks[window] = np.flatnonzero(self.high[centered] == high_table.rolling(window)) + window // 2
+                self._valleys[window] = np.flatnonzero(self.low[centered] == low_table.rolling(window)) + window // 2
+
+    def _positions(self, pivots: Dict[int, np.ndarray], window: int, start: int) -> np.ndarray:
+        self.add_windows((window,))
+        positions = pivots[window]
+        if start:
+            # Solo pivotes cuya ventana completa cae en la serie recortada
+            positions = positions[positions >= start + window // 2] - start
+        return positions
+
+    def peaks(self, window: int, start: int = 0) -> np.ndarray:
+        """
+        Posiciones de los picos
+
+        Args:
+            window: Ventana centrada
+            start: Recortar la serie desde esta posición (posiciones relativas a ella)
+        """
+        return self._positions(self._peaks, window, start)
+
+    def valleys(self, window: int, start: int = 0) -> np.ndarray:
+        """Posiciones de los valles (mismos argumentos que `peaks`)"""
+        return self._positions(self._valleys, window, start)
+
+    def index(self, window: int, kind: str = 'peak') -> PivotIndex:
+        """Índice de picos o valles de una escala (se construye una vez)"""
+        key = (window, kind)
+        if key not in self._indexes:
+            if kind == 'peak':
+                positions = self.peaks(window)
+                self._indexes[key] = PivotIndex(positions, self.high[positions], kind)
+            else:
+                positions = self.valleys(window)
+                self._indexes[key] = PivotIndex(positions, self.low[positions], kind)
+        return self._indexes[key]
+
+
+def extract_pivots(high, low, windows: Iterable[int]) -> PivotSet:
+    """
+    Picos y valles de una serie OHLC a varias escalas
+
+    Args:
+        high: Serie de máximos
+        low: Serie de mínimos
+        windows: Ventanas centradas (por ejemplo (5, 15, 20))
+
+    Returns:
+        PivotSet con las posiciones de cada escala
+    """
+    return PivotSet(high, low, windows)
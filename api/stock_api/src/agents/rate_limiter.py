@@ -0,0 +1,202 @@
+"""
+Limitador de Peticiones Adaptativo
+Token bucket compartido por todos los agentes que descargan datos, con retroceso ante throttling
+"""
+
+import os
+import threading
+import time
+import pandas as pd
+from typing import Any, Callable, Dict, Optional
+
+# Configuración por defecto (ajustable por variables de entorno)
+DEFAULT_RATE = float(os.environ.get('STOCKAI_RATE_LIMIT_RPS', 5.0))
+DEFAULT_BURST = int(os.environ.get('STOCKAI_RATE_LIMIT_BURST', 10))
+
+# Textos que identifican errores de throttling de las APIs
+THROTTLE_MARKERS = ('429', 'too many requests', 'rate limit', 'ratelimit', 'throttl')
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """Determina si una excepción corresponde a un límite de peticiones de la API"""
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status == 429:
+        return True
+
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+def is_empty_response(response: Any) -> bool:
+    """Determina si una respuesta está vacía (señal habitual de throttling silencioso)"""
+    if response is None:
+        return True
+    if isinstance(response, (pd.DataFrame, pd.Series)):
+        return response.empty
+    if isinstance(response, (dict, list, tuple, str)):
+        return len(response) == 0
+    return False
+
+
+class RateLimiter:
+    """
+    Token bucket con tasa adaptativa
+
+    Se permiten ráfagas de hasta `burst` peticiones y una tasa sostenida de
+    `rate` peticiones por segundo. Cada error de throttling o respuesta vacía
+    reduce la tasa efectiva (multiplicando por `backoff_factor`, sin bajar de
+    `min_rate`) y vacía el bucket; cada respuesta correcta la recupera
+    gradualmente hasta la tasa configurada.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                 min_rate: float = 0.2, backoff_factor: float = 0.5,
+                 recovery_step: float = 0.05, name: str = 'default'):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min(min_rate, rate)
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+        # Estadísticas
+        self.total_wait = 0.0
+        self.acquisitions = 0
+        self.throttle_events = 0
+        self.empty_responses = 0
+
+    def _refill(self, now: float):
+        """Repone tokens según el tiempo transcurrido"""
+        elapsed = now - self._last_refill
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Reserva tokens, esperando si el bucket no tiene suficientes
+
+        Args:
+            tokens: Número de peticiones a reservar
+
+        Returns:
+            Segundos esperados
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.acquisitions += 1
+            self.total_wait += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def report_success(self):
+        """Registra una respuesta correcta y recupera la tasa gradualmente"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery_step)
+
+    def report_throttle(self, empty: bool = False):
+        """
+        Registra throttling (error explícito o respuesta vacía) y reduce la tasa
+
+        Args:
+            empty: True si la señal fue una respuesta vacía
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if empty:
+                self.empty_responses += 1
+            else:
+                self.throttle_events += 1
+            self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+            self._tokens = min(self._tokens, 0.0)
+
+    def call(self, func: Callable, *args, retries: int = 2, **kwargs) -> Any:
+        """
+        Ejecuta una petición respetando el límite y adaptando la tasa al resultado
+
+        Los errores de throttling se reintentan hasta `retries` veces tras
+        reducir la tasa; las respuestas vacías solo reducen la tasa.
+
+        Args:
+            func: Función que realiza la petición
+            retries: Reintentos ante errores de throttling
+
+        Returns:
+            Resultado de la función
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if is_throttling_error(e):
+                    self.report_throttle()
+                    if attempt < retries:
+                        attempt += 1
+                        continue
+                raise
+
+            if is_empty_response(result):
+                self.report_throttle(empty=True)
+            else:
+                self.report_success()
+            return result
+
+    def stats(self) -> Dict:
+        """Estadísticas de uso del limitador"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'rate': self.rate,
+                'max_rate': self.max_rate,
+                'burst': self.burst,
+                'acquisitions': self.acquisitions,
+                'total_wait_seconds': round(self.total_wait, 3),
+                'throttle_events': self.throttle_events,
+                'empty_responses': self.empty_responses
+            }
+
+
+# Registro de limitadores compartidos por nombre de proveedor
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str = 'market_data', rate: Optional[float] = None,
+                     burst: Optional[int] = None) -> RateLimiter:
+    """
+    Obtiene (o crea) el limitador compartido para un proveedor de datos
+
+    Args:
+        name: Nombre del proveedor (market_data, news...)
+        rate: Peticiones por segundo (solo al crearlo)
+        burst: Tamaño de ráfaga (solo al crearlo)
+
+    Returns:
+        Instancia compartida de RateLimiter
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter(
+                rate=rate if rate is not None else DEFAULT_RATE,
+                burst=burst if burst is not None else DEFAULT_BURST,
+                name=name
+            )
+        return _limiters[name]
+
+
+def rate_limiter_stats() -> Dict[str, Dict]:
+    """Estadísticas de todos los limitadores compartidos"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
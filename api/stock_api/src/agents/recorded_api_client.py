@@ -0,0 +1,64 @@
+"""
+Cliente de API con Respuestas Grabadas
+Sustituto local de ApiClient que reproduce (o graba) respuestas JSON desde disco
+"""
+
+import os
+import re
+import json
+from typing import Dict, Optional
+
+
+class RecordedApiClient:
+    """
+    Reproduce respuestas de la API guardadas en ficheros JSON
+
+    Cada respuesta se guarda en `<responses_dir>/<api_name>/<clave>.json`, donde
+    la clave se construye a partir de los parámetros de la consulta. Si se pasa
+    un cliente real, las llamadas sin grabación se delegan en él y se guardan.
+    """
+
+    def __init__(self, responses_dir: str, live_client=None):
+        self.responses_dir = responses_dir
+        self.live_client = live_client
+        self.calls = []
+
+    def _path(self, api_name: str, query: Dict) -> str:
+        """Ruta del fichero de respuesta para una llamada"""
+        key = '_'.join(f"{name}-{query[name]}" for name in sorted(query))
+        key = re.sub(r'[^A-Za-z0-9._=-]', '_', key) or 'default'
+        return os.path.join(self.responses_dir, api_name, f"{key}.json")
+
+    def call_api(self, api_name: str, query: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Devuelve la respuesta grabada para una llamada
+
+        Args:
+            api_name: Nombre del endpoint (ej: YahooFinance/get_stock_chart)
+            query: Parámetros de la consulta
+
+        Returns:
+            Respuesta JSON o None si no hay grabación ni cliente real
+        """
+        query = query or {}
+        self.calls.append((api_name, dict(query)))
+        path = self._path(api_name, query)
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+
+        if self.live_client is None:
+            return None
+
+        response = self.live_client.call_api(api_name, query=query)
+        if response:
+            self.record(api_name, query, response)
+        return response
+
+    def record(self, api_name: str, query: Dict, response: Dict):
+        """Guarda una respuesta para reproducirla más tarde"""
+        path = self._path(api_name, query)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(response, f)
@@ -0,0 +1,588 @@
+"""
+Indicadores Técnicos Incrementales
+Versiones en streaming de los indicadores de `indicators`: cada objeto mantiene
+sus acumuladores (Wilder/EMA, sumas de ventana, extremos móviles), recibe una
+barra nueva y devuelve el valor actualizado en tiempo constante
+
+El estado de cada indicador se puede serializar con `state()` y restaurar con
+`from_state()`, de modo que se conserva entre ejecuciones sin reprocesar el
+histórico. Los valores coinciden con los del cálculo vectorizado sobre la
+serie completa.
+"""
+
+import copy
+import json
+import math
+import os
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+NAN = float('nan')
+
+
+def _isnan(value) -> bool:
+    return value is None or value != value
+
+
+def _float(value) -> float:
+    return NAN if value is None else float(value)
+
+
+def _json_value(value) -> Optional[float]:
+    """NaN -> None para que el resultado sea JSON válido"""
+    return None if _isnan(value) else value
+
+
+class StreamingIndicator:
+    """
+    Clase base: serialización del estado
+
+    Cada subclase declara en `_fields` los atributos que forman su estado y en
+    `_params` los argumentos de su constructor; los sub-indicadores se
+    serializan de forma recursiva.
+    """
+
+    _params = ()
+    _fields = ()
+    _children = ()
+
+    def state(self) -> Dict:
+        """Estado serializable (tipos nativos de Python)"""
+        state = {'type': type(self).__name__}
+        state['params'] = {name: getattr(self, name) for name in self._params}
+        for name in self._fields:
+            value = getattr(self, name)
+            state[name] = list(value) if isinstance(value, deque) else value
+        for name in self._children:
+            state[name] = getattr(self, name).state()
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'StreamingIndicator':
+        """Reconstruye un indicador a partir de `state()`"""
+        indicator = cls(**state['params'])
+        for name in indicator._fields:
+            if name not in state:
+                continue  # Estado guardado por una versión anterior
+            current = getattr(indicator, name)
+            value = state[name]
+            if isinstance(current, deque):
+                current.extend(tuple(item) if isinstance(item, list) else item for item in value)
+            else:
+                setattr(indicator, name, value)
+        for name in indicator._children:
+            child = getattr(indicator, name)
+            setattr(indicator, name, type(child).from_state(state[name]))
+        return indicator
+
+
+# ============= VENTANAS MÓVILES =============
+
+class RollingWindow(StreamingIndicator):
+    """
+    Suma, media y desviación típica de las últimas `window` barras
+
+    Las sumas se actualizan al entrar y salir cada valor y se recalculan de
+    forma exacta cada `window` barras para acotar el error de redondeo (coste
+    amortizado O(1)). Como en pandas, el resultado es NaN mientras la ventana
+    no está completa o contiene algún NaN.
+    """
+
+    _params = ('window',)
+    _fields = ('values', 'count', 'last_nan', 'shift', 'total', 'total_sq', 'since_refresh')
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.count = 0           # Barras recibidas
+        self.last_nan = -1       # Posición de la última barra NaN
+        self.shift = None        # Desplazamiento para estabilizar la varianza
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.since_refresh = 0
+
+    def _refresh(self):
+        valid = [value - self.shift for value in self.values if not _isnan(value)]
+        self.total = math.fsum(valid)
+        self.total_sq = math.fsum(value * value for value in valid)
+        self.since_refresh = 0
+
+    def update(self, value) -> 'RollingWindow':
+        value = _float(value)
+        if len(self.values) == self.window:
+            dropped = self.values[0]
+            if not _isnan(dropped):
+                dropped -= self.shift
+                self.total -= dropped
+                self.total_sq -= dropped * dropped
+
+        self.values.append(value)
+        if _isnan(value):
+            self.last_nan = self.count
+        else:
+            if self.shift is None:
+                self.shift = value
+            shifted = value - self.shift
+            self.total += shifted
+            self.total_sq += shifted * shifted
+        self.count += 1
+
+        self.since_refresh += 1
+        if self.since_refresh >= self.window and self.shift is not None:
+            self._refresh()
+        return self
+
+    @property
+    def ready(self) -> bool:
+        """Ventana completa y sin NaN"""
+        return self.count >= self.window and self.last_nan <= self.count - 1 - self.window
+
+    @property
+    def sum(self) -> float:
+        return self.total + self.shift * self.window if self.ready else NAN
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.window + self.shift if self.ready else NAN
+
+    def std(self, ddof: int = 1) -> float:
+        if not self.ready or self.window <= ddof:
+            return NAN
+        variance = (self.total_sq - self.total * self.total / self.window) / (self.window - ddof)
+        return math.sqrt(max(variance, 0.0))
+
+
+class RollingExtreme(StreamingIndicator):
+    """
+    Máximo o mínimo de las últimas `window` barras con una cola monótona
+    (coste amortizado O(1) por barra)
+    """
+
+    _params = ('window', 'mode')
+    _fields = ('candidates', 'count', 'last_nan')
+
+    def __init__(self, window: int, mode: str = 'max'):
+        self.window = window
+        self.mode = mode
+        self.candidates = deque()  # (posición, valor) monótona
+        self.count = 0
+        self.last_nan = -1
+
+    def update(self, value) -> float:
+        value = _float(value)
+        position = self.count
+        self.count += 1
+
+        if _isnan(value):
+            self.last_nan = position
+        else:
+            if self.mode == 'max':
+                while self.candidates and self.candidates[-1][1] <= value:
+                    self.candidates.pop()
+            else:
+                while self.candidates and self.candidates[-1][1] >= value:
+                    self.candidates.pop()
+            self.candidates.append((position, value))
+
+        while self.candidates and self.candidates[0][0] <= position - self.window:
+            self.candidates.popleft()
+        return self.value
+
+    @property
+    def value(self) -> float:
+        position = self.count - 1
+        if self.count < self.window or self.last_nan > position - self.window or not self.candidates:
+            return NAN
+        return self.candidates[0][1]
+
+
+class StreamingSMA(StreamingIndicator):
+    """Media móvil simple"""
+
+    _params = ('period',)
+    _children = ('window',)
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = RollingWindow(period)
+
+    def update(self, value) -> float:
+        return self.window.update(value).mean
+
+
+# ============= MEDIAS EXPONENCIALES =============
+
+class StreamingEMA(StreamingIndicator):
+    """
+    Media móvil exponencial
+
+    Con `adjust=True` mantiene el numerador y el denominador de los pesos
+    normalizados (equivalente a pandas `ewm(...).mean()`); con `adjust=False`
+    es la recursiva clásica sembrada con el primer valor.
+    """
+
+    _params = ('span', 'alpha', 'adjust')
+    _fields = ('numerator', 'denominator', 'value', 'last_input')
+
+    def __init__(self, span: float = None, alpha: float = None, adjust: bool = True):
+        self.span = span
+        self.alpha = alpha if alpha is not None else 2.0 / (span + 1.0)
+        self.adjust = adjust
+        self.numerator = 0.0
+        self.denominator = 0.0
+        self.value = NAN
+        self.last_input = NAN
+
+    def update(self, value) -> float:
+        value = _float(value)
+        decay = 1.0 - self.alpha
+
+        if self.adjust:
+            valid = not _isnan(value)
+            self.numerator = decay * self.numerator + (value if valid else 0.0)
+            self.denominator = decay * self.denominator + (1.0 if valid else 0.0)
+            self.value = self.numerator / self.denominator if self.denominator else NAN
+            return self.value
+
+        # Recursiva: los NaN se sustituyen por el último valor válido
+        if not _isnan(value):
+            self.last_input = value
+        if _isnan(self.last_input):
+            return NAN
+        if _isnan(self.value):
+            self.value = self.last_input
+        else:
+            self.value = decay * self.value + self.alpha * self.last_input
+        return self.value
+
+
+# ============= INDICADORES =============
+
+def _rsi_value(avg_gain: float, avg_loss: float) -> float:
+    if _isnan(avg_gain) or _isnan(avg_loss):
+        return NAN
+    if avg_loss == 0:
+        return 100.0 if avg_gain > 0 else NAN
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+class StreamingRSI(StreamingIndicator):
+    """
+    Relative Strength Index
+
+    `method='sma'` usa medias simples de ganancias y pérdidas (como el análisis
+    técnico) y `method='wilder'` el suavizado de Wilder.
+    """
+
+    _params = ('period', 'method')
+    _fields = ('previous', 'deltas', 'avg_gain', 'avg_loss')
+    _children = ('gains', 'losses')
+
+    def __init__(self, period: int = 14, method: str = 'sma'):
+        self.period = period
+        self.method = method
+        self.previous = NAN
+        self.deltas = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.gains = RollingWindow(period)
+        self.losses = RollingWindow(period)
+
+    def update(self, close) -> float:
+        close = _float(close)
+        has_delta = not _isnan(self.previous)
+        delta = close - self.previous if has_delta else NAN
+        self.previous = close
+
+        # Como en el cálculo vectorizado, un cambio desconocido cuenta como 0
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+
+        if self.method != 'wilder':
+            return _rsi_value(self.gains.update(gain).mean, self.losses.update(loss).mean)
+
+        if not has_delta:
+            return NAN
+        self.deltas += 1
+        if self.deltas <= self.period:
+            # Semilla: media simple de los primeros `period` cambios
+            self.avg_gain += gain / self.period
+            self.avg_loss += loss / self.period
+            if self.deltas < self.period:
+                return NAN
+        else:
+            decay = (self.period - 1.0) / self.period
+            self.avg_gain = decay * self.avg_gain + gain / self.period
+            self.avg_loss = decay * self.avg_loss + loss / self.period
+        return _rsi_value(self.avg_gain, self.avg_loss)
+
+
+class StreamingMACD(StreamingIndicator):
+    """MACD: línea, señal e histograma"""
+
+    _params = ('fast', 'slow', 'signal', 'adjust')
+    _children = ('fast_ema', 'slow_ema', 'signal_ema')
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9, adjust: bool = True):
+        self.fast = fast
+        self.slow = slow
+        self.signal = signal
+        self.adjust = adjust
+        self.fast_ema = StreamingEMA(span=fast, adjust=adjust)
+        self.slow_ema = StreamingEMA(span=slow, adjust=adjust)
+        self.signal_ema = StreamingEMA(span=signal, adjust=adjust)
+
+    def update(self, close) -> Dict[str, float]:
+        macd_line = self.fast_ema.update(close) - self.slow_ema.update(close)
+        signal_line = self.signal_ema.update(macd_line)
+        return {
+            'macd': macd_line,
+            'signal': signal_line,
+            'histogram': macd_line - signal_line
+        }
+
+
+class StreamingBollinger(StreamingIndicator):
+    """Bandas de Bollinger"""
+
+    _params = ('period', 'std_dev', 'ddof')
+    _children = ('window',)
+
+    def __init__(self, period: int = 20, std_dev: float = 2, ddof: int = 1):
+        self.period = period
+        self.std_dev = std_dev
+        self.ddof = ddof
+        self.window = RollingWindow(period)
+
+    def update(self, close) -> Dict[str, float]:
+        self.window.update(close)
+        middle = self.window.mean
+        std = self.window.std(self.ddof)
+        upper = middle + std * self.std_dev
+        lower = middle - std * self.std_dev
+        width = (upper - lower) / middle * 100 if middle else NAN
+        return {
+            'upper': upper,
+            'middle': middle,
+            'lower': lower,
+            'width': width
+        }
+
+
+class StreamingStochastic(StreamingIndicator):
+    """Oscilador estocástico (%K y %D)"""
+
+    _params = ('k_period', 'd_period')
+    _children = ('highest', 'lowest', 'd_sma')
+
+    def __init__(self, k_period: int = 14, d_period: int = 3):
+        self.k_period = k_period
+        self.d_period = d_period
+        self.highest = RollingExtreme(k_period, 'max')
+        self.lowest = RollingExtreme(k_period, 'min')
+        self.d_sma = StreamingSMA(d_period)
+
+    def update(self, high, low, close) -> Dict[str, float]:
+        highest_high = self.highest.update(high)
+        lowest_low = self.lowest.update(low)
+        price_range = highest_high - lowest_low
+        k_percent = 100 * (_float(close) - lowest_low) / price_range if price_range else NAN
+        return {
+            'k_percent': k_percent,
+            'd_percent': self.d_sma.update(k_percent)
+        }
+
+
+class StreamingATR(StreamingIndicator):
+    """Average True Range (media simple del rango verdadero)"""
+
+    _params = ('period',)
+    _fields = ('previous_close',)
+    _children = ('sma',)
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.previous_close = NAN
+        self.sma = StreamingSMA(period)
+
+    def update(self, high, low, close) -> float:
+        high, low = _float(high), _float(low)
+        true_range = high - low
+        if not _isnan(self.previous_close):
+            true_range = max(true_range, abs(high - self.previous_close), abs(low - self.previous_close))
+        self.previous_close = _float(close)
+        return self.sma.update(true_range)
+
+
+# ============= CONJUNTO POR SÍMBOLO =============
+
+class IndicatorState(StreamingIndicator):
+    """
+    Todos los indicadores del análisis técnico de un símbolo
+
+    Los parámetros por defecto reproducen `TechnicalAnalyzer`; el endpoint de
+    gráficos usa RSI de Wilder, EMA recursiva y desviación poblacional
+    (`rsi_method='wilder'`, `adjust=False`, `ddof=0`).
+
+    `update()` añade una barra cerrada. Los precios intradía van a
+    `update_provisional()`, que acumula la barra en curso de la sesión y
+    evalúa los indicadores sin alterar los acumuladores; la barra se añade
+    al empezar la sesión siguiente o con `close_bar()`.
+    """
+
+    _params = ('sma_periods', 'rsi_method', 'adjust', 'ddof')
+    _fields = ('bars', 'last_close', 'session', 'provisional')
+    _children = ('rsi', 'macd', 'bollinger', 'stochastic', 'atr')
+
+    def __init__(self, sma_periods: Iterable[int] = (5, 10, 20, 50, 200), rsi_method: str = 'sma',
+                 adjust: bool = True, ddof: int = 1):
+        self.sma_periods = list(sma_periods)
+        self.rsi_method = rsi_method
+        self.adjust = adjust
+        self.ddof = ddof
+        self.bars = 0
+        self.last_close = NAN
+        self.session = None      # Sesión de la barra en curso
+        self.provisional = None  # [cierre, máximo, mínimo] de la barra en curso
+        self.rsi = StreamingRSI(14, method=rsi_method)
+        self.macd = StreamingMACD(adjust=adjust)
+        self.bollinger = StreamingBollinger(20, 2, ddof=ddof)
+        self.stochastic = StreamingStochastic(14, 3)
+        self.atr = StreamingATR(14)
+        self.smas = {period: StreamingSMA(period) for period in self.sma_periods}
+
+    def update(self, close, high=None, low=None) -> Dict:
+        """
+        Añade una barra y devuelve los últimos valores
+
+        Args:
+            close: Precio de cierre
+            high: Máximo de la barra (default: cierre)
+            low: Mínimo de la barra (default: cierre)
+
+        Returns:
+            Diccionario con los indicadores (None mientras no hay datos suficientes)
+        """
+        high = close if high is None else high
+        low = close if low is None else low
+        self.bars += 1
+        self.last_close = _float(close)
+
+        macd = self.macd.update(close)
+        bollinger = self.bollinger.update(close)
+        stochastic = self.stochastic.update(high, low, close)
+        values = {
+            'rsi': self.rsi.update(close),
+            'macd': macd['macd'],
+            'macd_signal': macd['signal'],
+            'macd_histogram': macd['histogram'],
+            'bb_upper': bollinger['upper'],
+            'bb_middle': bollinger['middle'],
+            'bb_lower': bollinger['lower'],
+            'bb_width': bollinger['width'],
+            'stoch_k': stochastic['k_percent'],
+            'stoch_d': stochastic['d_percent'],
+            'atr': self.atr.update(high, low, close)
+        }
+        for period, sma in self.smas.items():
+            values[f'sma_{period}'] = sma.update(close)
+        return {name: _json_value(value) for name, value in values.items()}
+
+    def update_provisional(self, close, high=None, low=None, session=None) -> Dict:
+        """
+        Incorpora un precio intradía a la barra en curso y devuelve sus indicadores
+
+        Si `session` es distinta de la de la barra en curso, esta se cierra
+        antes (se añade con `update()`) y empieza una barra nueva.
+
+        Args:
+            close: Último precio
+            high: Máximo desde el último precio (default: precio)
+            low: Mínimo desde el último precio (default: precio)
+            session: Identificador de la sesión (por ejemplo la fecha)
+
+        Returns:
+            Indicadores con la barra en curso como última barra
+        """
+        if self.provisional is not None and session != self.session:
+            self.close_bar()
+
+        close = _float(close)
+        high = close if high is None else _float(high)
+        low = close if low is None else _float(low)
+        if self.provisional is None:
+            self.provisional = [close, high, low]
+        else:
+            self.provisional = [close, max(self.provisional[1], high), min(self.provisional[2], low)]
+        self.session = session
+
+        # Evaluar sobre una copia: los acumuladores solo avanzan al cerrar la barra
+        preview = copy.deepcopy(self)
+        preview.provisional = None
+        return preview.update(*self.provisional)
+
+    def close_bar(self) -> Optional[Dict]:
+        """Añade la barra en curso como barra cerrada (None si no hay ninguna)"""
+        if self.provisional is None:
+            return None
+        bar, self.provisional = self.provisional, None
+        return self.update(*bar)
+
+    @classmethod
+    def from_history(cls, close: Iterable, high: Iterable = None, low: Iterable = None,
+                     **params) -> 'IndicatorState':
+        """Crea el estado recorriendo una vez el histórico"""
+        state = cls(**params)
+        close = list(close)
+        high = list(high) if high is not None else close
+        low = list(low) if low is not None else close
+        for bar_close, bar_high, bar_low in zip(close, high, low):
+            state.update(bar_close, bar_high, bar_low)
+        return state
+
+    def state(self) -> Dict:
+        state = super().state()
+        state['smas'] = {str(period): sma.state() for period, sma in self.smas.items()}
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'IndicatorState':
+        indicator = super().from_state(state)
+        indicator.smas = {
+            int(period): StreamingSMA.from_state(sma_state)
+            for period, sma_state in state['smas'].items()
+        }
+        return indicator
+
+
+class IndicatorStateStore:
+    """
+    Estados de indicadores por símbolo persistidos en un fichero JSON
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, IndicatorState]:
+        """Lee los estados guardados (vacío si no hay fichero o no es válido)"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            return {symbol: IndicatorState.from_state(state) for symbol, state in data.items()}
+        except Exception as e:
+            print(f"Error leyendo estado de indicadores {self.path}: {str(e)}")
+            return {}
+
+    def save(self, states: Dict[str, IndicatorState]):
+        """Escribe los estados de forma atómica (fichero temporal + rename)"""
+        data = {symbol: state.state() for symbol, state in list(states.items())}
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
@@ -7,23 +7,63 @@ import pandas as pd
 import numpy as np
 import sys
 sys.path.append('/opt/.manus/.sandbox-runtime')
-from data_api import ApiClient
+try:
+    from data_api import ApiClient
+except ImportError:
+    ApiClient = None  # Solo disponible en el sandbox; se puede inyectar otro cliente
+from datetime import timedelta
 from typing import Dict, List, Tuple, Optional
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from .bar_store import BarStore, period_start, delta_range, keyed_by_date, session_dates
+    from .bar_resampler import BarResampler, RESAMPLE_INTERVALS
+    from .rate_limiter import RateLimiter, get_rate_limiter
+    from . import indicators
+    from . import candlestick_scanner
+    from .indicator_graph import IndicatorGraph, INDICATOR_COLUMNS, PATTERNS, SIGNALS
+    from .indicator_cache import IndicatorCache, get_indicator_cache
+except ImportError:
+    from bar_store import BarStore, period_start, delta_range, keyed_by_date, session_dates
+    from bar_resampler import BarResampler, RESAMPLE_INTERVALS
+    from rate_limiter import RateLimiter, get_rate_limiter
+    import indicators
+    import candlestick_scanner
+    from indicator_graph import IndicatorGraph, INDICATOR_COLUMNS, PATTERNS, SIGNALS
+    from indicator_cache import IndicatorCache, get_indicator_cache
+
+# Valores que necesitan el análisis de tendencia y la recomendación
+TREND_OUTPUTS = ('close', 'sma_5', 'sma_20', 'sma_50', 'sma_200')
+QUICK_OUTPUTS = ('rsi', 'macd', 'macd_signal') + TREND_OUTPUTS
+
 class TechnicalAnalyzer:
     """
     Clase principal para análisis técnico de acciones
     """
     
-    def __init__(self):
-        self.client = ApiClient()
+    def __init__(self, bar_store: Optional[BarStore] = None, client=None, incremental: bool = True,
+                 rate_limiter: Optional[RateLimiter] = None, indicator_cache: Optional[IndicatorCache] = None):
+        if client is None:
+            if ApiClient is None:
+                raise ImportError("data_api no disponible: se requiere un cliente de API")
+            client = ApiClient()
+        self.client = client
+        self.bar_store = bar_store if bar_store is not None else BarStore()
+        self.resampler = BarResampler(self.bar_store)  # 1wk/1mo desde las barras diarias
+        self.incremental = incremental  # Descargar solo las barras nuevas
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_rate_limiter('market_data')
+        self.indicator_cache = indicator_cache if indicator_cache is not None else get_indicator_cache()
         
     def get_stock_data(self, symbol: str, interval: str = "1d", range_period: str = "1y") -> pd.DataFrame:
         """
         Obtiene datos históricos de una acción
         
+        Lee primero del almacén local de barras. Si el almacén cubre el período
+        pero está desactualizado, en modo incremental solo se descargan las
+        barras posteriores a la última almacenada. Las barras semanales y
+        mensuales se agregan a partir de las diarias almacenadas cuando las hay.
+        
         Args:
             symbol: Símbolo de la acción (ej: AAPL)
             interval: Intervalo de tiempo (1m, 5m, 15m, 30m, 1h, 1d, 1wk, 1mo)
@@ -33,42 +73,34 @@ class TechnicalAnalyzer:
             DataFrame con datos OHLCV
         """
         try:
-            response = self.client.call_api('YahooFinance/get_stock_chart', query={
-                'symbol': symbol,
-                'interval': interval,
-                'range': range_period,
-                'includeAdjustedClose': True
-            })
+            start = period_start(range_period)
             
-            if not response or 'chart' not in response:
-                raise ValueError(f"No se pudieron obtener datos para {symbol}")
-                
-            result = response['chart']['result'][0]
-            timestamps = result['timestamp']
-            indicators = result['indicators']
+            # Semanal/mensual: agregar las barras diarias del almacén
+            if interval in RESAMPLE_INTERVALS and self.bar_store.covers(symbol, '1d', start, max_age=timedelta.max):
+                if self.incremental and not self.bar_store.covers(symbol, '1d', start):
+                    self._update_tail(symbol, '1d')
+                df = self.resampler.read(symbol, interval, start=start)
+                if not df.empty:
+                    return df
             
-            # Extraer datos OHLCV
-            quote = indicators['quote'][0]
-            adjclose = indicators.get('adjclose', [{}])[0].get('adjclose', quote['close'])
+            # Servir desde disco si el almacén cubre el período
+            if self.bar_store.covers(symbol, interval, start):
+                df = self.bar_store.read(symbol, interval, start=start)
+                if not df.empty:
+                    return df
             
-            # Crear DataFrame
-            df = pd.DataFrame({
-                'timestamp': timestamps,
-                'open': quote['open'],
-                'high': quote['high'],
-                'low': quote['low'],
-                'close': quote['close'],
-                'volume': quote['volume'],
-                'adj_close': adjclose
-            })
+            # Modo incremental: descargar solo la cola que falta
+            if self.incremental and self.bar_store.covers(symbol, interval, start, max_age=timedelta.max):
+                self._update_tail(symbol, interval)
+                df = self.bar_store.read(symbol, interval, start=start)
+                if not df.empty:
+                    return df
             
-            # Convertir timestamp a datetime
-            df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
-            df.set_index('datetime', inplace=True)
-            df.drop('timestamp', axis=1, inplace=True)
+            df = self._fetch_chart(symbol, interval, range_period)
+            if df.empty:
+                raise ValueError(f"No se pudieron obtener datos para {symbol}")
             
-            # Limpiar datos nulos
-            df = df.dropna()
+            self.bar_store.append(symbol, interval, df, covered_from=start)
             
             return df
             
@@ -76,6 +108,89 @@ class TechnicalAnalyzer:
             print(f"Error obteniendo datos para {symbol}: {str(e)}")
             return pd.DataFrame()
     
+    def _update_tail(self, symbol: str, interval: str) -> int:
+        """
+        Descarga las barras posteriores a la última almacenada y las fusiona
+        
+        La última barra almacenada se vuelve a pedir para sustituirla si fue
+        provisional o se corrigió después del cierre.
+        
+        Args:
+            symbol: Símbolo de la acción
+            interval: Intervalo de tiempo
+            
+        Returns:
+            Número de barras descargadas
+        """
+        meta = self.bar_store.metadata(symbol, interval)
+        last_timestamp = meta['last_timestamp']
+        
+        try:
+            tail = self._fetch_chart(symbol, interval, delta_range(last_timestamp, interval))
+        except Exception as e:
+            # Servir los datos almacenados aunque estén desactualizados
+            print(f"Error actualizando barras de {symbol}: {str(e)}")
+            return 0
+        
+        tail = tail[tail.index >= last_timestamp]
+        self.bar_store.append(symbol, interval, tail)
+        
+        return len(tail)
+    
+    def _fetch_chart(self, symbol: str, interval: str, range_period: str) -> pd.DataFrame:
+        """
+        Descarga barras OHLCV de la API de Yahoo Finance
+        
+        Args:
+            symbol: Símbolo de la acción
+            interval: Intervalo de tiempo
+            range_period: Período de datos
+            
+        Returns:
+            DataFrame con datos OHLCV
+        """
+        response = self.rate_limiter.call(self.client.call_api, 'YahooFinance/get_stock_chart', query={
+            'symbol': symbol,
+            'interval': interval,
+            'range': range_period,
+            'includeAdjustedClose': True
+        })
+        
+        if not response or 'chart' not in response:
+            raise ValueError(f"No se pudieron obtener datos para {symbol}")
+            
+        result = response['chart']['result'][0]
+        timestamps = result['timestamp']
+        indicators = result['indicators']
+        
+        # Extraer datos OHLCV
+        quote = indicators['quote'][0]
+        adjclose = indicators.get('adjclose', [{}])[0].get('adjclose', quote['close'])
+        
+        # Crear DataFrame
+        df = pd.DataFrame({
+            'timestamp': timestamps,
+            'open': quote['open'],
+            'high': quote['high'],
+            'low': quote['low'],
+            'close': quote['close'],
+            'volume': quote['volume'],
+            'adj_close': adjclose
+        })
+        
+        # Convertir timestamp a datetime (fecha de la sesión en barras diarias o mayores)
+        df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
+        df.set_index('datetime', inplace=True)
+        df.drop('timestamp', axis=1, inplace=True)
+        if keyed_by_date(interval):
+            df.index = session_dates(df.index, result.get('meta', {}).get('gmtoffset', 0))
+            df = df[~df.index.duplicated(keep='last')]
+        
+        # Limpiar datos nulos
+        df = df.dropna()
+        
+        return df
+    
     def calculate_rsi(self, prices: pd.Series, period: int = 14) -> pd.Series:
         """
         Calcula el Relative Strength Index (RSI)
@@ -87,14 +202,7 @@ class TechnicalAnalyzer:
         Returns:
             Serie con valores RSI
         """
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
+        return pd.Series(indicators.rsi(prices, period), index=prices.index)
     
     def calculate_macd(self, prices: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, pd.Series]:
         """
@@ -109,18 +217,8 @@ class TechnicalAnalyzer:
         Returns:
             Diccionario con MACD, señal e histograma
         """
-        ema_fast = prices.ewm(span=fast).mean()
-        ema_slow = prices.ewm(span=slow).mean()
-        
-        macd_line = ema_fast - ema_slow
-        signal_line = macd_line.ewm(span=signal).mean()
-        histogram = macd_line - signal_line
-        
-        return {
-            'macd': macd_line,
-            'signal': signal_line,
-            'histogram': histogram
-        }
+        result = indicators.macd(prices, fast, slow, signal)
+        return {key: pd.Series(values, index=prices.index) for key, values in result.items()}
     
     def calculate_bollinger_bands(self, prices: pd.Series, period: int = 20, std_dev: float = 2) -> Dict[str, pd.Series]:
         """
@@ -134,17 +232,8 @@ class TechnicalAnalyzer:
         Returns:
             Diccionario con banda superior, media y banda inferior
         """
-        sma = prices.rolling(window=period).mean()
-        std = prices.rolling(window=period).std()
-        
-        upper_band = sma + (std * std_dev)
-        lower_band = sma - (std * std_dev)
-        
-        return {
-            'upper': upper_band,
-            'middle': sma,
-            'lower': lower_band
-        }
+        bands = indicators.bollinger_bands(prices, period, std_dev)
+        return {key: pd.Series(bands[key], index=prices.index) for key in ('upper', 'middle', 'lower')}
     
     def calculate_moving_averages(self, prices: pd.Series, periods: List[int] = [5, 10, 20, 50, 200]) -> Dict[str, pd.Series]:
         """
@@ -157,11 +246,8 @@ class TechnicalAnalyzer:
         Returns:
             Diccionario con las medias móviles
         """
-        mas = {}
-        for period in periods:
-            mas[f'sma_{period}'] = prices.rolling(window=period).mean()
-        
-        return mas
+        mas = indicators.moving_averages(prices, periods)
+        return {key: pd.Series(values, index=prices.index) for key, values in mas.items()}
     
     def calculate_stochastic(self, high: pd.Series, low: pd.Series, close: pd.Series, 
                            k_period: int = 14, d_period: int = 3) -> Dict[str, pd.Series]:
@@ -178,16 +264,8 @@ class TechnicalAnalyzer:
         Returns:
             Diccionario con %K y %D
         """
-        lowest_low = low.rolling(window=k_period).min()
-        highest_high = high.rolling(window=k_period).max()
-        
-        k_percent = 100 * ((close - lowest_low) / (highest_high - lowest_low))
-        d_percent = k_percent.rolling(window=d_period).mean()
-        
-        return {
-            'k_percent': k_percent,
-            'd_percent': d_percent
-        }
+        result = indicators.stochastic(high, low, close, k_period, d_period)
+        return {key: pd.Series(values, index=close.index) for key, values in result.items()}
     
     def calculate_atr(self, high: pd.Series, low: pd.Series, close: pd.Series, period: int = 14) -> pd.Series:
         """
@@ -202,20 +280,11 @@ class TechnicalAnalyzer:
         Returns:
             Serie con valores ATR
         """
-        prev_close = close.shift(1)
-        
-        tr1 = high - low
-        tr2 = abs(high - prev_close)
-        tr3 = abs(low - prev_close)
-        
-        true_range = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        atr = true_range.rolling(window=period).mean()
-        
-        return atr
+        return pd.Series(indicators.atr(high, low, close, period), index=close.index)
     
     def detect_candlestick_patterns(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
         """
-        Detecta patrones básicos de velas japonesas
+        Detecta patrones de velas japonesas (ver `candlestick_scanner.PATTERNS`)
         
         Args:
             df: DataFrame con datos OHLCV
@@ -223,41 +292,8 @@ class TechnicalAnalyzer:
         Returns:
             Diccionario con patrones detectados
         """
-        patterns = {}
-        
-        # Doji
-        body_size = abs(df['close'] - df['open'])
-        total_range = df['high'] - df['low']
-        doji_threshold = total_range * 0.1
-        patterns['doji'] = body_size <= doji_threshold
-        
-        # Hammer
-        lower_shadow = df[['open', 'close']].min(axis=1) - df['low']
-        upper_shadow = df['high'] - df[['open', 'close']].max(axis=1)
-        patterns['hammer'] = (lower_shadow >= 2 * body_size) & (upper_shadow <= body_size * 0.1)
-        
-        # Shooting Star
-        patterns['shooting_star'] = (upper_shadow >= 2 * body_size) & (lower_shadow <= body_size * 0.1)
-        
-        # Engulfing Bullish
-        prev_open = df['open'].shift(1)
-        prev_close = df['close'].shift(1)
-        patterns['bullish_engulfing'] = (
-            (prev_close < prev_open) &  # Vela anterior bajista
-            (df['close'] > df['open']) &  # Vela actual alcista
-            (df['open'] < prev_close) &  # Abre por debajo del cierre anterior
-            (df['close'] > prev_open)   # Cierra por encima de la apertura anterior
-        )
-        
-        # Engulfing Bearish
-        patterns['bearish_engulfing'] = (
-            (prev_close > prev_open) &  # Vela anterior alcista
-            (df['close'] < df['open']) &  # Vela actual bajista
-            (df['open'] > prev_close) &  # Abre por encima del cierre anterior
-            (df['close'] < prev_open)   # Cierra por debajo de la apertura anterior
-        )
-        
-        return patterns
+        mask = candlestick_scanner.scan_frame(df)
+        return {name: pd.Series(candlestick_scanner.has_pattern(mask, name), index=df.index) for name in PATTERNS}
     
     def generate_signals(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
         """
@@ -308,41 +344,22 @@ class TechnicalAnalyzer:
         if df.empty:
             return {"error": f"No se pudieron obtener datos para {symbol}"}
         
-        # Calcular indicadores técnicos
-        df['rsi'] = self.calculate_rsi(df['close'])
-        
-        macd_data = self.calculate_macd(df['close'])
-        df['macd'] = macd_data['macd']
-        df['macd_signal'] = macd_data['signal']
-        df['macd_histogram'] = macd_data['histogram']
-        
-        bb_data = self.calculate_bollinger_bands(df['close'])
-        df['bb_upper'] = bb_data['upper']
-        df['bb_middle'] = bb_data['middle']
-        df['bb_lower'] = bb_data['lower']
-        
-        ma_data = self.calculate_moving_averages(df['close'])
-        for key, value in ma_data.items():
-            df[key] = value
+        # Calcular indicadores técnicos (los intermedios compartidos se calculan una vez)
+        graph = IndicatorGraph(df, cache=self.indicator_cache, symbol=symbol, interval=interval)
+        for column in INDICATOR_COLUMNS:
+            df[column] = graph[column]
         
-        stoch_data = self.calculate_stochastic(df['high'], df['low'], df['close'])
-        df['stoch_k'] = stoch_data['k_percent']
-        df['stoch_d'] = stoch_data['d_percent']
-        
-        df['atr'] = self.calculate_atr(df['high'], df['low'], df['close'])
-        
-        # Detectar patrones de velas
-        patterns = self.detect_candlestick_patterns(df)
-        for pattern_name, pattern_series in patterns.items():
-            df[f'pattern_{pattern_name}'] = pattern_series
+        # Detectar patrones de velas (máscara de bits por vela)
+        df['candle_patterns'] = graph['candle_patterns']
         
         # Generar señales
-        signals = self.generate_signals(df)
-        for signal_name, signal_series in signals.items():
-            df[f'signal_{signal_name}'] = signal_series
+        for signal_name in SIGNALS:
+            df[f'signal_{signal_name}'] = graph[signal_name]
         
         # Análisis del estado actual
         latest = df.iloc[-1]
+        patterns = candlestick_scanner.decode(latest['candle_patterns'])
+        pattern_bias = candlestick_scanner.split_by_bias(patterns)
         
         analysis = {
             "symbol": symbol,
@@ -364,9 +381,11 @@ class TechnicalAnalyzer:
                 "sma_50": latest.get('sma_50'),
                 "sma_200": latest.get('sma_200')
             },
-            "signals": self._get_active_signals(latest, signals.keys()),
-            "patterns": self._get_active_patterns(latest, patterns.keys()),
-            "trend_analysis": self._analyze_trend(df),
+            "signals": self._get_active_signals(latest, SIGNALS),
+            "patterns": patterns,
+            "bullish_patterns": pattern_bias['bullish'],
+            "bearish_patterns": pattern_bias['bearish'],
+            "trend_analysis": self._analyze_trend(latest),
             "support_resistance": self._find_support_resistance(df),
             "recommendation": self._generate_recommendation(latest, df),
             "data": df
@@ -374,6 +393,78 @@ class TechnicalAnalyzer:
         
         return analysis
     
+    def analyze_indicators(self, symbol: str, outputs: Tuple[str, ...] = QUICK_OUTPUTS,
+                           interval: str = "1d", range_period: str = "1y") -> Dict:
+        """
+        Calcula solo las salidas pedidas (y sus dependencias) en la última vela
+        
+        Args:
+            symbol: Símbolo de la acción
+            outputs: Indicadores, señales o patrones a calcular (ej: 'rsi', 'golden_cross')
+            interval: Intervalo de tiempo
+            range_period: Período de datos
+            
+        Returns:
+            Diccionario con el último precio y los valores pedidos
+        """
+        df = self.get_stock_data(symbol, interval, range_period)
+        if df.empty:
+            return {"error": f"No se pudieron obtener datos para {symbol}"}
+        
+        graph = IndicatorGraph(df, cache=self.indicator_cache, symbol=symbol, interval=interval)
+        return {
+            "symbol": symbol,
+            "last_price": float(df['close'].iloc[-1]),
+            "last_update": df.index[-1].strftime('%Y-%m-%d %H:%M:%S'),
+            "values": graph.latest(outputs)
+        }
+    
+    def analyze(self, symbol: str) -> Dict:
+        """
+        Método principal de análisis para compatibilidad con el analizador masivo
+        
+        Solo calcula RSI, MACD y las medias de tendencia, en lugar del análisis
+        completo de `analyze_stock`.
+        
+        Args:
+            symbol: Símbolo de la acción a analizar
+            
+        Returns:
+            Diccionario con resultados del análisis técnico
+        """
+        try:
+            quick_analysis = self.analyze_indicators(symbol, QUICK_OUTPUTS)
+            
+            if "error" in quick_analysis:
+                return quick_analysis
+            
+            latest_indicators = quick_analysis["values"]
+            
+            # Determinar señal MACD
+            macd_signal = "neutral"
+            if latest_indicators.get("macd", 0) > latest_indicators.get("macd_signal", 0):
+                macd_signal = "bullish"
+            elif latest_indicators.get("macd", 0) < latest_indicators.get("macd_signal", 0):
+                macd_signal = "bearish"
+            
+            # Formato simplificado para el analizador masivo
+            simplified_analysis = {
+                "symbol": symbol,
+                "rsi": latest_indicators.get("rsi"),
+                "macd": {
+                    "value": latest_indicators.get("macd"),
+                    "signal": macd_signal
+                },
+                "price": quick_analysis["last_price"],
+                "trend": self._analyze_trend(latest_indicators),
+                "recommendation": self._generate_recommendation(latest_indicators, None)
+            }
+            
+            return simplified_analysis
+            
+        except Exception as e:
+            return {"error": f"Error en análisis de {symbol}: {str(e)}"}
+    
     def _get_bb_position(self, price: float, upper: float, lower: float) -> str:
         """Determina la posición del precio respecto a las Bollinger Bands"""
         if price > upper:
@@ -391,18 +482,8 @@ class TechnicalAnalyzer:
                 active_signals.append(signal_name)
         return active_signals
     
-    def _get_active_patterns(self, latest_row: pd.Series, pattern_names: List[str]) -> List[str]:
-        """Obtiene los patrones activos en la última vela"""
-        active_patterns = []
-        for pattern_name in pattern_names:
-            if latest_row.get(f'pattern_{pattern_name}', False):
-                active_patterns.append(pattern_name)
-        return active_patterns
-    
-    def _analyze_trend(self, df: pd.DataFrame) -> Dict[str, str]:
-        """Analiza la tendencia general de la acción"""
-        latest = df.iloc[-1]
-        
+    def _analyze_trend(self, latest) -> Dict[str, str]:
+        """Analiza la tendencia general de la acción (a partir de la última vela o de sus valores)"""
         # Tendencia basada en medias móviles
         short_term = "neutral"
         medium_term = "neutral"
@@ -518,54 +599,6 @@ def test_analyzer():
 if __name__ == "__main__":
     test_analyzer()
 
-
-    def analyze(self, symbol: str) -> Dict:
-        """
-        Método principal de análisis para compatibilidad con el analizador masivo
-        
-        Args:
-            symbol: Símbolo de la acción a analizar
-            
-        Returns:
-            Diccionario con resultados del análisis técnico
-        """
-        try:
-            # Usar el método analyze_stock existente
-            full_analysis = self.analyze_stock(symbol)
-            
-            if "error" in full_analysis:
-                return full_analysis
-            
-            # Extraer información clave para el analizador masivo
-            latest_indicators = full_analysis.get("technical_indicators", {})
-            
-            # Determinar señal MACD
-            macd_signal = "neutral"
-            if latest_indicators.get("macd", 0) > latest_indicators.get("macd_signal", 0):
-                macd_signal = "bullish"
-            elif latest_indicators.get("macd", 0) < latest_indicators.get("macd_signal", 0):
-                macd_signal = "bearish"
-            
-            # Formato simplificado para el analizador masivo
-            simplified_analysis = {
-                "symbol": symbol,
-                "rsi": latest_indicators.get("rsi"),
-                "macd": {
-                    "value": latest_indicators.get("macd"),
-                    "signal": macd_signal
-                },
-                "price": full_analysis.get("last_price"),
-                "trend": full_analysis.get("trend_analysis", {}),
-                "signals": full_analysis.get("signals", []),
-                "patterns": full_analysis.get("patterns", []),
-                "recommendation": full_analysis.get("recommendation", {})
-            }
-            
-            return simplified_analysis
-            
-        except Exception as e:
-            return {"error": f"Error en análisis de {symbol}: {str(e)}"}
-
 # Función de prueba
 def main():
     """Función de prueba del analizador técnico"""
@@ -0,0 +1,241 @@
+"""
+Motor de Líneas de Tendencia
+Ajuste de líneas de resistencia y soporte por mínimos cuadrados sobre ventanas
+deslizantes, y clasificación de triángulos, cuñas y canales
+
+Cada línea se ajusta a los pivotes (máximos locales para la resistencia,
+mínimos para el soporte) de una ventana de barras. Los momentos de la regresión
+(número de pivotes, sumas de x, x², y, xy, y²) se obtienen con sumas por
+ventana, así que la recta de todas las ventanas de una serie sale en forma
+cerrada sin recorrerlas una a una. Funciona sobre una serie (arrays 1-D) o
+sobre un panel del universo (barras x símbolos, con el tiempo en el eje 0).
+
+Las filas se alinean con la última barra de la ventana. Los pivotes de las
+últimas PIVOT_WINDOW // 2 barras aún no están confirmados y no participan.
+"""
+
+import numpy as np
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    from . import indicators
+    from .pivots import rolling_extreme
+except ImportError:
+    import indicators
+    from pivots import rolling_extreme
+
+PIVOT_WINDOW = 5                  # Ventana de los pivotes que definen las líneas
+TRENDLINE_WINDOWS = (20, 50, 100)  # Longitudes de las formaciones buscadas
+MIN_LINE_TOUCHES = 2              # Pivotes mínimos por línea
+FLAT_MOVE = 0.02                  # Línea plana: se mueve menos de un 2% en la ventana
+CONVERGENCE = 0.5                 # Convergencia: el hueco final es menos de la mitad del inicial
+PARALLEL_TOLERANCE = 0.15         # Canal: el hueco varía menos de un 15%
+MAX_FIT_ERROR = 0.02              # Error cuadrático medio máximo de los pivotes (relativo al precio)
+
+FIT_FIELDS = ('slope', 'intercept', 'start_price', 'end_price', 'touches', 'error')
+
+# Códigos de forma (0: ninguna)
+SHAPES = (
+    None,
+    'ascending_triangle', 'descending_triangle', 'symmetrical_triangle',
+    'rising_wedge', 'falling_wedge',
+    'ascending_channel', 'descending_channel', 'horizontal_channel'
+)
+SHAPE_CODES = {name: code for code, name in enumerate(SHAPES) if name}
+TRIANGLES = ('ascending_triangle', 'descending_triangle', 'symmetrical_triangle')
+
+
+def lookback(windows: Iterable[int] = TRENDLINE_WINDOWS) -> int:
+    """Barras necesarias para ajustar las ventanas que acaban en la última barra"""
+    return max(windows) + PIVOT_WINDOW // 2
+
+
+def pivot_mask(values, kind: str = 'peak', window: int = PIVOT_WINDOW) -> np.ndarray:
+    """Barras que son máximo (picos) o mínimo (valles) de su ventana centrada"""
+    values = indicators.as_float_array(values)
+    extreme = rolling_extreme(values, window, 'max' if kind == 'peak' else 'min')
+    with np.errstate(invalid='ignore'):
+        return values == extreme
+
+
+def _moments(values, mask) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    Términos por barra de la regresión (peso, x, x², y, xy, y²) con y centrado
+    en la media de los pivotes de cada serie para conservar precisión, y las
+    barras con dato ('observed') para descartar ventanas incompletas
+    """
+    y = indicators.as_float_array(values)
+    observed = (~np.isnan(y)).astype(float)
+    weight = (np.asarray(mask, dtype=bool) & (observed > 0)).astype(float)
+    counts = weight.sum(axis=0)
+    reference = np.where(weight > 0, y, 0.0).sum(axis=0) / np.maximum(counts, 1)
+    yc = np.where(weight > 0, y - reference, 0.0)
+
+    x = np.arange(len(y), dtype=float).reshape((-1,) + (1,) * (y.ndim - 1))
+    wx = weight * x
+    return {
+        's0': weight, 's1': wx, 's2': wx * x,
+        'sy': yc, 'sxy': x * yc, 'syy': yc * yc,
+        'observed': observed
+    }, reference
+
+
+def _fit(moments: Dict[str, np.ndarray], reference: np.ndarray, window: int) -> Dict[str, np.ndarray]:
+    """Rectas de todas las ventanas a partir de los términos de `_moments`"""
+    shape = moments['s0'].shape
+    out = {name: np.full(shape, np.nan) for name in FIT_FIELDS}
+    n = shape[0]
+    if window < 2 or n < window:
+        return out
+
+    sums = {name: indicators.window_sums(values, window) for name, values in moments.items()}
+    s0, sy, syy = sums['s0'], sums['sy'], sums['syy']
+
+    # Coordenadas relativas al inicio de cada ventana
+    start = np.arange(n - window + 1, dtype=float).reshape((-1,) + (1,) * (len(shape) - 1))
+    s2 = sums['s2'] - 2 * start * sums['s1'] + start * start * s0
+    s1 = sums['s1'] - start * s0
+    sxy = sums['sxy'] - start * sy
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sxx = s2 - s1 * s1 / s0
+        sxy_centered = sxy - s1 * sy / s0
+        syy_centered = syy - sy * sy / s0
+        slope = sxy_centered / sxx
+        intercept = (sy - slope * s1) / s0 + reference
+        end_price = intercept + slope * (window - 1)
+        sse = np.maximum(syy_centered - slope * sxy_centered, 0.0)
+        error = np.sqrt(sse / s0) / np.abs((intercept + end_price) / 2)
+
+    # Ventanas completas: sin barras vacías (p. ej. el relleno inicial de un panel)
+    valid = (s0 >= 2) & (sxx > 1e-9) & (sums['observed'] == window)
+    fits = {
+        'slope': slope, 'intercept': intercept, 'start_price': intercept,
+        'end_price': end_price, 'touches': s0, 'error': error
+    }
+    for name, values in fits.items():
+        out[name][window - 1:] = np.where(valid, values, np.nan)
+    return out
+
+
+def fit_lines(values, mask, window: int) -> Dict[str, np.ndarray]:
+    """
+    Recta de mínimos cuadrados de los pivotes de cada ventana
+
+    Args:
+        values: Precios (máximos o mínimos), 1-D o 2-D
+        mask: Barras que son pivote (misma forma)
+        window: Barras de cada ventana
+
+    Returns:
+        Diccionario de arrays alineados con la última barra de cada ventana:
+        'slope' (precio por barra), 'intercept' y 'start_price' (valor de la
+        recta en la primera barra), 'end_price' (en la última), 'touches'
+        (pivotes ajustados) y 'error' (error cuadrático medio relativo al
+        precio). NaN donde la ventana no está completa o tiene menos de dos
+        pivotes.
+    """
+    moments, reference = _moments(values, mask)
+    return _fit(moments, reference, window)
+
+
+def classify(resistance: Dict[str, np.ndarray], support: Dict[str, np.ndarray],
+             min_touches: int = 4) -> np.ndarray:
+    """
+    Forma que dibujan las líneas de resistencia y soporte de cada ventana
+
+    Triángulos y cuñas: las líneas convergen (triángulo ascendente con
+    resistencia plana y soporte al alza, descendente con soporte plano y
+    resistencia a la baja, simétrico con ambas hacia el centro; cuñas con
+    ambas en la misma dirección). Canales: líneas casi paralelas.
+
+    Returns:
+        Array int8 con el código de `SHAPES` (0: ninguna)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        start_gap = resistance['start_price'] - support['start_price']
+        end_gap = resistance['end_price'] - support['end_price']
+        level = (resistance['end_price'] + support['end_price']) / 2
+        resistance_move = (resistance['end_price'] - resistance['start_price']) / level
+        support_move = (support['end_price'] - support['start_price']) / level
+
+        valid = (
+            (resistance['touches'] >= MIN_LINE_TOUCHES) & (support['touches'] >= MIN_LINE_TOUCHES) &
+            (resistance['touches'] + support['touches'] >= min_touches) &
+            (resistance['error'] <= MAX_FIT_ERROR) & (support['error'] <= MAX_FIT_ERROR) &
+            (start_gap > 0) & (end_gap > 0)
+        )
+        converging = valid & (end_gap < start_gap * CONVERGENCE)
+        parallel = valid & (np.abs(end_gap - start_gap) <= start_gap * PARALLEL_TOLERANCE)
+
+        resistance_flat = np.abs(resistance_move) < FLAT_MOVE
+        support_flat = np.abs(support_move) < FLAT_MOVE
+        resistance_up, resistance_down = resistance_move >= FLAT_MOVE, resistance_move <= -FLAT_MOVE
+        support_up, support_down = support_move >= FLAT_MOVE, support_move <= -FLAT_MOVE
+
+    conditions = {
+        'ascending_triangle': converging & resistance_flat & support_up,
+        'descending_triangle': converging & support_flat & resistance_down,
+        'symmetrical_triangle': converging & resistance_down & support_up,
+        'rising_wedge': converging & resistance_up & support_up,
+        'falling_wedge': converging & resistance_down & support_down,
+        'ascending_channel': parallel & resistance_up & support_up,
+        'descending_channel': parallel & resistance_down & support_down,
+        'horizontal_channel': parallel & resistance_flat & support_flat
+    }
+    return np.select(list(conditions.values()), [SHAPE_CODES[name] for name in conditions], 0).astype(np.int8)
+
+
+def scan_trendlines(high, low, windows: Iterable[int] = TRENDLINE_WINDOWS,
+                    min_touches: int = 4) -> Dict[int, Dict]:
+    """
+    Líneas y formas de todas las ventanas de una serie o panel
+
+    Args:
+        high, low: Arrays 1-D (una serie) o 2-D (barras x símbolos)
+        windows: Longitudes de ventana
+        min_touches: Pivotes mínimos entre las dos líneas
+
+    Returns:
+        Diccionario ventana -> {'resistance': ajustes, 'support': ajustes, 'shape': códigos}
+    """
+    high = indicators.as_float_array(high)
+    low = indicators.as_float_array(low)
+    # Los términos de la regresión se calculan una vez para todas las ventanas
+    resistance_moments = _moments(high, pivot_mask(high, 'peak'))
+    support_moments = _moments(low, pivot_mask(low, 'valley'))
+
+    result = {}
+    for window in windows:
+        resistance = _fit(*resistance_moments, window)
+        support = _fit(*support_moments, window)
+        result[window] = {
+            'resistance': resistance,
+            'support': support,
+            'shape': classify(resistance, support, min_touches)
+        }
+    return result
+
+
+def scan_trendline_panel(frames: Dict, windows: Iterable[int] = TRENDLINE_WINDOWS,
+                         columns: Tuple[str, str] = ('high', 'low'),
+                         length: int = None) -> Tuple[List[str], Dict[int, Dict], np.ndarray]:
+    """
+    Escanea líneas de tendencia de muchas acciones a la vez sobre un panel alineado por la última barra
+
+    Args:
+        frames: Diccionario símbolo -> DataFrame OHLC
+        windows: Longitudes de ventana
+        columns: Nombres de las columnas de máximo y mínimo
+        length: Número máximo de barras por símbolo
+
+    Returns:
+        Tupla (símbolos, resultado de `scan_trendlines` con arrays barras x símbolos, barras por símbolo)
+    """
+    symbols, panel, lengths = indicators.build_panel(frames, columns=columns, length=length)
+    return symbols, scan_trendlines(panel[columns[0]], panel[columns[1]], windows), lengths
+
+
+def shape_names(codes) -> List:
+    """Nombre de la forma de cada código (None: ninguna)"""
+    return [SHAPES[code] for code in np.asarray(codes).ravel().tolist()]
@@ -0,0 +1,221 @@
+"""
+Instantánea del Universo de Acciones
+Últimos indicadores, precio, volumen y puntuación de catalizador de todas las
+acciones, precalculados por el pipeline por lotes y consultados por el screener
+"""
+
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional
+
+# Ruta por defecto de la instantánea (configurable por variable de entorno)
+DEFAULT_SNAPSHOT_PATH = os.environ.get(
+    'STOCKAI_UNIVERSE_SNAPSHOT',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'universe_snapshot.npz')
+)
+
+# Columnas persistidas
+TEXT_COLUMNS = ('symbol', 'name', 'sector', 'recommendation', 'confidence', 'long_term_recommendation')
+NUMERIC_COLUMNS = (
+    'price', 'volume', 'avg_volume_20d', 'volume_ratio',
+    'rsi', 'macd', 'macd_signal', 'macd_histogram',
+    'sma20', 'sma50', 'bb_width', 'vol_21d', 'vol_90d',
+    'momentum_5d', 'momentum_21d',
+    'short_term_score', 'long_term_score', 'catalyst_score',
+    'updated_at'
+)
+SNAPSHOT_COLUMNS = TEXT_COLUMNS + NUMERIC_COLUMNS
+
+
+def _number(value) -> float:
+    return float(value) if value is not None else np.nan
+
+
+def row_from_analysis(result: Dict, catalysts: Optional[Dict] = None) -> Dict:
+    """
+    Construye una fila de la instantánea a partir de un resultado de TimeHorizonAnalyzer
+
+    Args:
+        result: Resultado de `analyze_single_stock` (sin error)
+        catalysts: Resultado de `CatalystAgent.find_catalysts` (opcional)
+
+    Returns:
+        Diccionario con las columnas de la instantánea
+    """
+    indicators = result.get('technical_indicators') or {}
+    macd = indicators.get('macd') or {}
+    averages = indicators.get('moving_averages') or {}
+    bollinger = indicators.get('bollinger') or {}
+    volume = indicators.get('volume') or {}
+    volatility = indicators.get('volatility') or {}
+    momentum = indicators.get('momentum') or {}
+    short_term = result.get('short_term') or {}
+    long_term = result.get('long_term') or {}
+    catalysts = catalysts if catalysts and 'error' not in catalysts else {}
+
+    return {
+        'symbol': result['symbol'],
+        'name': result.get('name') or '',
+        'sector': (catalysts.get('company_info') or {}).get('sector') or '',
+        'recommendation': short_term.get('recommendation') or '',
+        'confidence': short_term.get('confidence') or '',
+        'long_term_recommendation': long_term.get('recommendation') or '',
+        'price': _number(result.get('current_price', indicators.get('current_price'))),
+        'volume': _number(volume.get('current')),
+        'avg_volume_20d': _number(volume.get('avg_20d')),
+        'volume_ratio': _number(volume.get('ratio')),
+        'rsi': _number(indicators.get('rsi')),
+        'macd': _number(macd.get('line')),
+        'macd_signal': _number(macd.get('signal')),
+        'macd_histogram': _number(macd.get('histogram')),
+        'sma20': _number(averages.get('sma20')),
+        'sma50': _number(averages.get('sma50')),
+        'bb_width': _number(bollinger.get('width')),
+        'vol_21d': _number(volatility.get('vol_21d')),
+        'vol_90d': _number(volatility.get('vol_90d')),
+        'momentum_5d': _number(momentum.get('momentum_5d')),
+        'momentum_21d': _number(momentum.get('momentum_21d')),
+        'short_term_score': _number(short_term.get('score')),
+        'long_term_score': _number(long_term.get('score')),
+        'catalyst_score': _number(catalysts.get('catalyst_score')),
+        'updated_at': time.time()
+    }
+
+
+class UniverseSnapshot:
+    """
+    Instantánea columnar (un fichero .npz) con una fila por símbolo
+
+    El pipeline por lotes la actualiza con `update()`; las lecturas usan un
+    DataFrame en memoria que solo se recarga cuando el fichero cambia, de modo
+    que filtrar el universo completo es una operación vectorizada de milisegundos.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or DEFAULT_SNAPSHOT_PATH
+        self._lock = threading.Lock()
+        self._frame = None
+        self._mtime = None
+
+    def _load_file(self) -> pd.DataFrame:
+        """Lee el fichero completo o un DataFrame vacío si no existe"""
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=SNAPSHOT_COLUMNS).set_index('symbol')
+
+        try:
+            with np.load(self.path) as data:
+                columns = {key: data[key] for key in data.files}
+        except Exception as e:
+            print(f"Error leyendo instantánea del universo {self.path}: {str(e)}")
+            return pd.DataFrame(columns=SNAPSHOT_COLUMNS).set_index('symbol')
+
+        frame = pd.DataFrame({
+            column: columns[column] if column in columns else np.full(len(columns['symbol']), np.nan)
+            for column in SNAPSHOT_COLUMNS
+        })
+        for column in TEXT_COLUMNS:
+            frame[column] = frame[column].astype(str)
+        return frame.set_index('symbol')
+
+    def _save_file(self, frame: pd.DataFrame):
+        """Escribe la instantánea de forma atómica (fichero temporal + rename)"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        frame = frame.reset_index()
+        arrays = {column: frame[column].to_numpy(dtype=str) for column in TEXT_COLUMNS}
+        arrays.update({column: frame[column].to_numpy(dtype=np.float64) for column in NUMERIC_COLUMNS})
+
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self.path)
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Devuelve la instantánea como DataFrame indexado por símbolo
+
+        El DataFrame es compartido entre lecturas: no debe modificarse.
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+
+        with self._lock:
+            if self._frame is None or mtime != self._mtime:
+                self._frame = self._load_file()
+                self._mtime = mtime
+            return self._frame
+
+    def update(self, rows: Iterable[Dict]) -> int:
+        """
+        Inserta o reemplaza filas (por símbolo) y guarda la instantánea
+
+        Args:
+            rows: Filas generadas con `row_from_analysis`
+
+        Returns:
+            Número total de símbolos en la instantánea
+        """
+        rows = list(rows)
+        if not rows:
+            return len(self.frame())
+
+        updates = pd.DataFrame(rows, columns=SNAPSHOT_COLUMNS).drop_duplicates('symbol', keep='last').set_index('symbol')
+
+        with self._lock:
+            current = self._load_file()
+            merged = pd.concat([current[~current.index.isin(updates.index)], updates])
+            self._save_file(merged)
+            self._frame = None  # Forzar recarga en la próxima lectura
+
+        return len(merged)
+
+    def screen(self, max_price: Optional[float] = None, min_volume: Optional[float] = None,
+               catalyst_score_min: Optional[float] = None, sector: Optional[str] = None,
+               sort_by: str = 'catalyst_score', limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Filtra el universo con los criterios del screener
+
+        Args:
+            max_price: Precio máximo
+            min_volume: Volumen mínimo del último día
+            catalyst_score_min: Puntuación mínima de catalizador
+            sector: Sector (sin distinguir mayúsculas)
+            sort_by: Columna por la que ordenar de mayor a menor
+            limit: Número máximo de filas
+
+        Returns:
+            DataFrame con las acciones que cumplen todos los filtros
+        """
+        frame = self.frame()
+        mask = np.ones(len(frame), dtype=bool)
+
+        if max_price is not None:
+            mask &= (frame['price'] <= max_price).to_numpy()
+        if min_volume is not None:
+            mask &= (frame['volume'] >= min_volume).to_numpy()
+        if catalyst_score_min is not None:
+            mask &= (frame['catalyst_score'] >= catalyst_score_min).to_numpy()
+        if sector:
+            mask &= (frame['sector'].str.lower() == sector.lower()).to_numpy()
+
+        result = frame[mask]
+        if sort_by in result.columns:
+            result = result.sort_values(sort_by, ascending=False, na_position='last')
+        if limit is not None:
+            result = result.head(limit)
+        return result
+
+    def metadata(self) -> Dict:
+        """Tamaño y antigüedad de la instantánea"""
+        frame = self.frame()
+        updated = frame['updated_at'].dropna() if len(frame) else pd.Series(dtype=float)
+        return {
+            'symbols': len(frame),
+            'oldest_update': float(updated.min()) if len(updated) else None,
+            'newest_update': float(updated.max()) if len(updated) else None
+        }
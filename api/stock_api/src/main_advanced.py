@@ -18,6 +18,14 @@ import schedule
 import numpy as np
 from collections import defaultdict
 import yfinance as yf
+import sys
+import bisect
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agents'))
+import indicators
+from streaming_indicators import IndicatorState, IndicatorStateStore
+from indicator_cache import get_indicator_cache
+from bar_resampler import ResampledBars
 
 app = Flask(__name__)
 CORS(app, origins="*")
@@ -27,6 +35,10 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 DATA_DIR = '/home/ubuntu/stock_recommendation_system'
 STOCKS_FILE = os.path.join(DATA_DIR, 'complete_lightyear_analysis.json')
 SUMMARY_FILE = os.path.join(DATA_DIR, 'lightyear_analysis_summary.json')
+INDICATOR_STATE_FILE = os.path.join(DATA_DIR, 'indicator_state.json')
+
+# Mismas convenciones que el endpoint de gráficos técnicos
+LIVE_INDICATOR_PARAMS = {'sma_periods': (20, 50), 'rsi_method': 'wilder', 'adjust': False, 'ddof': 0}
 
 # Cache global para datos
 stocks_cache = {}
@@ -37,6 +49,10 @@ portfolios = defaultdict(dict)
 user_preferences = defaultdict(dict)
 comparison_stocks = []
 historical_data_cache = {}
+indicator_states = {}
+indicator_state_store = IndicatorStateStore(INDICATOR_STATE_FILE)
+indicator_cache = get_indicator_cache()
+chart_resamplers = {}  # (símbolo, intervalo) -> ResampledBars
 last_update = None
 
 def load_data():
@@ -58,6 +74,9 @@ def load_data():
             with open(SUMMARY_FILE, 'r') as f:
                 summary_cache = json.load(f)
         
+        # Estado de los indicadores en tiempo real de la sesión anterior
+        indicator_states.update(indicator_state_store.load())
+        
         last_update = datetime.now()
         print(f"Datos cargados: {len(stocks_cache)} acciones")
         
@@ -356,10 +375,10 @@ def get_historical_data(symbol):
     # Procesar según intervalo
     if interval == 'weekly':
         # Agrupar por semanas
-        processed_data = process_weekly_data(historical)
+        processed_data = process_weekly_data(historical, symbol)
     elif interval == 'monthly':
         # Agrupar por meses
-        processed_data = process_monthly_data(historical)
+        processed_data = process_monthly_data(historical, symbol)
     else:
         processed_data = historical
     
@@ -375,12 +394,18 @@ def get_technical_chart_data(symbol):
     historical = generate_historical_data(symbol)
     prices = historical['prices']
     
-    # Calcular indicadores técnicos
-    sma_20 = calculate_sma(prices, 20)
-    sma_50 = calculate_sma(prices, 50)
-    rsi = calculate_rsi(prices)
-    macd = calculate_macd(prices)
-    bollinger = calculate_bollinger_bands(prices)
+    # Calcular indicadores técnicos (reutilizados mientras no cambien los datos)
+    version = (historical['dates'][0], historical['dates'][-1], len(prices), prices[-1])
+    
+    def cached(indicator, params, compute):
+        key = indicator_cache.key(symbol, 'chart_daily', version, indicator, params)
+        return indicator_cache.get_or_compute(key, compute)
+    
+    sma_20 = cached('sma', (20,), lambda: calculate_sma(prices, 20))
+    sma_50 = cached('sma', (50,), lambda: calculate_sma(prices, 50))
+    rsi = cached('rsi', (14,), lambda: calculate_rsi(prices))
+    macd = cached('macd', (12, 26, 9), lambda: calculate_macd(prices))
+    bollinger = cached('bollinger', (20, 2), lambda: calculate_bollinger_bands(prices))
     
     return jsonify({
         'dates': historical['dates'],
@@ -950,68 +975,38 @@ def check_alert_condition(alert, current_value):
     else:
         return False
 
+def _to_list(values, fill=None):
+    """Convierte un array de indicadores en lista; `fill` (valor o lista) sustituye los NaN del calentamiento"""
+    fills = fill if isinstance(fill, (list, tuple)) else [fill] * len(values)
+    return [fills[i] if np.isnan(value) else value for i, value in enumerate(values.tolist())]
+
 def calculate_sma(prices, period):
     """Calcular Media Móvil Simple"""
     if len(prices) < period:
         return prices
     
-    sma = []
-    for i in range(len(prices)):
-        if i < period - 1:
-            sma.append(None)
-        else:
-            sma.append(sum(prices[i-period+1:i+1]) / period)
-    
-    return sma
+    return _to_list(indicators.sma(prices, period))
 
 def calculate_rsi(prices, period=14):
-    """Calcular RSI"""
+    """Calcular RSI (suavizado de Wilder)"""
     if len(prices) < period + 1:
         return [50] * len(prices)
     
-    deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-    gains = [d if d > 0 else 0 for d in deltas]
-    losses = [-d if d < 0 else 0 for d in deltas]
-    
-    avg_gain = sum(gains[:period]) / period
-    avg_loss = sum(losses[:period]) / period
-    
-    rsi = []
-    for i in range(len(prices)):
-        if i < period:
-            rsi.append(50)
-        else:
-            if avg_loss == 0:
-                rsi.append(100)
-            else:
-                rs = avg_gain / avg_loss
-                rsi.append(100 - (100 / (1 + rs)))
-            
-            # Actualizar promedios
-            if i < len(deltas):
-                gain = deltas[i] if deltas[i] > 0 else 0
-                loss = -deltas[i] if deltas[i] < 0 else 0
-                avg_gain = (avg_gain * (period - 1) + gain) / period
-                avg_loss = (avg_loss * (period - 1) + loss) / period
-    
-    return rsi
+    rsi = indicators.rsi(prices, period, method='wilder')
+    # Sin ganancias ni pérdidas (tramo plano) el cociente es 0/0: 100, como sin pérdidas
+    rsi[period:] = np.where(np.isnan(rsi[period:]), 100.0, rsi[period:])
+    return _to_list(rsi, fill=50)
 
 def calculate_macd(prices):
     """Calcular MACD"""
     if len(prices) < 26:
         return {'macd': [0] * len(prices), 'signal': [0] * len(prices), 'histogram': [0] * len(prices)}
     
-    ema_12 = calculate_ema(prices, 12)
-    ema_26 = calculate_ema(prices, 26)
-    
-    macd_line = [ema_12[i] - ema_26[i] for i in range(len(prices))]
-    signal_line = calculate_ema(macd_line, 9)
-    histogram = [macd_line[i] - signal_line[i] for i in range(len(prices))]
-    
+    macd = indicators.macd(prices, adjust=False)
     return {
-        'macd': macd_line,
-        'signal': signal_line,
-        'histogram': histogram
+        'macd': _to_list(macd['macd']),
+        'signal': _to_list(macd['signal']),
+        'histogram': _to_list(macd['histogram'])
     }
 
 def calculate_ema(prices, period):
@@ -1019,64 +1014,72 @@ def calculate_ema(prices, period):
     if len(prices) < period:
         return prices
     
-    multiplier = 2 / (period + 1)
-    ema = [prices[0]]
-    
-    for i in range(1, len(prices)):
-        ema.append((prices[i] * multiplier) + (ema[i-1] * (1 - multiplier)))
-    
-    return ema
+    return _to_list(indicators.ema(prices, span=period, adjust=False))
 
 def calculate_bollinger_bands(prices, period=20, std_dev=2):
     """Calcular Bandas de Bollinger"""
     if len(prices) < period:
         return {'upper': prices, 'middle': prices, 'lower': prices}
     
-    sma = calculate_sma(prices, period)
-    upper = []
-    lower = []
-    
-    for i in range(len(prices)):
-        if i < period - 1:
-            upper.append(prices[i])
-            lower.append(prices[i])
-        else:
-            period_prices = prices[i-period+1:i+1]
-            std = np.std(period_prices)
-            upper.append(sma[i] + (std * std_dev))
-            lower.append(sma[i] - (std * std_dev))
-    
+    bands = indicators.bollinger_bands(prices, period, std_dev, ddof=0)
     return {
-        'upper': upper,
-        'middle': sma,
-        'lower': lower
+        'upper': _to_list(bands['upper'], fill=list(prices)),
+        'middle': _to_list(bands['middle']),
+        'lower': _to_list(bands['lower'], fill=list(prices))
     }
 
-def process_weekly_data(daily_data):
-    """Procesar datos diarios a semanales"""
-    # Simplificado - en producción usar pandas para agrupación correcta
-    weekly_data = {
-        'dates': daily_data['dates'][::7],
-        'prices': daily_data['prices'][::7],
-        'volumes': daily_data['volumes'][::7],
-        'high': daily_data['high'][::7],
-        'low': daily_data['low'][::7],
-        'open': daily_data['open'][::7]
-    }
-    return weekly_data
-
-def process_monthly_data(daily_data):
-    """Procesar datos diarios a mensuales"""
-    # Simplificado - en producción usar pandas para agrupación correcta
-    monthly_data = {
-        'dates': daily_data['dates'][::30],
-        'prices': daily_data['prices'][::30],
-        'volumes': daily_data['volumes'][::30],
-        'high': daily_data['high'][::30],
-        'low': daily_data['low'][::30],
-        'open': daily_data['open'][::30]
+def resample_chart_data(daily_data, interval, symbol=None):
+    """
+    Agregar datos diarios en barras OHLCV semanales ('1wk') o mensuales ('1mo')
+    
+    Con símbolo, la serie agregada se conserva entre peticiones y solo se
+    incorporan el último día ya agregado (puede haberse revisado) y los
+    posteriores.
+    """
+    dates = daily_data['dates']
+    if not dates:
+        return {key: [] for key in ('dates', 'prices', 'volumes', 'high', 'low', 'open')}
+    
+    key = (symbol, interval)
+    series = chart_resamplers.get(key) if symbol else None
+    first_timestamp = int(np.datetime64(dates[0], 's').astype(np.int64))
+    if series is None or not len(series) or series.bars['timestamp'][0] != first_timestamp:
+        series = ResampledBars(interval)
+        new_from = 0
+    else:
+        last_date = str(np.datetime64(series.last_timestamp, 's').astype('datetime64[D]'))
+        new_from = bisect.bisect_left(dates, last_date)
+    
+    if new_from < len(dates):
+        timestamps = np.array(dates[new_from:], dtype='datetime64[D]').astype('datetime64[s]').astype(np.int64)
+        columns = {
+            'open': np.asarray(daily_data['open'][new_from:], dtype=float),
+            'high': np.asarray(daily_data['high'][new_from:], dtype=float),
+            'low': np.asarray(daily_data['low'][new_from:], dtype=float),
+            'close': np.asarray(daily_data['prices'][new_from:], dtype=float),
+            'volume': np.asarray(daily_data['volumes'][new_from:], dtype=np.int64)
+        }
+        series.update(timestamps, columns)
+    if symbol:
+        chart_resamplers[key] = series
+    
+    bars = series.bars
+    return {
+        'dates': np.datetime_as_string(bars['timestamp'].astype('datetime64[s]'), unit='D').tolist(),
+        'prices': bars['close'].tolist(),
+        'volumes': bars['volume'].tolist(),
+        'high': bars['high'].tolist(),
+        'low': bars['low'].tolist(),
+        'open': bars['open'].tolist()
     }
-    return monthly_data
+
+def process_weekly_data(daily_data, symbol=None):
+    """Procesar datos diarios a semanales (semanas de lunes a domingo)"""
+    return resample_chart_data(daily_data, '1wk', symbol)
+
+def process_monthly_data(daily_data, symbol=None):
+    """Procesar datos diarios a mensuales (meses naturales)"""
+    return resample_chart_data(daily_data, '1mo', symbol)
 
 def calculate_correlations(stocks_data):
     """Calcular correlaciones entre acciones"""
@@ -1206,10 +1209,25 @@ def handle_unsubscribe_stock(data):
 
 # ============= TAREAS PROGRAMADAS =============
 
+def get_indicator_state(symbol):
+    """Estado incremental de indicadores de una acción (se construye una vez desde el histórico)"""
+    state = indicator_states.get(symbol)
+    if state is None:
+        historical = generate_historical_data(symbol)
+        state = IndicatorState.from_history(
+            historical['prices'], historical['high'], historical['low'], **LIVE_INDICATOR_PARAMS
+        )
+        indicator_states[symbol] = state
+    return state
+
 def update_market_data():
     """Actualizar datos del mercado (simulado)"""
     print("Actualizando datos del mercado...")
     
+    # Los precios de cada tick actualizan la barra diaria en curso
+    session = datetime.now().strftime('%Y-%m-%d')
+    changed = False
+    
     # Simular cambios en precios
     for symbol, data in stocks_cache.items():
         old_price = data.get('price', 100)
@@ -1220,13 +1238,28 @@ def update_market_data():
         data['change'] = round(new_price - old_price, 2)
         data['change_percent'] = round(((new_price - old_price) / old_price) * 100, 2)
         
+        # Indicadores con el nuevo precio como barra provisional; la barra se
+        # confirma una vez, al cambiar de sesión
+        changed |= symbol not in indicator_states
+        state = get_indicator_state(symbol)
+        changed |= state.session != session
+        data['live_indicators'] = state.update_provisional(data['price'], session=session)
+        
         # Emitir actualización en tiempo real
         socketio.emit('price_update', {
             'symbol': symbol,
             'price': new_price,
             'change': data['change'],
-            'change_percent': data['change_percent']
+            'change_percent': data['change_percent'],
+            'indicators': data['live_indicators']
         })
+    
+    # Persistir el estado solo cuando se confirma una barra o hay símbolos nuevos
+    if changed:
+        try:
+            indicator_state_store.save(indicator_states)
+        except Exception as e:
+            print(f"Error guardando estado de indicadores: {e}")
 
 # Programar actualización cada 30 segundos
 def start_scheduler():
@@ -0,0 +1,136 @@
+"""
+Event loop persistente para las rutas de la API
+Un único loop de asyncio en un hilo de fondo, compartido por todas las peticiones
+"""
+
+import asyncio
+import atexit
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional
+
+# Marca de fin de iteración en la cola de `iterate`
+_END = object()
+
+
+class EventLoopThread:
+    """
+    Loop de asyncio de larga duración ejecutándose en un hilo daemon
+
+    Los handlers de Flask (síncronos) envían corrutinas con `run()` o `submit()`;
+    todas comparten el mismo loop, por lo que las peticiones en curso se solapan
+    sobre los ejecutores del coordinador en lugar de crear y cerrar un loop por
+    petición.
+    """
+
+    def __init__(self, name: str = "stock-api-loop"):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Loop compartido (se arranca la primera vez que se usa)"""
+        return self._ensure_started()
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        Programa una corrutina en el loop compartido
+
+        Returns:
+            concurrent.futures.Future con el resultado
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        Ejecuta una corrutina en el loop compartido y espera su resultado
+
+        Args:
+            coro: Corrutina a ejecutar
+            timeout: Segundos máximos de espera (la corrutina se cancela al agotarse)
+
+        Returns:
+            Resultado de la corrutina
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator) -> Iterator:
+        """
+        Consume un generador asíncrono desde código síncrono
+
+        El generador se ejecuta en el loop compartido y cada elemento se entrega
+        en cuanto está disponible (útil para respuestas en streaming). Si el
+        consumidor deja de iterar, el generador se cancela.
+
+        Args:
+            agen: Generador asíncrono
+
+        Yields:
+            Elementos producidos por el generador
+        """
+        items = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((item, None))
+            except Exception as e:
+                items.put((None, e))
+            finally:
+                items.put(_END)
+
+        future = self.submit(pump())
+        try:
+            while True:
+                entry = items.get()
+                if entry is _END:
+                    break
+                item, error = entry
+                if error is not None:
+                    raise error
+                yield item
+        finally:
+            future.cancel()
+
+    def shutdown(self):
+        """Detiene el loop y espera al hilo"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        if not thread.is_alive():
+            loop.close()
+
+
+# Loop compartido por las rutas
+event_loop = EventLoopThread()
+atexit.register(event_loop.shutdown)
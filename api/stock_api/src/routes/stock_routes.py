@@ -2,8 +2,7 @@
 Rutas de la API para el sistema de recomendación de acciones
 """
 
-from flask import Blueprint, request, jsonify
-import asyncio
+from flask import Blueprint, Response, request, jsonify
 import json
 from datetime import datetime
 import sys
@@ -22,12 +21,23 @@ except ImportError as e:
     # Usar agentes mock para desarrollo
     from src.agents.agent_coordinator import AgentCoordinator
 
+from src.agents.universe_snapshot import UniverseSnapshot
+from src.routes.async_runner import event_loop
+
 # Crear blueprint
 stock_bp = Blueprint('stock', __name__)
 
 # Inicializar coordinador
 coordinator = AgentCoordinator()
 
+# Instantánea del universo para el screener
+universe_snapshot = UniverseSnapshot()
+
+# Límites del análisis en lote
+MAX_BATCH_SYMBOLS = 500
+MAX_BATCH_CONCURRENCY = 64
+BATCH_CONCURRENCY = int(os.environ.get('STOCKAI_BATCH_CONCURRENCY', 16))
+
 @stock_bp.route('/health', methods=['GET'])
 def health_check():
     """Verificación de salud de la API"""
@@ -35,7 +45,8 @@ def health_check():
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'version': '1.0.0',
-        'agents_available': list(coordinator.agents.keys())
+        'agents_available': list(coordinator.agents.keys()),
+        'cache': coordinator.cache_stats()
     })
 
 @stock_bp.route('/analyze/<symbol>', methods=['GET'])
@@ -56,11 +67,8 @@ def analyze_stock(symbol):
         include_sentiment = request.args.get('include_sentiment', 'true').lower() == 'true'
         include_catalysts = request.args.get('include_catalysts', 'true').lower() == 'true'
         
-        # Ejecutar análisis asíncrono
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        analysis = loop.run_until_complete(
+        # Ejecutar análisis asíncrono en el loop compartido
+        analysis = event_loop.run(
             coordinator.analyze_stock_comprehensive(
                 symbol.upper(),
                 include_patterns=include_patterns,
@@ -69,19 +77,8 @@ def analyze_stock(symbol):
                 include_catalysts=include_catalysts
             )
         )
-        
-        loop.close()
-        
-        # Convertir DataFrames a diccionarios para JSON
-        if 'technical' in analysis and 'data' in analysis['technical']:
-            # No incluir datos raw en la respuesta para reducir tamaño
-            analysis['technical']['data_summary'] = {
-                'rows': len(analysis['technical']['data']),
-                'latest_price': float(analysis['technical']['data']['close'].iloc[-1]),
-                'latest_volume': int(analysis['technical']['data']['volume'].iloc[-1])
-            }
-            del analysis['technical']['data']
-        
+
+        # El análisis ya es un resumen serializable (sin DataFrames); no se modifica
         return jsonify(analysis)
         
     except Exception as e:
@@ -153,6 +150,17 @@ def catalyst_analysis(symbol):
             'timestamp': datetime.now().isoformat()
         }), 500
 
+def _batch_summary(analysis):
+    """Resumen de un análisis para las respuestas en lote"""
+    return {
+        'recommendation': analysis.get('final_recommendation', {}),
+        'technical_summary': (analysis.get('technical') or {}).get('recommendation', 'N/A'),
+        'sentiment': (analysis.get('sentiment') or {}).get('overall_sentiment', 'neutral'),
+        'catalyst_score': (analysis.get('catalysts') or {}).get('catalyst_score', 0),
+        'degraded': analysis.get('degraded', False),
+        'timestamp': analysis.get('timestamp')
+    }
+
 @stock_bp.route('/recommendations', methods=['POST'])
 def batch_recommendations():
     """
@@ -160,8 +168,14 @@ def batch_recommendations():
     
     Body: {
         "symbols": ["AAPL", "TSLA", "MSFT"],
-        "analysis_type": "quick" | "full"
+        "analysis_type": "quick" | "full",
+        "stream": false,
+        "max_concurrency": 16
     }
+    
+    Con "stream": true (o Accept: application/x-ndjson) la respuesta es NDJSON:
+    una línea por símbolo en cuanto termina su análisis y una línea final con
+    "done": true.
     """
     try:
         data = request.get_json()
@@ -169,13 +183,16 @@ def batch_recommendations():
         if not data or 'symbols' not in data:
             return jsonify({'error': 'Se requiere lista de símbolos'}), 400
         
-        symbols = data['symbols']
+        # Normalizar y eliminar duplicados manteniendo el orden
+        symbols = list(dict.fromkeys(str(symbol).upper() for symbol in data['symbols']))
         analysis_type = data.get('analysis_type', 'quick')
         
-        if len(symbols) > 10:
-            return jsonify({'error': 'Máximo 10 símbolos por solicitud'}), 400
+        if len(symbols) > MAX_BATCH_SYMBOLS:
+            return jsonify({'error': f'Máximo {MAX_BATCH_SYMBOLS} símbolos por solicitud'}), 400
         
-        results = {}
+        max_concurrency = min(max(int(data.get('max_concurrency', BATCH_CONCURRENCY)), 1), MAX_BATCH_CONCURRENCY)
+        stream = bool(data.get('stream')) or \
+            request.accept_mimetypes.best == 'application/x-ndjson'
         
         # Configurar análisis según tipo
         if analysis_type == 'quick':
@@ -189,38 +206,42 @@ def batch_recommendations():
             include_sentiment = True
             include_catalysts = True
         
-        # Procesar cada símbolo
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        for symbol in symbols:
-            try:
-                analysis = loop.run_until_complete(
-                    coordinator.analyze_stock_comprehensive(
-                        symbol.upper(),
-                        include_patterns=include_patterns,
-                        include_predictions=include_predictions,
-                        include_sentiment=include_sentiment,
-                        include_catalysts=include_catalysts
-                    )
-                )
-                
-                # Simplificar respuesta para análisis en lote
-                results[symbol.upper()] = {
-                    'recommendation': analysis.get('final_recommendation', {}),
-                    'technical_summary': analysis.get('technical', {}).get('recommendation', 'N/A'),
-                    'sentiment': analysis.get('sentiment', {}).get('overall_sentiment', 'neutral'),
-                    'catalyst_score': analysis.get('catalysts', {}).get('catalyst_score', 0),
-                    'timestamp': analysis.get('timestamp')
-                }
-                
-            except Exception as e:
-                results[symbol.upper()] = {
-                    'error': str(e),
+        def analyzed():
+            """Resultados (símbolo, resumen) en orden de finalización"""
+            batch = coordinator.analyze_batch(
+                symbols,
+                max_concurrency=max_concurrency,
+                include_patterns=include_patterns,
+                include_predictions=include_predictions,
+                include_sentiment=include_sentiment,
+                include_catalysts=include_catalysts
+            )
+            for symbol, analysis in event_loop.iterate(batch):
+                if isinstance(analysis, Exception):
+                    yield symbol, {
+                        'error': str(analysis),
+                        'timestamp': datetime.now().isoformat()
+                    }
+                else:
+                    yield symbol, _batch_summary(analysis)
+        
+        if stream:
+            def generate():
+                processed = 0
+                for symbol, summary in analyzed():
+                    processed += 1
+                    yield json.dumps({'symbol': symbol, **summary}, default=str) + '\n'
+                yield json.dumps({
+                    'done': True,
+                    'analysis_type': analysis_type,
+                    'processed_count': processed,
                     'timestamp': datetime.now().isoformat()
-                }
+                }) + '\n'
+            
+            return Response(generate(), mimetype='application/x-ndjson')
         
-        loop.close()
+        completed = dict(analyzed())
+        results = {symbol: completed[symbol] for symbol in symbols if symbol in completed}
         
         return jsonify({
             'results': results,
@@ -240,11 +261,15 @@ def stock_screener():
     """
     Screener de acciones basado en criterios
     
+    Consulta la instantánea precalculada del universo completo (la refresca el
+    pipeline por lotes), sin lanzar análisis en la petición.
+    
     Query parameters:
     - sector: string
     - max_price: float
     - min_volume: int
     - catalyst_score_min: float
+    - limit: int (default: 100)
     """
     try:
         # Obtener parámetros de filtro
@@ -252,69 +277,37 @@ def stock_screener():
         max_price = request.args.get('max_price', type=float)
         min_volume = request.args.get('min_volume', type=int)
         catalyst_score_min = request.args.get('catalyst_score_min', type=float, default=50)
+        limit = request.args.get('limit', type=int, default=100)
+        
+        # Filtrar y ordenar por puntuación de catalizador
+        matches = universe_snapshot.screen(
+            max_price=max_price,
+            min_volume=min_volume,
+            catalyst_score_min=catalyst_score_min,
+            sector=sector,
+            sort_by='catalyst_score'
+        )
         
-        # Lista de símbolos para screening (en producción sería más extensa)
-        screening_symbols = [
-            'AAPL', 'TSLA', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'META', 'NFLX',
-            'AMD', 'INTC', 'CRM', 'ORCL', 'ADBE', 'PYPL', 'UBER', 'LYFT',
-            'PLTR', 'SNOW', 'ZM', 'DOCU', 'ROKU', 'SQ', 'SHOP', 'SPOT'
+        page = matches.head(limit).reset_index()
+        page = page.astype(object).where(page.notna(), None)
+        filtered_stocks = [
+            {
+                'symbol': row['symbol'],
+                'name': row['name'],
+                'sector': row['sector'],
+                'price': row['price'],
+                'volume': row['volume'],
+                'catalyst_score': row['catalyst_score'],
+                'recommendation': row['recommendation'] or 'HOLD',
+                'confidence': row['confidence'] or 'low',
+                'rsi': row['rsi'],
+                'macd_histogram': row['macd_histogram'],
+                'momentum_21d': row['momentum_21d'],
+                'updated_at': row['updated_at']
+            }
+            for row in page.to_dict('records')
         ]
         
-        filtered_stocks = []
-        
-        # Procesar cada símbolo
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        for symbol in screening_symbols[:15]:  # Limitar para demo
-            try:
-                # Análisis rápido
-                analysis = loop.run_until_complete(
-                    coordinator.analyze_stock_comprehensive(
-                        symbol,
-                        include_patterns=False,
-                        include_predictions=False,
-                        include_sentiment=False,
-                        include_catalysts=True
-                    )
-                )
-                
-                # Aplicar filtros
-                if 'technical' in analysis and 'data_summary' in analysis['technical']:
-                    price = analysis['technical']['data_summary']['latest_price']
-                    volume = analysis['technical']['data_summary']['latest_volume']
-                else:
-                    continue
-                
-                catalyst_score = analysis.get('catalysts', {}).get('catalyst_score', 0)
-                
-                # Verificar filtros
-                if max_price and price > max_price:
-                    continue
-                if min_volume and volume < min_volume:
-                    continue
-                if catalyst_score < catalyst_score_min:
-                    continue
-                
-                # Agregar a resultados
-                filtered_stocks.append({
-                    'symbol': symbol,
-                    'price': price,
-                    'volume': volume,
-                    'catalyst_score': catalyst_score,
-                    'recommendation': analysis.get('final_recommendation', {}).get('recommendation', 'HOLD'),
-                    'confidence': analysis.get('final_recommendation', {}).get('confidence', 'low')
-                })
-                
-            except Exception as e:
-                print(f"Error procesando {symbol}: {e}")
-                continue
-        
-        loop.close()
-        
-        # Ordenar por puntuación de catalizador
-        filtered_stocks.sort(key=lambda x: x['catalyst_score'], reverse=True)
-        
         return jsonify({
             'stocks': filtered_stocks,
             'filters_applied': {
@@ -323,7 +316,8 @@ def stock_screener():
                 'min_volume': min_volume,
                 'catalyst_score_min': catalyst_score_min
             },
-            'total_found': len(filtered_stocks),
+            'total_found': len(matches),
+            'snapshot': universe_snapshot.metadata(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -360,14 +354,14 @@ def create_watchlist():
         # Analizar cada símbolo en la watchlist
         watchlist_analysis = {}
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        pending = {
+            symbol.upper(): event_loop.submit(coordinator.analyze_stock_comprehensive(symbol.upper()))
+            for symbol in symbols
+        }
         
-        for symbol in symbols:
+        for symbol, future in pending.items():
             try:
-                analysis = loop.run_until_complete(
-                    coordinator.analyze_stock_comprehensive(symbol.upper())
-                )
+                analysis = future.result()
                 
                 watchlist_analysis[symbol.upper()] = {
                     'current_price': analysis.get('technical', {}).get('data_summary', {}).get('latest_price', 0),
@@ -383,8 +377,6 @@ def create_watchlist():
                     'last_updated': datetime.now().isoformat()
                 }
         
-        loop.close()
-        
         # Crear respuesta de watchlist
         watchlist = {
             'name': watchlist_name,
@@ -419,14 +411,14 @@ def get_alerts():
         
         alerts = []
         
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        pending = {
+            symbol: event_loop.submit(coordinator.analyze_stock_comprehensive(symbol))
+            for symbol in alert_symbols
+        }
         
-        for symbol in alert_symbols:
+        for symbol, future in pending.items():
             try:
-                analysis = loop.run_until_complete(
-                    coordinator.analyze_stock_comprehensive(symbol)
-                )
+                analysis = future.result()
                 
                 # Generar alertas basadas en criterios
                 catalyst_score = analysis.get('catalysts', {}).get('catalyst_score', 0)
@@ -458,8 +450,6 @@ def get_alerts():
                 print(f"Error generando alerta para {symbol}: {e}")
                 continue
         
-        loop.close()
-        
         # Ordenar alertas por severidad
         severity_order = {'high': 3, 'medium': 2, 'low': 1}
         alerts.sort(key=lambda x: severity_order.get(x['severity'], 0), reverse=True)